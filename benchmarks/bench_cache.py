@@ -0,0 +1,27 @@
+from harness import benchmark
+
+from semantic_cache import SemanticResponseCache
+
+"""
+Lookup cost of the weather/travel tool response cache at each level.
+"""
+
+CACHED_LOCATIONS = ["Buenos Aires Argentina", "New York City", "Paris", "Mumbai", "Toronto, Ontario"]
+
+def filled_cache() -> SemanticResponseCache:
+    cache = SemanticResponseCache()
+    for location in CACHED_LOCATIONS:
+        cache.store("weather", f"What is the current weather in {location}?", f"Sunny in {location}", 1.0, location)
+    return cache
+
+@benchmark("cache.exact_hit", number=2000, setup=filled_cache)
+def exact_hit(cache):
+    cache.lookup("weather", "what is the current weather in paris?", "paris")
+
+@benchmark("cache.semantic_hit", number=1000, setup=filled_cache)
+def semantic_hit(cache):
+    cache.lookup("weather", "What is the current weather in Argentina, Buenos Aires?", "Argentina, Buenos Aires")
+
+@benchmark("cache.miss", number=1000, setup=filled_cache)
+def miss(cache):
+    cache.lookup("weather", "What is the current weather in Lagos?", "Lagos")
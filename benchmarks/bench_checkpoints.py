@@ -0,0 +1,50 @@
+import os
+import tempfile
+
+from harness import benchmark
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.sqlite import SqliteSaver, sqlite3
+
+"""
+SqliteSaver checkpoint write and read latency as the persisted history grows: each
+benchmark writes (or reads back) a checkpoint holding a history of N messages.
+"""
+
+HISTORY_SIZES = (10, 100, 1000)
+
+class CheckpointFixture:
+
+    def __init__(self, messages: int):
+        self.tmp = tempfile.TemporaryDirectory()
+        conn = sqlite3.connect(os.path.join(self.tmp.name, "bench.db"), check_same_thread=False)
+        self.saver = SqliteSaver(conn)
+        self.saver.setup()
+        self.config = {"configurable": {"thread_id": f"bench-{messages}", "checkpoint_ns": ""}}
+        self.history = [
+            (HumanMessage if i % 2 == 0 else AIMessage)(content=f"Message {i}: " + "weather and events in Toronto " * 8)
+            for i in range(messages)
+        ]
+        self.step = 0
+        self.put()
+
+    def put(self):
+        checkpoint = empty_checkpoint()
+        version = self.saver.get_next_version(None, None)
+        checkpoint["channel_values"] = {"messages": self.history}
+        checkpoint["channel_versions"] = {"messages": version}
+        self.step += 1
+        self.saver.put(self.config, checkpoint, {"source": "loop", "step": self.step}, {"messages": version})
+
+    def get(self):
+        return self.saver.get_tuple({"configurable": {"thread_id": self.config["configurable"]["thread_id"]}})
+
+for size in HISTORY_SIZES:
+    number = max(5, 2000 // size)
+    benchmark(f"checkpoints.put_{size}_messages", number=number, setup=lambda size=size: CheckpointFixture(size))(
+        lambda fixture: fixture.put()
+    )
+    benchmark(f"checkpoints.get_{size}_messages", number=number, setup=lambda size=size: CheckpointFixture(size))(
+        lambda fixture: fixture.get()
+    )
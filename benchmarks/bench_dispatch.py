@@ -0,0 +1,40 @@
+from harness import benchmark
+
+from langchain_core.messages import HumanMessage
+from langchain_core.tools import Tool
+
+from agent_prompts import WEATHER_TOOL_DESCRIPTION, WEATHER_TOOL_PROMPT
+from stub_llm import StubChatModel
+from tool_dispatch import ToolDispatcher, extract_location
+
+"""
+One weather turn after routing, through the ReAct agent (planning call, tool call, final
+answer) and through direct dispatch (the tool's single call). Zero-latency stub model without
+the response cache, so the difference is framework cost and the two saved model calls.
+"""
+
+QUERY = "How is the weather in Mumbai in November?"
+
+def _dispatcher(mode: str):
+    from langchain.agents import AgentType, initialize_agent
+
+    llm = StubChatModel()
+
+    def weather_tool_func(location: str) -> str:
+        return llm.invoke([HumanMessage(content=WEATHER_TOOL_PROMPT.format(location=location))]).content
+
+    agent = initialize_agent([Tool(name="WeatherTool", func=weather_tool_func, description=WEATHER_TOOL_DESCRIPTION)],
+                             llm, agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION, verbose=False)
+    return ToolDispatcher({"weather": (weather_tool_func, "location")}, lambda intent: agent, mode=mode)
+
+@benchmark("dispatch.react", number=20, setup=lambda: _dispatcher("react"))
+def react(dispatcher):
+    dispatcher.run("weather", QUERY)
+
+@benchmark("dispatch.direct", number=100, setup=lambda: _dispatcher("direct"))
+def direct(dispatcher):
+    dispatcher.run("weather", QUERY)
+
+@benchmark("dispatch.extract_location", number=2000)
+def location():
+    extract_location(QUERY)
@@ -0,0 +1,52 @@
+from harness import benchmark
+
+from agent_prompts import FLIGHT_EXTRACTION_PROMPT
+from plugins.airport_index import get_airport_index
+from plugins.fare_search import FakeFareBackend, FareSearch, format_itineraries
+from plugins.flight_extraction import FlightDetailExtractor, parse_flight_details
+from plugins.search_flights import build_flight_search_params, get_iata_code_by_city, get_iata_codes_by_country
+from stub_llm import StubChatModel
+
+"""
+Flight plugin hot paths: flight detail extraction (the local parser alone, and the parser
+plus a structured-output call to the stub model for a query it cannot fully parse) and
+airport lookups in search_flights.py.
+"""
+
+FLIGHT_QUERY = (
+    "Which are the best flights between Toronto, Ontario and Mumbai, departing on "
+    "November 11, 2025 and coming back two weeks later?"
+)
+PARTIAL_QUERY = "Any cheap flights to Mumbai this winter?"
+
+def _extractor():
+    return FlightDetailExtractor(StubChatModel(), FLIGHT_EXTRACTION_PROMPT)
+
+@benchmark("flights.extract_details_parser", number=1000)
+def extract_details_parser():
+    parse_flight_details(FLIGHT_QUERY)
+
+@benchmark("flights.extract_details_llm", number=100, setup=_extractor)
+def extract_details(extractor):
+    extractor.extract(PARTIAL_QUERY)
+
+@benchmark("flights.iata_by_city_exact", number=5000, setup=get_airport_index)
+def iata_by_city_exact(index):
+    get_iata_code_by_city("Mumbai")
+
+@benchmark("flights.iata_by_city_fuzzy", number=500, setup=get_airport_index)
+def iata_by_city_fuzzy(index):
+    get_iata_code_by_city("Torotno")
+
+@benchmark("flights.iata_by_country", number=5000, setup=get_airport_index)
+def iata_by_country(index):
+    get_iata_codes_by_country("India")
+
+@benchmark("flights.build_search_params", number=2000, setup=get_airport_index)
+def build_search_params(index):
+    build_flight_search_params("Toronto, Ontario", "Mumbai, India", "2025-11-11", "2025-11-25")
+
+@benchmark("flights.fare_search_20_combinations", number=50, setup=lambda: FareSearch(FakeFareBackend()))
+def fare_search_20_combinations(fares):
+    result = fares.search(["YYZ", "YTZ"], ["BOM", "DEL"], "2030-11-11", "2030-11-25", flex_days=2)
+    format_itineraries(result)
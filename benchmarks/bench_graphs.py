@@ -0,0 +1,50 @@
+from harness import benchmark
+
+from langchain_core.messages import HumanMessage
+from plugins.web_search import FakeSearchProvider, RateLimiter
+
+"""
+LangGraph execution overhead of the supervisor/researcher/explainer graphs from
+agents_langgraph.py and of the memory agent graph, with a zero-latency stub model and
+an offline search provider, so the numbers are framework and tool cost only.
+"""
+
+def _supervisor_graphs():
+    import agents_langgraph
+
+    client = agents_langgraph.web_search_client
+    client.provider = FakeSearchProvider()
+    client.rate_limiter = RateLimiter(rate_per_second=0)
+    return agents_langgraph
+
+def _memory_graph():
+    from agent_memory_langgraph import build_graph
+    from stub_llm import StubChatModel
+
+    return build_graph(StubChatModel()).compile()
+
+@benchmark("graphs.researcher_turn", number=20, setup=_supervisor_graphs)
+def researcher_turn(module):
+    module.researcher_agent.invoke({"messages": [HumanMessage("Causes of the decline of the Roman Empire")]})
+
+@benchmark("graphs.explainer_turn", number=20, setup=_supervisor_graphs)
+def explainer_turn(module):
+    module.explainer_agent.invoke({"messages": [HumanMessage("Explain entropy")]})
+
+@benchmark("graphs.supervisor_turn", number=10, setup=_supervisor_graphs)
+def supervisor_turn(module):
+    module.supervisor_agent.invoke({"messages": [HumanMessage("Why did the Roman Empire decline?")]})
+
+@benchmark("graphs.memory_agent_turn", number=20, setup=_memory_graph)
+def memory_agent_turn(agent):
+    agent.invoke({"messages": [HumanMessage("What's the weather in Toronto?")]})
+
+def _instrumented_supervisor():
+    from instrumentation import TraceCallbackHandler, instrument
+
+    module = _supervisor_graphs()
+    return instrument(module.supervisor_agent, TraceCallbackHandler(trace_file=None))
+
+@benchmark("graphs.supervisor_turn_instrumented", number=10, setup=_instrumented_supervisor)
+def supervisor_turn_instrumented(agent):
+    agent.invoke({"messages": [HumanMessage("Why did the Roman Empire decline?")]})
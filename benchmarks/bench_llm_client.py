@@ -0,0 +1,29 @@
+from harness import benchmark
+
+from langchain_core.messages import HumanMessage
+
+from llm_client import GovernedChatModel, LLMGovernor, RateLimiter
+from stub_llm import StubChatModel
+
+"""
+Per-call overhead of the governed client (rate limiter, retry loop, circuit breaker) over
+the bare model, with budgets large enough that no call ever waits.
+"""
+
+MESSAGES = [HumanMessage("How is the weather in Mumbai in November?")]
+
+def _unbounded_limiter():
+    return RateLimiter(rpm=1e9, tpm=1e12)
+
+@benchmark("llm_client.limiter_acquire", number=2000, setup=_unbounded_limiter)
+def limiter_acquire(limiter):
+    limiter.acquire(300)
+
+@benchmark("llm_client.bare_invoke", number=200, setup=StubChatModel)
+def bare_invoke(model):
+    model.invoke(MESSAGES)
+
+@benchmark("llm_client.governed_invoke", number=200,
+           setup=lambda: GovernedChatModel(inner=StubChatModel(), governor=LLMGovernor(_unbounded_limiter())))
+def governed_invoke(model):
+    model.invoke(MESSAGES)
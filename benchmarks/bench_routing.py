@@ -0,0 +1,29 @@
+from harness import benchmark
+
+from intent_router import IntentRouter
+from stub_llm import StubChatModel
+
+"""
+Per-turn routing cost of the agents_langchain.py main loop: the keyword fast path, the
+structured-output LLM fallback (stub model, zero latency, so only framework cost remains),
+and the legacy keyword helper.
+"""
+
+FAST_PATH_QUERY = "What are the best flights from Toronto, Ontario to Mumbai, India?"
+# No keyword table matches this one, so it goes to the structured-output classifier
+AMBIGUOUS_QUERY = "How far away is the Taj Mahal from Mumbai?"
+
+def _router():
+    return IntentRouter(StubChatModel())
+
+@benchmark("routing.fast_path", number=2000, setup=_router)
+def fast_path(router):
+    router.route(FAST_PATH_QUERY)
+
+@benchmark("routing.llm_fallback", number=50, setup=_router)
+def llm_fallback(router):
+    router.route(AMBIGUOUS_QUERY)
+
+@benchmark("routing.keyword_only", number=5000, setup=_router)
+def keyword_only(router):
+    router.fast_path(AMBIGUOUS_QUERY)
@@ -0,0 +1,26 @@
+from harness import benchmark
+
+from plugins.flight_extraction import parse_flight_details
+from speculation import Speculator
+from tool_dispatch import extract_location
+
+"""
+Overhead of a speculation round (submit to the pool, commit, cancel the rest) next to
+running the same preparation inline once the intent is known.
+"""
+
+QUERY = "Which are the best flights between Toronto, Ontario and Mumbai, departing on November 11, 2025 and coming back two weeks later?"
+
+def _speculator():
+    speculator = Speculator()
+    speculator.register("location", {"weather", "travel"}, extract_location)
+    speculator.register("flight_details", {"flight"}, parse_flight_details)
+    return speculator
+
+@benchmark("speculation.start_commit", number=200, setup=_speculator)
+def start_commit(speculator):
+    speculator.start(QUERY).commit("flight")
+
+@benchmark("speculation.inline", number=200)
+def inline():
+    parse_flight_details(QUERY)
@@ -0,0 +1,21 @@
+import numpy as np
+
+from harness import benchmark
+
+from plugins.synth_data_gen import CITIES, event_by_city_search, weather_by_city_search, weather_for_cities
+
+"""
+Synthetic data tools used by the memory agent, per call and in bulk.
+"""
+
+@benchmark("synth_data.weather_tool", number=1000)
+def weather_tool():
+    weather_by_city_search("Toronto")
+
+@benchmark("synth_data.event_tool", number=1000)
+def event_tool():
+    event_by_city_search("Paris")
+
+@benchmark("synth_data.weather_bulk_140k_city_days", number=5, setup=lambda: np.tile(np.arange(len(CITIES)), 1000))
+def weather_bulk(cities):
+    weather_for_cities(cities, days=7, seed=1)
@@ -0,0 +1,111 @@
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+# Benchmarks run fully offline: stub model, in-memory flight cache, src/ importable
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+os.environ.setdefault("LLM_MODE", "stub")
+os.environ.setdefault("FLIGHT_CACHE_DB", "")
+
+"""
+Minimal benchmark harness shared by the bench_*.py modules.
+
+@benchmark registers a zero-argument callable (or a setup function returning one) under a
+dotted name. measure() times it in rounds after a warm-up and reports per-call statistics
+in microseconds. compare() checks a result set against a stored baseline and flags every
+benchmark whose median got slower by more than the threshold.
+"""
+
+BENCHMARKS = {}
+
+def benchmark(name: str, number: int = 100, rounds: int = 7, setup=None):
+    """
+    Registers fn as benchmark name. fn is called number times per round; with setup,
+    setup() runs once and its return value is passed to fn on every call.
+    """
+    def register(fn):
+        BENCHMARKS[name] = {"fn": fn, "number": number, "rounds": rounds, "setup": setup, "module": fn.__module__}
+        return fn
+    return register
+
+def measure(fn, number: int = 100, rounds: int = 7, warmup: int = 1) -> dict:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            started = time.perf_counter()
+            for _ in range(number):
+                fn()
+            samples.append((time.perf_counter() - started) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    median = statistics.median(samples)
+    return {
+        "median_us": round(median * 1e6, 3),
+        "min_us": round(min(samples) * 1e6, 3),
+        "max_us": round(max(samples) * 1e6, 3),
+        "stdev_us": round(statistics.stdev(samples) * 1e6, 3) if len(samples) > 1 else 0.0,
+        "ops_per_s": round(1 / median, 1) if median else None,
+        "number": number,
+        "rounds": rounds,
+    }
+
+def run(selected: list = None, scale: float = 1.0, log=print) -> dict:
+    """Runs the registered benchmarks whose names start with any of selected (all if empty)."""
+    results = {}
+    for name, spec in BENCHMARKS.items():
+        if selected and not any(name.startswith(prefix) for prefix in selected):
+            continue
+        fn = spec["fn"]
+        if spec["setup"] is not None:
+            state = spec["setup"]()
+            fn = (lambda fn, state: lambda: fn(state))(spec["fn"], state)
+        result = measure(fn, number=max(1, int(spec["number"] * scale)), rounds=spec["rounds"])
+        results[name] = result
+        log(f"{name:<45} {result['median_us']:>14,.1f} us  ({result['ops_per_s']:,} ops/s)")
+    return results
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def save(path: str, results: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+def compare(results: dict, baseline: dict, threshold: float = 0.25) -> list:
+    """
+    Returns one row per benchmark present in both sets: (name, baseline_us, current_us, ratio, status),
+    where status is "regression" when the median grew by more than threshold, "improvement"
+    when it shrank by more than threshold, and "ok" otherwise.
+    """
+    rows = []
+    for name in sorted(set(results) & set(baseline)):
+        before, after = baseline[name]["median_us"], results[name]["median_us"]
+        ratio = after / before if before else float("inf")
+        if ratio > 1 + threshold:
+            status = "regression"
+        elif ratio < 1 / (1 + threshold):
+            status = "improvement"
+        else:
+            status = "ok"
+        rows.append((name, before, after, round(ratio, 3), status))
+    return rows
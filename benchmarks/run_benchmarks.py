@@ -0,0 +1,65 @@
+import argparse
+import sys
+
+import harness
+
+import bench_cache  # noqa: F401  (modules register their benchmarks on import)
+import bench_checkpoints  # noqa: F401
+import bench_dispatch  # noqa: F401
+import bench_flights  # noqa: F401
+import bench_llm_client  # noqa: F401
+import bench_graphs  # noqa: F401
+import bench_routing  # noqa: F401
+import bench_speculation  # noqa: F401
+import bench_synth_data  # noqa: F401
+
+"""
+Runs the benchmark suite and writes the results as JSON.
+
+    python benchmarks/run_benchmarks.py --out results.json
+    python benchmarks/run_benchmarks.py --only routing flights --baseline benchmarks/baseline.json
+
+With --baseline the run is compared against a stored result file; the exit status is 1
+when any benchmark's median regressed by more than --threshold (default 25%).
+--update-baseline writes the current results to the baseline path instead.
+"""
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmark suite for the agents and plugins.")
+    parser.add_argument("--only", nargs="*", help="run benchmarks whose names start with these prefixes")
+    parser.add_argument("--out", default="benchmark_results.json", help="where to write the JSON results")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="relative slowdown counted as a regression")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply the calls per round (e.g. 0.1 for a smoke run)")
+    parser.add_argument("--update-baseline", action="store_true", help="save these results as the new baseline")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, spec in harness.BENCHMARKS.items():
+            print(f"{name:<45} {spec['module']}")
+        return 0
+
+    results = harness.run(args.only, scale=args.scale)
+    harness.save(args.out, results)
+    print(f"\nresults written to {args.out}")
+
+    if args.baseline and args.update_baseline:
+        harness.save(args.baseline, results)
+        print(f"baseline updated: {args.baseline}")
+        return 0
+    if not args.baseline:
+        return 0
+
+    rows = harness.compare(results, harness.load(args.baseline), args.threshold)
+    print(f"\n{'benchmark':<45} {'baseline us':>14} {'current us':>14} {'ratio':>7}  status")
+    for name, before, after, ratio, status in rows:
+        print(f"{name:<45} {before:>14,.1f} {after:>14,.1f} {ratio:>7.2f}  {status}")
+    regressions = [row for row in rows if row[-1] == "regression"]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
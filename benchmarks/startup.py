@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+"""
+Cold-start cost of the agent entry points, each measured in a fresh interpreter:
+
+  - import:       seconds to import the module (python -c "import <module>");
+  - first prompt: seconds from process launch until the script first calls input(),
+                  i.e. what a user waits before they can type.
+
+Runs offline (LLM_MODE=stub, in-memory flight cache) and reports the median of --repeat runs.
+
+    python benchmarks/startup.py --repeat 5
+"""
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+ENTRY_POINTS = ["agents_langgraph", "agents_langchain", "agents_langchain_async", "agent_memory_langgraph"]
+
+IMPORT_SNIPPET = """
+import sys, time
+started = time.perf_counter()
+import {module}
+print(time.perf_counter() - started)
+"""
+
+# input() reports the wall clock and exits; the parent subtracts its launch time
+FIRST_PROMPT_SNIPPET = """
+import builtins, os, runpy, sys, time
+def first_prompt(prompt=""):
+    print(time.time(), file=sys.stderr)
+    sys.stderr.flush()
+    os._exit(0)
+builtins.input = first_prompt
+sys.argv = [{path!r}]
+runpy.run_path({path!r}, run_name="__main__")
+"""
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("LLM_MODE", "stub")
+    env.setdefault("FLIGHT_CACHE_DB", "")
+    return env
+
+def measure_import(module: str) -> float:
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET.format(module=module)], cwd=SRC_DIR,
+                            env=_env(), capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+def measure_first_prompt(module: str) -> float:
+    path = os.path.join(SRC_DIR, f"{module}.py")
+    started = time.time()
+    output = subprocess.run([sys.executable, "-c", FIRST_PROMPT_SNIPPET.format(path=path)], cwd=SRC_DIR,
+                            env=_env(), capture_output=True, text=True, stdin=subprocess.DEVNULL)
+    return float(output.stderr.strip().splitlines()[-1]) - started
+
+def run(modules: list, repeat: int) -> dict:
+    results = {}
+    for module in modules:
+        measure_import(module)  # warm the bytecode cache
+        results[module] = {
+            "import_s": round(statistics.median(measure_import(module) for _ in range(repeat)), 3),
+            "first_prompt_s": round(statistics.median(measure_first_prompt(module) for _ in range(repeat)), 3),
+        }
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure import time and time to first prompt of the agent scripts.")
+    parser.add_argument("--only", nargs="*", default=ENTRY_POINTS, help="modules to measure")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="write the results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.only, args.repeat)
+    print(f"{'module':<26}{'import':>10}{'first prompt':>15}")
+    for module, result in results.items():
+        print(f"{module:<26}{result['import_s']:>9.3f}s{result['first_prompt_s']:>14.3f}s")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
@@ -1,81 +1,115 @@
 # from langchain_community.tools.ddg_search import DuckDuckGoSearchRun
 from dotenv import load_dotenv
-from langchain_openai import AzureChatOpenAI
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph
 
 from langgraph.prebuilt import tools_condition, ToolNode
 from langgraph.graph import MessagesState
 from langgraph.graph import START, END
 import os
-
-from langgraph.checkpoint.sqlite import sqlite3, SqliteSaver
+import asyncio
+import logging
+import argparse
+
+from streaming import StreamRenderer
+from checkpoint_retention import CheckpointMaintenance
+from history_compaction import make_history_compactor
+from session_manager import SessionManager
+from agent_registry import registry
 from plugins.synth_data_gen import weather_by_city_search, event_by_city_search, supported_cities_search
-
-# Create or connect to a SQLite database for checkpointing
-conn = sqlite3.connect('memory.db', check_same_thread=False)
-memory = SqliteSaver(conn)
-
-config = {"configurable": {"thread_id": "2"}}
+from plugins.result_shaping import SHAPING_ENABLED, fetch_tool_result, render_events, render_forecast, shape_result
 
 load_dotenv()
 
-azure_api_key = os.getenv("AZURE_OPENAI_API_KEY")
-azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-azure_deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
-azure_openai_version= os.getenv("AZURE_OPENAI_API_VERSION")
+# LOG_LEVEL=INFO shows prompt tokens before/after history compaction on every turn
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"), format="%(levelname)s %(name)s: %(message)s")
 
-model = AzureChatOpenAI(
-    api_key=azure_api_key,
-    azure_endpoint=azure_endpoint,
-    deployment_name=azure_deployment_name,
-    openai_api_version=azure_openai_version, # Using a recent API version
-    temperature=0.7 # Example temperature
-)
+# Token budgets of the tool results kept in the thread history (see plugins/result_shaping.py)
+WEATHER_RESULT_BUDGET = int(os.getenv("WEATHER_RESULT_BUDGET", 200))
+EVENTS_RESULT_BUDGET = int(os.getenv("EVENTS_RESULT_BUDGET", 120))
 
-# Set of tools for the agent
-tools = [weather_by_city_search, event_by_city_search, supported_cities_search]
-model_with_tools = model.bind_tools(tools)
+# Set of tools for the agent; with TOOL_RESULT_SHAPING=0 the tools return their raw JSON payloads
+tools = [
+    shape_result(WEATHER_RESULT_BUDGET, render_forecast)(weather_by_city_search),
+    shape_result(EVENTS_RESULT_BUDGET, render_events)(event_by_city_search),
+    supported_cities_search,
+] + ([fetch_tool_result] if SHAPING_ENABLED else [])
 
-def travel_llm(state):
+def build_graph(model):
+    """
+    Returns the uncompiled travel graph; SessionManager compiles it once against its checkpointer.
+    """
+    model_with_tools = model.bind_tools(tools)
 
     msg_content = (
         "You are a helpful assistant that can answer questions about the weather, cultural events and sport information in various cities around the world. " 
         "For weather and cultural events, you have to use only the tools provided. "
         "Your answers have to refer strictly to the topic of the question asked. "
     )
-    message = [SystemMessage(content=msg_content)] + state['messages']
 
-    return {"messages": model_with_tools.invoke(message)}
+    def travel_llm(state):
+        message = [SystemMessage(content=msg_content)] + state['messages']
+        return {"messages": model_with_tools.invoke(message)}
 
+    async def atravel_llm(state):
+        message = [SystemMessage(content=msg_content)] + state['messages']
+        return {"messages": await model_with_tools.ainvoke(message)}
 
-graph = StateGraph(MessagesState)
-graph.add_node("travel_llm", travel_llm)
-graph.add_node("tools", ToolNode(tools))
+    graph = StateGraph(MessagesState)
+    # Keeps the persisted history within a token budget before every new user turn reaches the LLM
+    graph.add_node("compact_history", make_history_compactor(model))
+    # Async sessions await the model directly instead of occupying an executor thread per call
+    graph.add_node("travel_llm", RunnableLambda(travel_llm, afunc=atravel_llm))
+    graph.add_node("tools", ToolNode(tools))
 
-graph.add_edge(START, "travel_llm")
-graph.add_edge("tools", "travel_llm")
-graph.add_conditional_edges("travel_llm", tools_condition)
+    graph.add_edge(START, "compact_history")
+    graph.add_edge("compact_history", "travel_llm")
+    graph.add_edge("tools", "travel_llm")
+    graph.add_conditional_edges("travel_llm", tools_condition)
+    return graph
 
-agent = graph.compile(checkpointer=memory)
 # _ = (
-#     agent
+#     build_graph(registry.get("chat_model")).compile()
 #     .get_graph()
 #     .draw_mermaid_png(output_file_path='imgs/weather_tool_agent.png')
 # )
 
-while True:
-    user_input = input("Ask a question (type 'quit' to exit): ")
-    if user_input.strip().lower() == 'quit':
-        print("Exiting conversation.")
-        break
-    response = agent.invoke(
-        {"messages": [HumanMessage(user_input)]},
-        config=config
-    )
-    result = f"\n.....{response['messages'][-1].content}"
-    print(result)
-
-    if "error" in response['messages'][-1].content:
-        break
-
+async def conversation(thread_id: str, stream: bool = False, db_path: str = 'memory.db'):
+    """
+    Conversation loop for one thread. The thread's history is resumed from the checkpoint
+    store, so running again with the same --thread continues the same conversation.
+    Run with --stream to print tokens and tool events as they arrive.
+    """
+    # Keep the checkpoint store bounded: old checkpoints are pruned and the WAL truncated in the background
+    maintenance = CheckpointMaintenance(db_path).start()
+    renderer = StreamRenderer()
+    try:
+        async with SessionManager(build_graph(registry.get("chat_model")), db_path) as manager:
+            session = manager.session(thread_id)
+            while True:
+                user_input = await asyncio.to_thread(input, "Ask a question (type 'quit' to exit): ")
+                if user_input.strip().lower() == 'quit':
+                    print("Exiting conversation.")
+                    break
+                if stream:
+                    response, stats = await session.stream(user_input, renderer=renderer)
+                    renderer.print_stats(stats)
+                    answer = response['messages'][-1].content if response else ""
+                else:
+                    answer = await session.send(user_input)
+                    print(f"\n.....{answer}")
+
+                if "error" in answer:
+                    break
+    finally:
+        # Also on EOF, Ctrl+C or a failed turn, or the maintenance thread outlives the loop
+        maintenance.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Travel assistant with persistent, per-thread memory")
+    parser.add_argument("--thread", default="2", help="conversation thread id to create or resume")
+    parser.add_argument("--stream", action="store_true", help="stream tokens and tool events")
+    args = parser.parse_args()
+    asyncio.run(conversation(args.thread, stream=args.stream))
@@ -0,0 +1,27 @@
+"""
+Prompts and tool descriptions shared by the synchronous and asynchronous LangChain agents.
+"""
+
+WEATHER_TOOL_PROMPT = "What is the current weather in {location}?"
+
+TRAVEL_TOOL_PROMPT = "Provide travel information, tips, and recommendations for visiting {destination}."
+
+FLIGHT_EXTRACTION_PROMPT = (
+    "You are a helpful assistant that extracts flight search details from user queries. "
+    "Given a user message, extract the following fields if present: "
+    "destination, departure_date, return_date, and origin. "
+    "Make sure to provide only the city name in the 'origin' and 'destination' fields, with additional province or country information if available. "
+    "Dates must be formatted as YYYY-MM-DD. "
+    "If a field is missing, use null for its value."
+)
+
+GREETING_PROMPT = (
+    "You are a friendly AI assistant. Greet the user and briefly explain that you can help with weather, travel, and flight information. "
+    "Keep your greeting to 2-3 sentences."
+)
+
+FLIGHT_TOOL_DESCRIPTION = "Provides flight information between locations. Input should specify destination, and departure and returns dates."
+TRAVEL_TOOL_DESCRIPTION = "Offers travel information, tips, and recommendations for a given destination using the LLM."
+WEATHER_TOOL_DESCRIPTION = "Provides current weather information for a given location using the LLM."
+
+UNSUPPORTED_INTENT_REPLY = "I am currently being updated to handle weather, travel, and flight information."
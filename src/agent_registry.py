@@ -0,0 +1,108 @@
+import threading
+import time
+
+"""
+Compile-once registry for the chat model, graphs and agent executors of the entry points.
+
+Each entry is a named factory that runs on the first get() and whose result is cached, so
+importing an agent module builds nothing and every caller afterwards shares the same
+compiled object. Factories may get() other entries (the supervisor graph gets the
+researcher graph and the chat model). warm_up() builds entries on a background thread,
+which the CLIs start right before their first prompt so the build overlaps with typing.
+
+    from agent_registry import registry
+    supervisor = registry.get("supervisor_agent")   # builds researcher/explainer/model on demand
+"""
+
+class AgentRegistry:
+    """
+    Lazily built, process-wide named objects. Builds of the same name are serialized by a
+    per-name lock; different names build concurrently. Factories must not depend on each
+    other in a cycle.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.build_times = {}
+
+    def register(self, name: str, factory=None):
+        """
+        Registers factory under name, replacing (and dropping the built instance of) any
+        previous one. Without factory, returns a decorator.
+        """
+        if factory is None:
+            return lambda fn: self.register(name, fn)
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+            self._locks.setdefault(name, threading.Lock())
+        return factory
+
+    def get(self, name: str):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._factories:
+                raise KeyError(f"No factory registered for '{name}'")
+            lock = self._locks[name]
+        with lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                started = time.perf_counter()
+                instance = self._factories[name]()
+                self.build_times[name] = round(time.perf_counter() - started, 4)
+                self._instances[name] = instance
+        return instance
+
+    def is_built(self, name: str) -> bool:
+        return name in self._instances
+
+    def names(self) -> list:
+        with self._lock:
+            return list(self._factories)
+
+    def reset(self, name: str = None):
+        """Drops the built instance of name (default: all), so the next get() rebuilds it."""
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+    def warm_up(self, names: list = None, background: bool = True):
+        """
+        Builds names (default: all) ahead of their first use. With background=True the builds
+        run on a daemon thread, which is returned; build errors are left for get() to raise.
+        """
+        names = self.names() if names is None else list(names)
+
+        def build_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    pass
+
+        if not background:
+            build_all()
+            return None
+        thread = threading.Thread(target=build_all, name="registry-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._factories
+
+
+# Shared by every entry point, so a process running several of them builds the chat model once
+registry = AgentRegistry()
+
+@registry.register("chat_model")
+def _chat_model():
+    from model_factory import create_chat_model
+
+    return create_chat_model()
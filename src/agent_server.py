@@ -0,0 +1,357 @@
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from aiohttp import web
+
+from agent_registry import registry
+from plugins.geolocation import current_client_ip
+from load_test_langchain import percentile
+from streaming import StreamRenderer, _preview
+
+"""
+HTTP service in front of the agents.
+
+    POST /v1/router                  {"message": "..."} or {"messages": [...]}   langchain router + tool dispatch
+    POST /v1/supervisor              {"message": "...", "stream": false}         langgraph supervisor
+    POST /v1/travel/{thread_id}      {"message": "...", "stream": false}         memory agent, one thread per id
+    GET  /v1/travel/{thread_id}      persisted history of a thread
+    GET  /healthz, GET /stats
+
+With "stream": true the reply is server-sent events: "token" and "tool_start"/"tool_end"
+events while the turn runs, then one "done" event carrying the answer and timing stats.
+
+Every agent endpoint has its own AdmissionController: at most max_concurrency requests run,
+up to max_queue more wait (at most queue_timeout_s), and anything beyond that is answered
+429 with a Retry-After estimate instead of piling up. On shutdown the server stops admitting
+(503, /healthz reports "draining") and waits up to SERVER_DRAIN_TIMEOUT_S for the requests
+already admitted before closing the checkpoint store.
+
+    python agent_server.py --port 8080
+"""
+
+DEFAULT_HOST = os.getenv("AGENT_SERVER_HOST", "127.0.0.1")
+DEFAULT_PORT = int(os.getenv("AGENT_SERVER_PORT", 8080))
+DEFAULT_DB_PATH = os.getenv("AGENT_SERVER_DB", "memory.db")
+DEFAULT_QUEUE_TIMEOUT_S = float(os.getenv("SERVER_QUEUE_TIMEOUT_S", 10))
+DEFAULT_DRAIN_TIMEOUT_S = float(os.getenv("SERVER_DRAIN_TIMEOUT_S", 30))
+
+# (max_concurrency, max_queue) per endpoint; the supervisor fans out to sub-agent threads, so it gets fewer slots
+DEFAULT_LIMITS = {
+    "router": (int(os.getenv("SERVER_ROUTER_CONCURRENCY", 64)), int(os.getenv("SERVER_ROUTER_QUEUE", 128))),
+    "supervisor": (int(os.getenv("SERVER_SUPERVISOR_CONCURRENCY", 8)), int(os.getenv("SERVER_SUPERVISOR_QUEUE", 16))),
+    "travel": (int(os.getenv("SERVER_TRAVEL_CONCURRENCY", 64)), int(os.getenv("SERVER_TRAVEL_QUEUE", 128))),
+}
+
+MAX_BATCH_SIZE = int(os.getenv("SERVER_MAX_BATCH_SIZE", 16))
+
+
+class Rejected(Exception):
+    def __init__(self, status: int, reason: str, retry_after: int = 1):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Concurrency limit plus a bounded wait queue for one endpoint. slot() raises Rejected
+    when the queue is full, when the wait exceeds queue_timeout_s, or while draining.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout_s: float = DEFAULT_QUEUE_TIMEOUT_S):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.draining = False
+        self.latencies = deque(maxlen=2048)
+        self.metrics = {"admitted": 0, "rejected": 0, "timed_out": 0, "completed": 0, "failed": 0}
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: queued requests times mean latency over the slot count."""
+        mean = sum(self.latencies) / len(self.latencies) if self.latencies else 1.0
+        return max(1, math.ceil(mean * (self.waiting + 1) / self.max_concurrency))
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.draining:
+            raise Rejected(503, "server is draining", self.retry_after())
+        # Counted synchronously: wait_for() only acquires the semaphore once its task runs
+        if self.active + self.waiting >= self.max_concurrency + self.max_queue:
+            self.metrics["rejected"] += 1
+            raise Rejected(429, f"{self.name} queue is full", self.retry_after())
+        self.waiting += 1
+        self._idle.clear()
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            self.metrics["timed_out"] += 1
+            raise Rejected(429, f"{self.name} queue wait exceeded {self.queue_timeout_s:.0f}s", self.retry_after())
+        finally:
+            self.waiting -= 1
+            self._set_idle()
+        self.active += 1
+        self.metrics["admitted"] += 1
+        started = time.perf_counter()
+        try:
+            yield
+            self.metrics["completed"] += 1
+        except Exception:
+            self.metrics["failed"] += 1
+            raise
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+            self.active -= 1
+            self.semaphore.release()
+            self._set_idle()
+
+    def _set_idle(self):
+        if not self.active and not self.waiting:
+            self._idle.set()
+
+    async def drain(self, timeout_s: float) -> bool:
+        """Stops admitting and waits for admitted requests; returns False on timeout."""
+        self.draining = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout_s)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def stats(self) -> dict:
+        latencies = list(self.latencies)
+        return {
+            **self.metrics,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+        }
+
+
+def _sse(event: str, data) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+
+def _sse_event(event: dict):
+    """Maps an astream_events (v2) event to an (event name, payload) pair, or None to skip it."""
+    kind = event["event"]
+    if kind == "on_chat_model_stream":
+        content = getattr(event["data"].get("chunk"), "content", "")
+        if isinstance(content, str) and content:
+            return "token", {"text": content, "node": event.get("metadata", {}).get("langgraph_node") or event.get("name")}
+    elif kind == "on_tool_start":
+        return "tool_start", {"name": event["name"], "input": _preview(event["data"].get("input"))}
+    elif kind == "on_tool_end":
+        return "tool_end", {"name": event["name"], "output": _preview(event["data"].get("output"))}
+    return None
+
+async def stream_sse(request: web.Request, events, answer_of, extra: dict = None) -> web.StreamResponse:
+    """
+    Writes an astream_events iterator to the client as server-sent events and finishes
+    with a "done" event holding answer_of(final output) and the turn stats.
+    """
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+    await response.prepare(request)
+    # The renderer only keeps the timing statistics here; its console output is discarded
+    renderer = StreamRenderer(out=io.StringIO())
+    renderer.start_turn()
+    output = None
+    try:
+        async for event in events:
+            renderer.handle_event(event)
+            mapped = _sse_event(event)
+            if mapped:
+                await response.write(_sse(*mapped))
+            if event["event"] == "on_chain_end" and not event.get("parent_ids"):
+                output = event["data"].get("output")
+        await response.write(_sse("done", {**(extra or {}), "answer": answer_of(output), "stats": renderer.end_turn()}))
+    except (ConnectionResetError, asyncio.CancelledError):
+        raise
+    except Exception as e:
+        await response.write(_sse("error", {"error": str(e)}))
+    await response.write_eof()
+    return response
+
+async def _read_json(request: web.Request) -> dict:
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise web.HTTPBadRequest(text=json.dumps({"error": "body must be JSON"}), content_type="application/json")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text=json.dumps({"error": "body must be a JSON object"}), content_type="application/json")
+    return body
+
+def _message(body: dict) -> str:
+    message = body.get("message")
+    if not isinstance(message, str) or not message.strip():
+        raise web.HTTPBadRequest(text=json.dumps({"error": "'message' must be a non-empty string"}), content_type="application/json")
+    return message
+
+def _admission(name: str):
+    """Decorator running a handler inside the named endpoint's admission slot."""
+    def decorator(handler):
+        async def wrapped(request: web.Request):
+            # Origin inference in the flight tools geolocates the caller, not the server
+            current_client_ip.set(request.remote)
+            try:
+                async with request.app["admission"][name].slot():
+                    return await handler(request)
+            except Rejected as e:
+                return web.json_response({"error": e.reason}, status=e.status, headers={"Retry-After": str(e.retry_after)})
+        return wrapped
+    return decorator
+
+
+@_admission("router")
+async def router_handler(request: web.Request):
+    body = await _read_json(request)
+    assistant = request.app["assistant"]
+    if "messages" in body:
+        # A batch shares one admission slot; its turns still go through the assistant's own semaphore
+        messages = body["messages"]
+        if not isinstance(messages, list) or not messages or len(messages) > MAX_BATCH_SIZE:
+            return web.json_response({"error": f"'messages' must be a list of 1 to {MAX_BATCH_SIZE} strings"}, status=400)
+        results = await asyncio.gather(*(assistant.handle(str(message)) for message in messages), return_exceptions=True)
+        return web.json_response({"results": [
+            {"error": str(result)} if isinstance(result, Exception) else {"agent": result[0], "answer": result[1]}
+            for result in results
+        ]})
+
+    message = _message(body)
+    if not body.get("stream"):
+        label, answer = await assistant.handle(message)
+        return web.json_response({"agent": label, "answer": answer})
+
+    decision = await assistant.router.aroute(message)
+    if decision.intent not in assistant.dispatcher:
+        label, answer = await assistant.handle(message)
+        return web.json_response({"agent": label, "answer": answer})
+    turn = assistant.dispatcher.as_runnable(decision.intent)
+    return await stream_sse(
+        request, turn.astream_events({"input": message}, version="v2"),
+        lambda output: (output or {}).get("output"), extra={"agent": decision.intent},
+    )
+
+@_admission("supervisor")
+async def supervisor_handler(request: web.Request):
+    body = await _read_json(request)
+    message = _message(body)
+    supervisor = request.app["supervisor"]
+    state = {"messages": [("user", message)]}
+    if body.get("stream"):
+        return await stream_sse(request, supervisor.astream_events(state, version="v2"),
+                                lambda output: output["messages"][-1].content if output else None)
+    response = await supervisor.ainvoke(state)
+    return web.json_response({"answer": response["messages"][-1].content})
+
+@_admission("travel")
+async def travel_handler(request: web.Request):
+    body = await _read_json(request)
+    message = _message(body)
+    thread_id = request.match_info["thread_id"]
+    session = request.app["sessions"].session(thread_id)
+    if body.get("stream"):
+        return await stream_sse(request, session.events(message),
+                                lambda output: output["messages"][-1].content if output else None,
+                                extra={"thread_id": thread_id})
+    return web.json_response({"thread_id": thread_id, "answer": await session.send(message)})
+
+async def travel_history_handler(request: web.Request):
+    thread_id = request.match_info["thread_id"]
+    # A read must not register a session for every thread id that is looked up
+    messages = await request.app["sessions"].history(thread_id)
+    return web.json_response({"thread_id": thread_id, "messages": [
+        {"type": message.type, "content": message.content} for message in messages
+    ]})
+
+async def health_handler(request: web.Request):
+    draining = request.app["draining"]
+    return web.json_response({"status": "draining" if draining else "ok"}, status=503 if draining else 200)
+
+def admission_stats(app: web.Application) -> dict:
+    return {name: controller.stats() for name, controller in app["admission"].items()}
+
+async def stats_handler(request: web.Request):
+    return web.json_response(admission_stats(request.app))
+
+
+def _default_components(db_path: str):
+    from agent_memory_langgraph import build_graph
+    from agents_langchain_async import AsyncTravelAssistant
+    from session_manager import SessionManager
+
+    import agents_langgraph  # noqa: F401  (registers the supervisor graphs)
+
+    model = registry.get("chat_model")
+    return AsyncTravelAssistant(model), registry.get("supervisor_agent"), SessionManager(build_graph(model), db_path)
+
+def create_app(assistant=None, supervisor=None, sessions=None, db_path: str = DEFAULT_DB_PATH, limits: dict = None,
+               queue_timeout_s: float = DEFAULT_QUEUE_TIMEOUT_S, drain_timeout_s: float = DEFAULT_DRAIN_TIMEOUT_S) -> web.Application:
+    """
+    Builds the application. assistant, supervisor and sessions (an unstarted SessionManager)
+    default to the agents of this repo on the model selected by LLM_MODE.
+    """
+    if assistant is None or supervisor is None or sessions is None:
+        default_assistant, default_supervisor, default_sessions = _default_components(db_path)
+        assistant = assistant or default_assistant
+        supervisor = supervisor or default_supervisor
+        sessions = sessions or default_sessions
+
+    app = web.Application()
+    app["assistant"] = assistant
+    app["supervisor"] = supervisor
+    app["sessions"] = sessions
+    app["draining"] = False
+    app["admission"] = {
+        name: AdmissionController(name, *(limits or {}).get(name, default), queue_timeout_s=queue_timeout_s)
+        for name, default in DEFAULT_LIMITS.items()
+    }
+
+    async def lifecycle(app):
+        await app["sessions"].start()
+        yield
+        await app["assistant"].aclose()
+        await app["sessions"].close()
+
+    async def drain(app):
+        app["draining"] = True
+        results = await asyncio.gather(*(c.drain(drain_timeout_s) for c in app["admission"].values()))
+        if not all(results):
+            print(f"Drain timed out after {drain_timeout_s:.0f}s: {admission_stats(app)}")
+
+    app.cleanup_ctx.append(lifecycle)
+    app.on_shutdown.append(drain)
+    app.add_routes([
+        web.post("/v1/router", router_handler),
+        web.post("/v1/supervisor", supervisor_handler),
+        web.post("/v1/travel/{thread_id}", travel_handler),
+        web.get("/v1/travel/{thread_id}", travel_history_handler),
+        web.get("/healthz", health_handler),
+        web.get("/stats", stats_handler),
+    ])
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the router, supervisor and memory agents over HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="checkpoint database of the memory agent")
+    args = parser.parse_args()
+
+    # shutdown_timeout only needs to cover requests still running after the drain above
+    web.run_app(create_app(db_path=args.db), host=args.host, port=args.port, shutdown_timeout=5)
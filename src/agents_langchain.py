@@ -1,14 +1,18 @@
-from langchain.agents import AgentType, initialize_agent, create_react_agent, AgentExecutor
-from langchain_community.agent_toolkits.load_tools import load_tools
-from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
-from langchain_core.prompts import PromptTemplate
 from langchain_core.tools import Tool
-from langchain_openai import AzureChatOpenAI
 
-import os
-
-from plugins.search_flights import get_flight_info
+import sys
+
+from plugins.flight_extraction import FlightDetailExtractor, find_cities, parse_flight_details
+from agent_registry import registry
+from streaming import StreamRenderer, stream_turn
+from speculation import Speculator, prefetched
+from tool_dispatch import DEFAULT_DISPATCH_MODE, ToolDispatcher, extract_location
+from intent_router import IntentRouter
+from agent_prompts import (
+    WEATHER_TOOL_PROMPT, TRAVEL_TOOL_PROMPT, FLIGHT_EXTRACTION_PROMPT, GREETING_PROMPT,
+    FLIGHT_TOOL_DESCRIPTION, TRAVEL_TOOL_DESCRIPTION, WEATHER_TOOL_DESCRIPTION, UNSUPPORTED_INTENT_REPLY
+)
 
 """"
 *** Sample user queries for testing the flight tool and agent ***
@@ -21,217 +25,211 @@ What are the best day trips from Mumbai in November?
 How far away is the Taj Mahal from Mumbai?
 """
 
-# Load environment variables for Azure OpenAI configuration
+# LLM_MODE selects Azure OpenAI (default), the offline stub, or record/replay (see model_factory.py).
+# The model, the flight extractor and the three ReAct agents are built on first use and cached in
+# the agent registry; langchain.agents itself is only imported when the first agent is built.
+def get_llm():
+    return registry.get("chat_model")
 
-azure_api_key = os.getenv("AZURE_OPENAI_API_KEY")
-azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-azure_deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
-azure_openai_version= os.getenv("AZURE_OPENAI_API_VERSION")
+# Exact + semantic cache for the two tools that only ask the LLM (see semantic_cache.py)
+@registry.register("tool_response_cache")
+def _tool_response_cache():
+    from semantic_cache import SemanticResponseCache
 
-llm = AzureChatOpenAI(
-    api_key=azure_api_key,
-    azure_endpoint=azure_endpoint,
-    deployment_name=azure_deployment_name,
-    openai_api_version=azure_openai_version, # Using a recent API version
-    temperature=0.7 # Example temperature
-)
+    # The tools are keyed on a bare place name, where a close spelling is often another place
+    return SemanticResponseCache(same_words=True)
 
 # Define a simple weather tool that queries the LLM for weather info
 def weather_tool_func(location: str) -> str:
-    prompt = f"What is the current weather in {location}?"
-    response = llm.invoke([HumanMessage(content=prompt)])
-    return response.content
+    prompt = WEATHER_TOOL_PROMPT.format(location=location)
+    return registry.get("tool_response_cache").get_or_call(
+        "weather", prompt, lambda: get_llm().invoke([HumanMessage(content=prompt)]).content, semantic_text=location
+    )
 
 # Define a simple travel tool that queries the LLM for travel information
 def travel_tool_func(destination: str) -> str:
-    prompt = f"Provide travel information, tips, and recommendations for visiting {destination}."
-    response = llm.invoke([HumanMessage(content=prompt)])
-    return response.content
-
-def is_travel_intent_llm(user_input: str) -> bool:
-    """
-    Uses the LLM to classify if the user input is about travel information.
-    """
-    system_prompt = (
-        "You are an intent classifier. "
-        "If the following message is asking for flight information, schedules, bookings, and destinations, respond ONLY with 'no'. "
-        "If the following message is asking for travel information, tips, or recommendations about a destination, respond ONLY with 'yes'. "
-        "Otherwise, respond ONLY with 'no'."
+    prompt = TRAVEL_TOOL_PROMPT.format(destination=destination)
+    return registry.get("tool_response_cache").get_or_call(
+        "travel", prompt, lambda: get_llm().invoke([HumanMessage(content=prompt)]).content, semantic_text=destination
     )
-    response = llm.invoke([
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=user_input)
-    ])
-    return response.content.strip().lower() == "yes"
 
-def extract_flight_details_llm(query: str, llm) -> dict:
-    """
-    Uses the LLM to extract destination, departure date, return date, and optionally origin from the user's query.
-    Returns a dictionary with keys: destination, departure_date, return_date, origin (optional).
-    """
-    system_prompt = (
-        "You are a helpful assistant that extracts flight search details from user queries. "
-        "Given a user message, extract the following fields if present: "
-        "destination, departure_date, return_date, and origin. "
-        "Return your answer as a JSON object with these keys. "
-        "Make sure to provide only the city name in the 'origin' and 'destination' fields, with additional province or country information if available. "
-        "If a field is missing, use null for its value."
-    )
-    response = llm.invoke([
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=query)
-    ])
-    try:
-        # Try to parse the LLM's response as JSON
-        import json
-        details = json.loads(response.content)
-        return details
-    except Exception:
-        return {}
-
-# Define a flight tool using the imported get_flight_info function
+# Parser first, structured-output LLM call only for the fields the parser could not fill
+@registry.register("flight_extractor")
+def _flight_extractor():
+    return FlightDetailExtractor(get_llm(), FLIGHT_EXTRACTION_PROMPT)
+
+# Define a flight tool using the get_flight_info function of the flight search plugin
 def flight_tool_func(query: str) -> str:
     """
     Uses get_flight_info to provide flight information based on the user's query.
     Confirm with the user departure location. If departure_date or return_date is missing, invite the user to provide them.
     """
-    # Extract flight details using the LLM
-    flight_details = extract_flight_details_llm(query, llm)
+    # The flight search plugin (aiohttp, requests, SerpAPI client) is loaded on the first flight query
+    from plugins.search_flights import get_flight_info
 
-    return get_flight_info(flight_details["origin"],flight_details["destination"], flight_details["departure_date"], flight_details["return_date"])     
+    # Every key is present; fields that could not be extracted are None and get_flight_info asks for them.
+    # Parser output and airports speculated while the router classified this query are reused.
+    flight_details = registry.get("flight_extractor").extract(query, parsed=prefetched("flight_details", query))
 
-def is_flight_intent_llm(user_input: str) -> bool:
-    """
-    Uses the LLM to classify if the user input is about flight information.
-    """
-    system_prompt = (
-        "You are an intent classifier. "
-        "If the following message is asking for flight information, booking, schedules, or airfare between locations, respond ONLY with 'yes'. "
-        "Otherwise, respond ONLY with 'no'."
-    )
-    response = llm.invoke([
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=user_input)
-    ])
-    return response.content.strip().lower() == "yes"
+    return get_flight_info(flight_details["origin"], flight_details["destination"], flight_details["departure_date"],
+                           flight_details["return_date"], airports=prefetched("airports", query))
+
+def _speculative_airports(query: str) -> dict:
+    from plugins.airport_index import get_airport_index
+
+    index = get_airport_index()
+    return {city: index.codes_by_city(city) for _, city, _ in find_cities(query)}
+
+def _speculative_flight_plugin(query: str) -> bool:
+    # Loading aiohttp, requests and the SerpAPI client takes a few hundred ms on the first flight query
+    import plugins.search_flights  # noqa: F401
+
+    return True
+
+# Cheap, side-effect-free preparation that runs while the router's LLM call classifies the query.
+# Geolocating a missing origin is left to get_flight_info: it may go to the network, and
+# commit() would wait for it on the flight path.
+@registry.register("speculator")
+def _speculator():
+    speculator = Speculator()
+    speculator.register("location", {"weather", "travel"}, extract_location)
+    speculator.register("flight_details", {"flight"}, parse_flight_details)
+    speculator.register("airports", {"flight"}, _speculative_airports)
+    speculator.register("flight_plugin", {"flight"}, _speculative_flight_plugin)
+    return speculator
 
 def human_conversation(agent_response):
     print(f"Human: {agent_response}")
     return input("Your response: ")
 
-def is_weather_intent_keywords(user_input: str) -> bool:
-    """
-    Returns True if the user input is likely asking about the weather.
-    """
-    weather_keywords = [
-        "temperature", "rain", "sunny", "cloudy", "forecast", "wind", "humidity",
-        "snow", "storm", "hot", "cold", "climate", "how is it outside", "is it raining",
-        "is it sunny", "is it snowing", "is it hot", "is it cold", "weather"
-    ]
-    user_input_lower = user_input.lower()
-    return any(keyword in user_input_lower for keyword in weather_keywords)
-
-def is_weather_intent_llm(user_input: str) -> bool:
-    """
-    Uses the LLM to classify if the user input is about weather.
-    """
-    system_prompt = (
-        "You are an intent classifier. "
-        "If the following message is asking about weather, temperature, climate, or atmospheric conditions, respond ONLY with 'yes'. "
-        "Otherwise, respond ONLY with 'no'."
-    )
-    response = llm.invoke([
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=user_input)
-    ])
-    return response.content.strip().lower() == "yes"
-
 # Add an LLM-powered greeting before collecting user query
 def llm_greeting():
-    system_prompt = (
-        "You are a friendly AI assistant. Greet the user and briefly explain that you can help with weather, travel, and flight information. "
-        "Keep your greeting to 2-3 sentences."
-    )
-    response = llm.invoke([
-        SystemMessage(content=system_prompt),
+    response = get_llm().invoke([
+        SystemMessage(content=GREETING_PROMPT),
         HumanMessage(content="Greet the user.")
     ])
     print(f"Agent: {response.content.strip()}")
 
+# The ReAct agents print their reasoning, unless main() streams the turns instead
+agents_verbose = True
+
+def _react_agent(tool: Tool):
+    from langchain.agents import AgentType, initialize_agent
+
+    return initialize_agent([tool], get_llm(), agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION, verbose=agents_verbose)
+
 def init_agents():
     """
-    Initializes the agents and their tools.
-    This function is called at the start of the script to set up the agents.
+    Registers the agents and their tools.
+    Nothing is built here: each agent is created on its first registry.get().
     """
-    global flights_agent, travel_agent, weather_agent
-
     # Create a flight tool using the flight tool function
     flight_tool = Tool(
         name="FlightInfoTool",
-        description="Provides flight information between locations. Input should specify destination, and departure and returns dates.",
+        description=FLIGHT_TOOL_DESCRIPTION,
         func=flight_tool_func
     )
-    
-    # Create a flight agent using the flight tool
-    flights_agent = initialize_agent(
-        [flight_tool],
-        llm,
-        agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-        verbose=True
-    )
 
     travel_tool = Tool(
         name="TravelInfoTool",
-        description="Offers travel information, tips, and recommendations for a given destination using the LLM.",
+        description=TRAVEL_TOOL_DESCRIPTION,
         func=travel_tool_func
     )
 
-    # Create a travel agent using the travel tool
-    travel_agent = initialize_agent(
-        [travel_tool],
-        llm,
-        agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-        verbose=True
-    )
-
     weather_tool = Tool(
         name="WeatherTool",
-        description="Provides current weather information for a given location using the LLM.",
+        description=WEATHER_TOOL_DESCRIPTION,
         func=weather_tool_func
     )
 
-    # Create a weather agent using the weather tool
-    weather_agent = initialize_agent(
-        [weather_tool],
-        llm,
-        agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-        verbose=True
-    )
+    # One ReAct agent per tool
+    registry.register("flight_agent", lambda: _react_agent(flight_tool))
+    registry.register("travel_agent", lambda: _react_agent(travel_tool))
+    registry.register("weather_agent", lambda: _react_agent(weather_tool))
+
+init_agents()
+
+# The router calls the tool functions directly; the ReAct agents only run when a tool needs clarification
+DISPATCH_TOOLS = {
+    "weather": (weather_tool_func, "location"),
+    "travel": (travel_tool_func, "location"),
+    "flight": (flight_tool_func, "query"),
+}
+
+_LAZY_ATTRIBUTES = {"llm": "chat_model", "tool_response_cache": "tool_response_cache", "flight_extractor": "flight_extractor",
+                    "flights_agent": "flight_agent", "travel_agent": "travel_agent", "weather_agent": "weather_agent"}
+
+def __getattr__(name):
+    # Module-level access to the model and agents builds them on first use
+    if name in _LAZY_ATTRIBUTES:
+        return registry.get(_LAZY_ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def run_agent(agent, human_input: str, renderer: StreamRenderer = None) -> str:
+    """
+    Runs one agent turn; with a renderer, tokens and tool events are printed while they stream.
+    """
+    if renderer is None:
+        return agent.run(human_input)
+    output, stats = stream_turn(agent, {"input": human_input}, renderer=renderer)
+    renderer.print_stats(stats)
+    return output["output"]
+
+def run_intent(dispatcher: ToolDispatcher, intent: str, human_input: str, renderer: StreamRenderer = None) -> str:
+    """Answers one turn of a routed intent through the dispatcher (direct tool call or ReAct agent)."""
+    if renderer is None:
+        return dispatcher.run(intent, human_input)
+    return run_agent(dispatcher.as_runnable(intent), human_input, renderer)
+
+AGENT_LABELS = {"weather": "Weather Agent", "travel": "Travel Agent", "flight": "Flight Agent"}
+
+def main(argv: list = None):
+    global agents_verbose
+    argv = sys.argv[1:] if argv is None else argv
+    # Run with --stream to print tokens and tool events as they arrive
+    renderer = StreamRenderer() if "--stream" in argv else None
+    # Run with --react to send every turn through the ReAct agents instead of calling the tools directly
+    dispatcher = ToolDispatcher(DISPATCH_TOOLS, lambda intent: registry.get(f"{intent}_agent"),
+                                mode="react" if "--react" in argv else DEFAULT_DISPATCH_MODE)
+
+    # The agents registered at import are built on first use, so this still applies to them
+    agents_verbose = renderer is None
 
-if __name__ == "__main__":
-    # Create the agents and their tools
-    init_agents()
-    
     # Greet the user using the LLM
     llm_greeting()
 
+    # A single router replaces the weather -> travel -> flight classifier chain
+    router = IntentRouter(get_llm())
+    speculator = registry.get("speculator")
+
+    # The agents are built in the background while the user types the first question
+    registry.warm_up(["weather_agent", "travel_agent", "flight_agent", "flight_extractor", "tool_response_cache"])
+
     # Start the main conversation loop
     while True:
         human_input = input("Human: ")
         if human_input.lower() == 'quit':
+            print(f"Routing stats: {router.stats()}")
+            print(f"Dispatch stats ({dispatcher.mode}): {dispatcher.stats()}")
+            print(f"Speculation stats: {speculator.stats()}")
+            if registry.is_built("tool_response_cache"):
+                print(f"Tool cache stats: {registry.get('tool_response_cache').stats()}")
+            if registry.is_built("flight_extractor"):
+                print(f"Flight extraction stats: {registry.get('flight_extractor').stats()}")
             break
 
-        # Use the weather agent to answer weather-related questions
-        if is_weather_intent_llm(human_input):
-            result = weather_agent.run(human_input)
-            print(f"[Weather Agent]: {result}")
-        # Use the travel agent to answer travel-related questions
-        elif is_travel_intent_llm(human_input):
-            result = travel_agent.run(human_input)
-            print(f"[Travel Agent]: {result}")
-        # Use the flights agent to answer flight-related questions
-        elif is_flight_intent_llm(human_input):
-            result = flights_agent.run(human_input)
-            print(f"[Flight Agent]: {result}")
+        # Queries the keyword fast path cannot route cost an LLM call; prepare tool inputs meanwhile
+        speculations = []
+        decision = router.route(human_input, on_classify=lambda: speculations.append(speculator.start(human_input)))
+        for speculation in speculations:
+            speculation.commit(decision.intent)
+
+        # Use the weather, travel or flights agent to answer questions of its intent
+        if decision.intent in AGENT_LABELS:
+            result = run_intent(dispatcher, decision.intent, human_input, renderer)
+            print(f"[{AGENT_LABELS[decision.intent]}]: {result}")
         else:
-            print("Agent: I am currently being updated to handle weather, travel, and flight information.")
\ No newline at end of file
+            print(f"Agent: {UNSUPPORTED_INTENT_REPLY}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import asyncio
+import os
+
+import aiohttp
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.tools import Tool
+
+from agent_prompts import (
+    WEATHER_TOOL_PROMPT, TRAVEL_TOOL_PROMPT, FLIGHT_EXTRACTION_PROMPT, GREETING_PROMPT,
+    FLIGHT_TOOL_DESCRIPTION, TRAVEL_TOOL_DESCRIPTION, WEATHER_TOOL_DESCRIPTION, UNSUPPORTED_INTENT_REPLY
+)
+from agent_registry import AgentRegistry, registry
+from intent_router import IntentRouter
+from plugins.flight_extraction import FlightDetailExtractor
+from plugins.search_flights import aget_flight_info
+from semantic_cache import SemanticResponseCache
+from tool_dispatch import DEFAULT_DISPATCH_MODE, ToolDispatcher
+
+"""
+Asyncio variant of agents_langchain.py.
+
+The router, the three ReAct agents and their tools all run on ainvoke and aiohttp,
+so one process can serve many conversations at once. A semaphore caps how many
+turns are in flight at the same time. Routed turns call the tool directly and only
+fall back to the ReAct agent when the tool needs clarification (see tool_dispatch.py).
+"""
+
+AGENT_LABELS = {"weather": "Weather Agent", "travel": "Travel Agent", "flight": "Flight Agent"}
+
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", 100))
+
+
+class AsyncTravelAssistant:
+    """
+    Routes each user turn to the weather, travel or flight agent without blocking the event loop.
+    """
+
+    def __init__(self, llm, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, verbose: bool = False,
+                 dispatch_mode: str = DEFAULT_DISPATCH_MODE):
+        self.llm = llm
+        self.router = IntentRouter(llm)
+        # Keyed on bare place names, where a close spelling is often another place
+        self.response_cache = SemanticResponseCache(same_words=True)
+        self.flight_extractor = FlightDetailExtractor(llm, FLIGHT_EXTRACTION_PROMPT)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.session = None
+        self.agents = self._init_agents(verbose)
+        self.dispatcher = ToolDispatcher({
+            "weather": (self.weather_tool_func, "location"),
+            "travel": (self.travel_tool_func, "location"),
+            "flight": (self.flight_tool_func, "query"),
+        }, self.agents.get, mode=dispatch_mode)
+
+    def _init_agents(self, verbose: bool) -> AgentRegistry:
+        """Registers one ReAct agent per intent; each is built on its first use."""
+        tools = {
+            "flight": Tool(name="FlightInfoTool", func=None, coroutine=self.flight_tool_func, description=FLIGHT_TOOL_DESCRIPTION),
+            "travel": Tool(name="TravelInfoTool", func=None, coroutine=self.travel_tool_func, description=TRAVEL_TOOL_DESCRIPTION),
+            "weather": Tool(name="WeatherTool", func=None, coroutine=self.weather_tool_func, description=WEATHER_TOOL_DESCRIPTION),
+        }
+
+        def react_agent(tool):
+            from langchain.agents import AgentType, initialize_agent
+
+            return initialize_agent([tool], self.llm, agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION, verbose=verbose)
+
+        agents = AgentRegistry()
+        for intent, tool in tools.items():
+            agents.register(intent, lambda tool=tool: react_agent(tool))
+        return agents
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # One pooled HTTP session per assistant, created on the running loop.
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession()
+        return self.session
+
+    async def aclose(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    async def _ask_llm(self, prompt: str) -> str:
+        response = await self.llm.ainvoke([HumanMessage(content=prompt)])
+        return response.content
+
+    async def weather_tool_func(self, location: str) -> str:
+        prompt = WEATHER_TOOL_PROMPT.format(location=location)
+        return await self.response_cache.aget_or_call("weather", prompt, lambda: self._ask_llm(prompt), semantic_text=location)
+
+    async def travel_tool_func(self, destination: str) -> str:
+        prompt = TRAVEL_TOOL_PROMPT.format(destination=destination)
+        return await self.response_cache.aget_or_call("travel", prompt, lambda: self._ask_llm(prompt), semantic_text=destination)
+
+    async def extract_flight_details(self, query: str) -> dict:
+        return await self.flight_extractor.aextract(query)
+
+    async def flight_tool_func(self, query: str) -> str:
+        flight_details = await self.extract_flight_details(query)
+        return await aget_flight_info(
+            flight_details.get("origin"), flight_details.get("destination"),
+            flight_details.get("departure_date"), flight_details.get("return_date"),
+            session=await self._get_session()
+        )
+
+    async def greeting(self) -> str:
+        response = await self.llm.ainvoke([
+            SystemMessage(content=GREETING_PROMPT),
+            HumanMessage(content="Greet the user.")
+        ])
+        return response.content.strip()
+
+    async def handle(self, user_input: str):
+        """
+        Answers one user turn and returns (agent_label, answer).
+        Waits for a free slot when max_concurrency turns are already running.
+        """
+        async with self.semaphore:
+            decision = await self.router.aroute(user_input)
+            if decision.intent not in self.dispatcher:
+                return "Agent", UNSUPPORTED_INTENT_REPLY
+            return AGENT_LABELS[decision.intent], await self.dispatcher.arun(decision.intent, user_input)
+
+
+async def main():
+    assistant = AsyncTravelAssistant(registry.get("chat_model"), verbose=True)
+    try:
+        print(f"Agent: {await assistant.greeting()}")
+        # The agents are built in the background while the user types the first question
+        assistant.agents.warm_up()
+        while True:
+            human_input = await asyncio.to_thread(input, "Human: ")
+            if human_input.lower() == 'quit':
+                print(f"Routing stats: {assistant.router.stats()}")
+                print(f"Dispatch stats ({assistant.dispatcher.mode}): {assistant.dispatcher.stats()}")
+                print(f"Tool cache stats: {assistant.response_cache.stats()}")
+                print(f"Flight extraction stats: {assistant.flight_extractor.stats()}")
+                break
+            label, answer = await assistant.handle(human_input)
+            print(f"[{label}]: {answer}")
+    finally:
+        await assistant.aclose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
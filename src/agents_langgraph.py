@@ -1,7 +1,10 @@
 from langgraph.graph import StateGraph
 from langgraph.graph import START, END
 import os
-from langchain_openai import AzureChatOpenAI
+import sys
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain.tools import tool
 from langchain_core.messages import ToolMessage
@@ -11,25 +14,22 @@ from langgraph.graph import MessagesState
 from langgraph.graph import START, END
 from langgraph.prebuilt import tools_condition, ToolNode
 
-from duckduckgo_search import DDGS
+from plugins.web_search import CachedSearch, DDGSProvider, format_results
+from streaming import StreamRenderer, stream_turn
+from agent_registry import registry
+from instrumentation import DEFAULT_TRACE_FILE, TraceCallbackHandler, instrument, span_tree, start_metrics_server
 
 load_dotenv()
 
 ################# Create Open AI model #######################################################
-azure_api_key = os.getenv("AZURE_OPENAI_API_KEY")
-azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-azure_deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
-azure_openai_version= os.getenv("AZURE_OPENAI_API_VERSION")
-
-model = AzureChatOpenAI(
-    api_key=azure_api_key,
-    azure_endpoint=azure_endpoint,
-    deployment_name=azure_deployment_name,
-    openai_api_version=azure_openai_version, # Using a recent API version
-    temperature=0.7 # Example temperature
-)
+# LLM_MODE selects Azure OpenAI (default), the offline stub, or record/replay (see model_factory.py).
+# The model and the three graphs are built on first use and cached in the agent registry, so
+# importing this module compiles nothing; module attributes such as supervisor_agent still work.
 
 ################## Specialized agents tools ##################################################
+# One cached, rate-limited search client shared by the researcher and explainer graphs
+web_search_client = CachedSearch(DDGSProvider(verify=False))
+
 # Define a web search function that uses DuckDuckGo Search
 @tool
 def web_search(query:str) -> str:
@@ -38,80 +38,75 @@ def web_search(query:str) -> str:
     Skip the results that do not have a title or body, or are not in English language, and continue the search till you hit the limit of 5 results.
     If no results are found, return a message indicating that.
     """
-    with DDGS(verify=False) as ddgs:
-        results = ddgs.text(query, max_results=5)
-        if results:
-            output = []
-            for res in results:
-                output.append(
-                    f"Title: {res['title']}\nURL: {res['href']}\nSnippet: {res['body']}\n"
-                )
-            return "\n---\n".join(output)
-        else:
-            return "No results found."
+    return format_results(web_search_client.search(query, max_results=5))
 
-################## Create researcher agent #####################################################
-researcher_model = model
 research_tools = [web_search]
-research_model_with_tools = model.bind_tools(research_tools)
 
-def researcher_llm(state):
+################## Create researcher agent #####################################################
+def build_researcher_graph(model) -> StateGraph:
+    research_model_with_tools = model.bind_tools(research_tools)
+
+    def researcher_llm(state):
 
-    msg_content = ("You are a helpful learning assistant. You search on "
-        "the internet and provide the answer using different sources. "
-        "You also cite those sources.")
-    message = [SystemMessage(content=msg_content)] + state['messages']
+        msg_content = ("You are a helpful learning assistant. You search on "
+            "the internet and provide the answer using different sources. "
+            "You also cite those sources.")
+        message = [SystemMessage(content=msg_content)] + state['messages']
 
-    return {"messages": research_model_with_tools.invoke(message)}
+        return {"messages": research_model_with_tools.invoke(message)}
 
-researcher_graph = StateGraph(MessagesState)
-researcher_graph.add_node("researcher", researcher_llm)
-researcher_graph.add_node("tools", ToolNode(research_tools))
+    researcher_graph = StateGraph(MessagesState)
+    researcher_graph.add_node("researcher", researcher_llm)
+    researcher_graph.add_node("tools", ToolNode(research_tools))
 
-researcher_graph.add_edge(START, "researcher")
-researcher_graph.add_conditional_edges("researcher", tools_condition)
+    researcher_graph.add_edge(START, "researcher")
+    researcher_graph.add_conditional_edges("researcher", tools_condition)
+    return researcher_graph
 
-researcher_agent = researcher_graph.compile()
+@registry.register("researcher_agent")
+def _researcher_agent():
+    return build_researcher_graph(registry.get("chat_model")).compile(name="researcher_agent")
 
 # Uncomment the following lines to test the researcher agent
 # This is a test for the researcher agent that searches the internet for the query
 # user_input = "What is the most populare agentic framework?"
-# resp = researcher_agent.invoke({"messages": [HumanMessage(user_input)]})
+# resp = registry.get("researcher_agent").invoke({"messages": [HumanMessage(user_input)]})
 # print(resp['messages'][-1].content[:500] + ' ...')
 
 ################## Create explainer agent ###################################################
-explainer_model = model
+def build_explainer_graph(model) -> StateGraph:
 
-def explainer_llm(state):
+    def explainer_llm(state):
 
-    msg_content = ("You are a helpful teacher. You explain any topic, "
-        "regardless how difficult it is, in a very simple way. Your "
-        "students are children and they do not understand many things."
-        " To do so, you use examples, stories and allegories as needed."
-        "Look on the internet any concept you don't understand.")
+        msg_content = ("You are a helpful teacher. You explain any topic, "
+            "regardless how difficult it is, in a very simple way. Your "
+            "students are children and they do not understand many things."
+            " To do so, you use examples, stories and allegories as needed."
+            "Look on the internet any concept you don't understand.")
 
-    message = [SystemMessage(content=msg_content)] + state['messages']
+        message = [SystemMessage(content=msg_content)] + state['messages']
 
-    return {"messages": explainer_model.invoke(message)}
+        return {"messages": model.invoke(message)}
 
-explainer_graph = StateGraph(MessagesState)
-explainer_graph.add_node("explainer", explainer_llm)
-explainer_graph.add_node("tools", ToolNode(research_tools))
+    explainer_graph = StateGraph(MessagesState)
+    explainer_graph.add_node("explainer", explainer_llm)
+    explainer_graph.add_node("tools", ToolNode(research_tools))
 
-explainer_graph.add_edge(START, "explainer")
-explainer_graph.add_conditional_edges("explainer", tools_condition)
+    explainer_graph.add_edge(START, "explainer")
+    explainer_graph.add_conditional_edges("explainer", tools_condition)
+    return explainer_graph
 
-explainer_agent = explainer_graph.compile()
+@registry.register("explainer_agent")
+def _explainer_agent():
+    return build_explainer_graph(registry.get("chat_model")).compile(name="explainer_agent")
 
 # Uncomment the following lines to test the explainer agent
 # This is a test for the explainer agent that uses researcher agent to search for the concept
 # user_input = "Explain the concept of entropy in physics."
-# resp = explainer_agent.invoke({"messages": [HumanMessage(user_input)]})
+# resp = registry.get("explainer_agent").invoke({"messages": [HumanMessage(user_input)]})
 # print(resp['messages'][-1].content[:500] + ' ...')
 
 ###################### Create generalist agent ##############################################
-graph = StateGraph(MessagesState)
-
 @tool
 def explainer(concept:str) -> str: 
     """Explains a concept in a simple way using examples, stories and allegories.
@@ -122,8 +117,7 @@ def explainer(concept:str) -> str:
     Returns:
         str: explanation of the concept.
     """
-    resp = explainer_agent.invoke({"messages": [HumanMessage(concept)]})
-    return resp['messages'][-1]
+    return _run_subagent("explainer_agent", concept)
 
 @tool
 def researcher(query:str) -> str:
@@ -135,81 +129,165 @@ def researcher(query:str) -> str:
     Returns:
         str: best answer to the query.
     """
-    resp = researcher_agent.invoke({"messages": [HumanMessage(query)]})
-    return resp['messages'][-1]
+    return _run_subagent("researcher_agent", query)
 
 # Bind the agents to the model
 supervisor_tools = [researcher, explainer]
-supervisor_model = model
-supervisor_model_with_tools = model.bind_tools(supervisor_tools)
-
-# Define the supervisor
-def supervisor(state):
-
-    msg_content = ("You are a helpful assistant, "
-        "you use the tools at your disposal to provide the best answer."
-        "You should always search on the internet before answering, by using the researcher tool, "
-        "and explain the answer in a very simple way using examples, "
-        "stories and allegories, by using the explainer tool."
-        "You have to provide the aggregated answers in a single message."
-    )
-
-    message = [SystemMessage(content=msg_content)] + state['messages']
-
-    # return {"messages": supervisor_model_with_tools.invoke(message)}
-    response = supervisor_model_with_tools.invoke(message)
-    # If the model calls a tool
-    if hasattr(response, "tool_calls"):
-        tool_call = response.tool_calls[0]
-        tool_name = tool_call["name"]
-        tool_args = tool_call["args"]
-        tool_id = tool_call["id"]
-
-        if tool_name == "explainer":
-            # result_msg = explainer(**tool_args)
-            result_msg = explainer(tool_args["concept"])
-            result = result_msg.content if hasattr(result_msg, "content") else str(result_msg)
-        elif tool_name == "researcher":
-            # result_msg = researcher(**tool_args)
-            result_msg = researcher(tool_args["query"])
-            result = result_msg.content if hasattr(result_msg, "content") else str(result_msg)
-
-        return {
-            "messages": [
-                response,
-                ToolMessage(tool_call_id=tool_id, content=result)
-            ]
-        }
-
-    return {"messages": [response]}
-
-# Create the graph
-graph = StateGraph(MessagesState)
-graph.add_node("supervisor", supervisor)
-graph.add_node("tools", ToolNode(supervisor_tools))
-
-graph.add_edge(START, "supervisor")
-graph.add_edge("tools", "supervisor")
-graph.add_conditional_edges("supervisor", tools_condition)
-
-supervisor_agent = graph.compile()
+supervisor_tools_by_name = {t.name: t for t in supervisor_tools}
+
+# Sub-agent calls requested in the same supervisor turn run side by side on this pool.
+# A running thread cannot be cancelled, so the sub-graphs bound their own work instead: at
+# most SUBAGENT_RECURSION_LIMIT steps, and no new step once the turn's deadline has passed.
+# A timed-out branch therefore holds its worker for at most the one step (a model call or
+# a search) it was in when the deadline passed.
+subagent_timeout_s = float(os.getenv("SUBAGENT_TIMEOUT_S", 120))
+subagent_recursion_limit = int(os.getenv("SUBAGENT_RECURSION_LIMIT", 10))
+subagent_pool = ThreadPoolExecutor(max_workers=int(os.getenv("SUBAGENT_MAX_WORKERS", 8)), thread_name_prefix="subagent")
+
+# Deadline (time.monotonic()) of the supervisor turn a sub-agent branch runs for
+_subagent_deadline = contextvars.ContextVar("subagent_deadline", default=None)
+
+def _run_subagent(name: str, text: str):
+    """
+    Runs the sub-agent graph name step by step and returns its last message. Raises
+    TimeoutError instead of starting a step after the branch's deadline.
+    """
+    deadline = _subagent_deadline.get()
+    state = None
+    for state in registry.get(name).stream({"messages": [HumanMessage(text)]}, stream_mode="values",
+                                           config={"recursion_limit": subagent_recursion_limit}):
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError(f"{name} stopped at the sub-agent deadline")
+    return state["messages"][-1]
+
+def _run_supervisor_tool(tool_call) -> str:
+    result_msg = supervisor_tools_by_name[tool_call["name"]].invoke(tool_call["args"])
+    return result_msg.content if hasattr(result_msg, "content") else str(result_msg)
+
+def run_tool_calls_parallel(tool_calls, timeout_s: float = None) -> list:
+    """
+    Runs the researcher/explainer tool calls of one supervisor turn in parallel, each
+    bounded by its own timeout, and returns their ToolMessages in tool_calls order.
+    """
+    timeout_s = subagent_timeout_s if timeout_s is None else timeout_s
+    deadline = time.monotonic() + timeout_s
+    futures = []
+    for tool_call in tool_calls:
+        if tool_call["name"] not in supervisor_tools_by_name:
+            futures.append(None)
+            continue
+        # Copy the context so callbacks and run config follow each branch into its thread,
+        # together with the deadline the branch's sub-graph stops at
+        context = contextvars.copy_context()
+        context.run(_subagent_deadline.set, deadline)
+        futures.append(subagent_pool.submit(context.run, _run_supervisor_tool, tool_call))
+
+    tool_messages = []
+    for tool_call, future in zip(tool_calls, futures):
+        if future is None:
+            content, status = f"Unknown tool: {tool_call['name']}", "error"
+        else:
+            try:
+                content, status = future.result(timeout=max(0.0, deadline - time.monotonic())), "success"
+            except FuturesTimeoutError:
+                # Also raised by a branch that stopped at the deadline; one still running stops
+                # by itself before its next step, cancel() could not interrupt it
+                content, status = f"The {tool_call['name']} tool did not answer within {timeout_s:.0f} seconds.", "error"
+            except Exception as e:
+                content, status = f"The {tool_call['name']} tool failed: {e}", "error"
+        tool_messages.append(ToolMessage(tool_call_id=tool_call["id"], content=content, status=status))
+    return tool_messages
+
+def build_supervisor_graph(model) -> StateGraph:
+    supervisor_model_with_tools = model.bind_tools(supervisor_tools)
+
+    # Define the supervisor
+    def supervisor(state):
+
+        msg_content = ("You are a helpful assistant, "
+            "you use the tools at your disposal to provide the best answer."
+            "You should always search on the internet before answering, by using the researcher tool, "
+            "and explain the answer in a very simple way using examples, "
+            "stories and allegories, by using the explainer tool."
+            "You have to provide the aggregated answers in a single message."
+        )
+
+        message = [SystemMessage(content=msg_content)] + state['messages']
+
+        response = supervisor_model_with_tools.invoke(message)
+        # If the model calls tools, run every call of this turn concurrently
+        if response.tool_calls:
+            return {"messages": [response] + run_tool_calls_parallel(response.tool_calls)}
+
+        return {"messages": [response]}
+
+    # Create the graph
+    graph = StateGraph(MessagesState)
+    graph.add_node("supervisor", supervisor)
+    graph.add_node("tools", ToolNode(supervisor_tools))
+
+    graph.add_edge(START, "supervisor")
+    graph.add_edge("tools", "supervisor")
+    graph.add_conditional_edges("supervisor", tools_condition)
+    return graph
+
+@registry.register("supervisor_agent")
+def _supervisor_agent():
+    return build_supervisor_graph(registry.get("chat_model")).compile(name="supervisor_agent")
 
 # _ = (
-#     supervisor_agent
+#     registry.get("supervisor_agent")
 #     .get_graph()
 #     .draw_mermaid_png(output_file_path='imgs/supervisor_graph.png')
 # )
 
+_LAZY_ATTRIBUTES = {"model": "chat_model", "researcher_agent": "researcher_agent",
+                    "explainer_agent": "explainer_agent", "supervisor_agent": "supervisor_agent"}
+
+def __getattr__(name):
+    # Module-level access to the compiled graphs builds them on first use
+    if name in _LAZY_ATTRIBUTES:
+        return registry.get(_LAZY_ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 ###################### Capture the user queries ##############################################
-while True:
-    user_query = input("Ask a question (type 'quit' to exit): ")
-    if user_query.strip().lower() == 'quit':
-        print("Exiting conversation.")
-        break
-    state = {"messages": [HumanMessage(user_query)]}
-    resp = supervisor_agent.invoke(state)
-    for message in resp['messages']:
-        message.pretty_print()
+def main(argv: list = None):
+    argv = sys.argv[1:] if argv is None else argv
+    # Run with --stream to print tokens and tool events (including sub-agent output) as they arrive
+    stream_output = "--stream" in argv
+    renderer = StreamRenderer()
+
+    # Every turn is traced to AGENT_TRACE_FILE (empty = off); METRICS_PORT serves Prometheus
+    # metrics and --trace prints the span tree of each turn
+    tracer = TraceCallbackHandler(trace_file=DEFAULT_TRACE_FILE or None)
+    if os.getenv("METRICS_PORT"):
+        start_metrics_server(tracer.metrics, int(os.getenv("METRICS_PORT")))
+    print_trace = "--trace" in argv
+
+    # The graphs compile in the background while the user types the first question
+    registry.warm_up(["supervisor_agent", "researcher_agent", "explainer_agent"])
+    traced_agent = None
+
+    while True:
+        user_query = input("Ask a question (type 'quit' to exit): ")
+        if user_query.strip().lower() == 'quit':
+            print("Exiting conversation.")
+            break
+        if traced_agent is None:
+            traced_agent = instrument(registry.get("supervisor_agent"), tracer)
+        state = {"messages": [HumanMessage(user_query)]}
+        if stream_output:
+            _, stats = stream_turn(traced_agent, state, renderer=renderer)
+            renderer.print_stats(stats)
+        else:
+            resp = traced_agent.invoke(state)
+            for message in resp['messages']:
+                message.pretty_print()
+        if print_trace:
+            print(span_tree(tracer.last_trace))
+
+if __name__ == "__main__":
+    main()
 
 """
 **** Sample queries that will trigger one of the two agents (researcher, explainer) ****
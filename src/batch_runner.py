@@ -0,0 +1,300 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import threading
+import time
+from contextvars import ContextVar
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+from agent_registry import registry
+from instrumentation import _token_usage
+
+"""
+Batch runner for offline evaluation: streams queries from a JSONL file through one of the
+agents and appends one result line per query to an output JSONL file.
+
+    python batch_runner.py sample_queries.jsonl --target router --out results.jsonl --workers 16
+    python batch_runner.py queries.jsonl --target supervisor --batch-size 32 --out supervisor.jsonl
+
+Targets: "router" (intent router + tool dispatch of agents_langchain_async.py), "supervisor"
+(the langgraph supervisor) and "travel" (the memory agent graph, one fresh thread per query).
+Input lines are {"query": "...", "id": ...}; the id defaults to the line number.
+
+Queries are read --batch-size at a time. A batch goes through the model's abatch() API: the
+graphs are abatch()ed directly, and the router classifies every query that misses its keyword
+fast path in one abatch() before the tools run concurrently. --workers bounds the concurrency
+within a batch. Each result carries the routing decision (router target), the tool calls,
+model calls, token counts and latency, and is flushed as soon as its batch completes, so the
+output file doubles as the checkpoint: a rerun skips every id already in it and resumes where
+a crashed run stopped (--no-resume starts over).
+"""
+
+TARGETS = ("router", "supervisor", "travel")
+DEFAULT_WORKERS = int(os.getenv("BATCH_WORKERS", 16))
+DEFAULT_BATCH_SIZE = int(os.getenv("BATCH_SIZE", 64))
+
+
+class RunRecorder(BaseCallbackHandler):
+    """Collects the tool calls, model calls, token usage and root-run latency of one query."""
+
+    def __init__(self):
+        self.tool_calls = []
+        self.model_calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.started = None
+        self.ended = None
+        self._lock = threading.Lock()
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        if parent_run_id is None and self.started is None:
+            self.started = time.perf_counter()
+
+    def on_chain_end(self, outputs, *, run_id, parent_run_id=None, **kwargs):
+        if parent_run_id is None:
+            self.ended = time.perf_counter()
+
+    def on_chain_error(self, error, *, run_id, parent_run_id=None, **kwargs):
+        if parent_run_id is None:
+            self.ended = time.perf_counter()
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        with self._lock:
+            self.tool_calls.append(kwargs.get("name") or (serialized or {}).get("name"))
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        with self._lock:
+            self.model_calls += 1
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        with self._lock:
+            self.model_calls += 1
+
+    def on_llm_end(self, response, **kwargs):
+        prompt, completion = _token_usage(response)
+        with self._lock:
+            self.input_tokens += prompt
+            self.output_tokens += completion
+
+    def fields(self) -> dict:
+        return {
+            "tool_calls": self.tool_calls,
+            "model_calls": self.model_calls,
+            "tokens": {"input": self.input_tokens, "output": self.output_tokens},
+        }
+
+# The router target's tools call the model without a config; the hook attaches the recorder of
+# the query being processed (one asyncio task per query) to those calls as well
+_active_recorder = ContextVar("batch_run_recorder", default=None)
+register_configure_hook(_active_recorder, inheritable=True)
+
+
+def iter_queries(path: str):
+    """Yields {"id", "query", ...} per non-blank line; the id defaults to the 1-based line number."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if not isinstance(item, dict) or not isinstance(item.get("query"), str):
+                raise ValueError(f"{path}:{line_no}: expected a JSON object with a 'query' string")
+            item.setdefault("id", line_no)
+            yield item
+
+def completed_ids(out_path: str) -> set:
+    """
+    Ids already written to out_path. A torn last line (the run died mid-write) is cut off so
+    appending resumes on a clean line boundary.
+    """
+    if not os.path.exists(out_path):
+        return set()
+    ids, good_bytes = set(), 0
+    with open(out_path, "rb") as f:
+        for line in f:
+            try:
+                ids.add(json.loads(line)["id"])
+            except (ValueError, KeyError, TypeError):
+                break
+            if not line.endswith(b"\n"):
+                break
+            good_bytes += len(line)
+    if good_bytes != os.path.getsize(out_path):
+        with open(out_path, "r+b") as f:
+            f.truncate(good_bytes)
+        ids = completed_ids(out_path)
+    return ids
+
+def _batches(items, size: int):
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+def _record(item: dict, target: str, answer, error, latency_s: float, recorder: RunRecorder, **extra) -> dict:
+    return {
+        "id": item["id"],
+        "query": item["query"],
+        "target": target,
+        "answer": answer,
+        "error": error,
+        **extra,
+        **recorder.fields(),
+        "latency_ms": round(latency_s * 1000, 1),
+    }
+
+
+class RouterTarget:
+    """Intent router plus tool dispatch, as served by AsyncTravelAssistant."""
+
+    name = "router"
+
+    def __init__(self, workers: int):
+        from agents_langchain_async import AsyncTravelAssistant
+
+        self.workers = workers
+        self.assistant = AsyncTravelAssistant(registry.get("chat_model"), max_concurrency=workers)
+
+    async def _run_one(self, item: dict, decision, recorder: RunRecorder) -> dict:
+        from agent_prompts import UNSUPPORTED_INTENT_REPLY
+        from tool_dispatch import last_dispatch_mode
+
+        _active_recorder.set(recorder)
+        dispatcher = self.assistant.dispatcher
+        answer = error = mode = None
+        started = time.perf_counter()
+        try:
+            if decision.intent in dispatcher:
+                async with self.assistant.semaphore:
+                    answer = await dispatcher.arun(decision.intent, item["query"])
+                mode = last_dispatch_mode.get()
+            else:
+                answer = UNSUPPORTED_INTENT_REPLY
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        return _record(item, self.name, answer, error, time.perf_counter() - started, recorder,
+                       route={"intent": decision.intent, "source": decision.source}, dispatch=mode)
+
+    async def run_batch(self, items: list) -> list:
+        recorders = [RunRecorder() for _ in items]
+        started = time.perf_counter()
+        decisions = await self.assistant.router.abatch_route(
+            [item["query"] for item in items], configs=[{"callbacks": [r]} for r in recorders], max_concurrency=self.workers
+        )
+        route_s = time.perf_counter() - started
+        records = await asyncio.gather(*(self._run_one(*args) for args in zip(items, decisions, recorders)))
+        for record in records:
+            if record["route"]["source"] == "llm":
+                # The classification was shared by the batch; its wall time is part of every such query
+                record["latency_ms"] = round(record["latency_ms"] + route_s * 1000, 1)
+        return records
+
+    async def aclose(self):
+        await self.assistant.aclose()
+
+
+class GraphTarget:
+    """A compiled LangGraph graph taking {"messages": [...]}, run with abatch()."""
+
+    def __init__(self, name: str, graph, workers: int):
+        self.name = name
+        self.graph = graph
+        self.workers = workers
+
+    async def run_batch(self, items: list) -> list:
+        recorders = [RunRecorder() for _ in items]
+        configs = [{"callbacks": [recorder], "max_concurrency": self.workers} for recorder in recorders]
+        started = time.perf_counter()
+        outputs = await self.graph.abatch([{"messages": [("user", item["query"])]} for item in items], config=configs,
+                                          return_exceptions=True)
+        finished = time.perf_counter()
+        records = []
+        for item, output, recorder in zip(items, outputs, recorders):
+            latency = (recorder.ended or finished) - (recorder.started or started)
+            if isinstance(output, Exception):
+                records.append(_record(item, self.name, None, f"{type(output).__name__}: {output}", latency, recorder))
+            else:
+                records.append(_record(item, self.name, output["messages"][-1].content, None, latency, recorder))
+        return records
+
+    async def aclose(self):
+        pass
+
+def build_target(target: str, workers: int):
+    if target == "router":
+        return RouterTarget(workers)
+    if target == "supervisor":
+        import agents_langgraph  # noqa: F401  (registers the supervisor graphs)
+
+        return GraphTarget(target, registry.get("supervisor_agent"), workers)
+    if target == "travel":
+        from agent_memory_langgraph import build_graph
+
+        # No checkpointer: every query is an independent one-turn conversation
+        return GraphTarget(target, build_graph(registry.get("chat_model")).compile(), workers)
+    raise ValueError(f"Unknown target '{target}', expected one of {TARGETS}")
+
+
+def summarize(records: list, elapsed: float, skipped: int) -> dict:
+    latencies = sorted(record["latency_ms"] for record in records)
+    return {
+        "processed": len(records),
+        "skipped_from_checkpoint": skipped,
+        "errors": sum(1 for record in records if record["error"]),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_q_per_s": round(len(records) / elapsed, 1) if elapsed else None,
+        "p50_ms": statistics.median(latencies) if latencies else None,
+        "p99_ms": latencies[min(len(latencies) - 1, round(0.99 * len(latencies)) - 1)] if latencies else None,
+        "model_calls": sum(record["model_calls"] for record in records),
+        "input_tokens": sum(record["tokens"]["input"] for record in records),
+        "output_tokens": sum(record["tokens"]["output"] for record in records),
+    }
+
+async def run(input_path: str, target: str, out_path: str, workers: int = DEFAULT_WORKERS,
+              batch_size: int = DEFAULT_BATCH_SIZE, resume: bool = True, repeat: int = 1, target_runner=None) -> dict:
+    """
+    Processes every query of input_path not yet in out_path and returns a summary. repeat > 1
+    cycles the input that many times, with ids suffixed "#<n>", to build larger workloads.
+    """
+    done = completed_ids(out_path) if resume else set()
+    items = (
+        dict(item, id=item["id"] if n == 0 else f"{item['id']}#{n}")
+        for n in range(repeat) for item in iter_queries(input_path)
+    )
+    pending = (item for item in items if item["id"] not in done)
+    runner = target_runner or build_target(target, workers)
+    records = []
+    started = time.perf_counter()
+    try:
+        with open(out_path, "a" if resume else "w", encoding="utf-8") as out:
+            for batch in _batches(pending, batch_size):
+                batch_records = await runner.run_batch(batch)
+                out.write("".join(json.dumps(record, default=str) + "\n" for record in batch_records))
+                out.flush()
+                os.fsync(out.fileno())
+                records += batch_records
+                print(f"  {len(records)} processed ({len(done)} already done)", flush=True)
+    finally:
+        await runner.aclose()
+    return summarize(records, time.perf_counter() - started, len(done))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a JSONL file of queries through an agent and write JSONL results.")
+    parser.add_argument("input", help="JSONL file with one {\"query\": ...} object per line")
+    parser.add_argument("--target", choices=TARGETS, default="router")
+    parser.add_argument("--out", default="batch_results.jsonl", help="results file, also used to resume")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="concurrent queries within a batch")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="queries per abatch() call")
+    parser.add_argument("--repeat", type=int, default=1, help="cycle the input file this many times")
+    parser.add_argument("--no-resume", action="store_true", help="overwrite --out instead of skipping completed ids")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run(args.input, args.target, args.out, args.workers, args.batch_size,
+                              resume=not args.no_resume, repeat=args.repeat))
+    for key, value in summary.items():
+        print(f"{key:>24}: {value}")
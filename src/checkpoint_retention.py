@@ -0,0 +1,304 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+"""
+Retention and compaction for the SqliteSaver checkpoint database (memory.db).
+
+SqliteSaver keeps every checkpoint of every thread forever. Because each checkpoint holds
+the complete channel values, only the most recent ones are needed to resume a thread; this
+module prunes older checkpoints (and their pending writes) in batched transactions, folds
+the WAL back into the main file and reclaims free pages with VACUUM, either on demand
+or from a background thread.
+
+CLI (run from the repository root):
+    python src/checkpoint_retention.py stats   --db memory.db
+    python src/checkpoint_retention.py compact --db memory.db [--thread 2] --keep 20
+    python src/checkpoint_retention.py export  --db memory.db --thread 2 --out thread-2.json
+    python src/checkpoint_retention.py benchmark --turns 10000 --keep 20
+"""
+
+DEFAULT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", 50))
+DEFAULT_INTERVAL_S = float(os.getenv("CHECKPOINT_MAINTENANCE_INTERVAL_S", 300))
+DEFAULT_VACUUM_EVERY = int(os.getenv("CHECKPOINT_VACUUM_EVERY", 12))
+DEFAULT_BATCH_SIZE = 500
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """Opens a maintenance connection that waits for the agent's writes instead of failing."""
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+def _has_checkpoint_tables(conn: sqlite3.Connection) -> bool:
+    row = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='checkpoints'").fetchone()
+    return row is not None
+
+def list_threads(conn: sqlite3.Connection) -> list:
+    if not _has_checkpoint_tables(conn):
+        return []
+    return [row[0] for row in conn.execute("SELECT DISTINCT thread_id FROM checkpoints ORDER BY thread_id")]
+
+def prune_thread(conn: sqlite3.Connection, thread_id: str, keep_last: int = DEFAULT_KEEP_LAST,
+                 batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Deletes all but the keep_last newest checkpoints of every namespace of thread_id, together
+    with their writes, in transactions of at most batch_size checkpoints.
+    Checkpoint ids are time-ordered (uuid6), so id order is creation order.
+    Returns the number of checkpoints deleted.
+    """
+    keep_last = max(1, keep_last)
+    deleted = 0
+    namespaces = [row[0] for row in conn.execute(
+        "SELECT DISTINCT checkpoint_ns FROM checkpoints WHERE thread_id = ?", (thread_id,)
+    )]
+    for checkpoint_ns in namespaces:
+        stale = [row[0] for row in conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, keep_last)
+        )]
+        for start in range(0, len(stale), batch_size):
+            batch = stale[start:start + batch_size]
+            placeholders = ",".join("?" * len(batch))
+            with conn:
+                conn.execute(
+                    f"DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id IN ({placeholders})",
+                    (thread_id, checkpoint_ns, *batch)
+                )
+                conn.execute(
+                    f"DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id IN ({placeholders})",
+                    (thread_id, checkpoint_ns, *batch)
+                )
+            deleted += len(batch)
+    return deleted
+
+def prune_all(conn: sqlite3.Connection, keep_last: int = DEFAULT_KEEP_LAST, batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    return {thread_id: prune_thread(conn, thread_id, keep_last, batch_size) for thread_id in list_threads(conn)}
+
+def wal_checkpoint(conn: sqlite3.Connection, mode: str = "TRUNCATE"):
+    """Copies the WAL into the main database file; TRUNCATE also resets the WAL file to zero bytes."""
+    return conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+
+def vacuum(conn: sqlite3.Connection):
+    conn.execute("VACUUM")
+
+def file_sizes(db_path: str) -> dict:
+    sizes = {}
+    for suffix in ("", "-wal", "-shm"):
+        path = db_path + suffix
+        sizes[os.path.basename(path)] = os.path.getsize(path) if os.path.exists(path) else 0
+    return sizes
+
+def thread_storage(conn: sqlite3.Connection) -> dict:
+    """Returns {thread_id: {"checkpoints", "checkpoint_bytes", "writes", "write_bytes"}}."""
+    if not _has_checkpoint_tables(conn):
+        return {}
+    storage = {}
+    for thread_id, count, size in conn.execute(
+        "SELECT thread_id, COUNT(*), COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) FROM checkpoints GROUP BY thread_id"
+    ):
+        storage[thread_id] = {"checkpoints": count, "checkpoint_bytes": size, "writes": 0, "write_bytes": 0}
+    for thread_id, count, size in conn.execute(
+        "SELECT thread_id, COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM writes GROUP BY thread_id"
+    ):
+        entry = storage.setdefault(thread_id, {"checkpoints": 0, "checkpoint_bytes": 0})
+        entry.update({"writes": count, "write_bytes": size})
+    return storage
+
+def compact(db_path: str, keep_last: int = DEFAULT_KEEP_LAST, thread_id: str = None, run_vacuum: bool = True) -> dict:
+    """Prunes one thread (or all), checkpoints the WAL and optionally vacuums; returns a before/after report."""
+    conn = connect(db_path)
+    try:
+        before = file_sizes(db_path)
+        if thread_id is None:
+            deleted = prune_all(conn, keep_last)
+        else:
+            deleted = {thread_id: prune_thread(conn, thread_id, keep_last)}
+        if run_vacuum:
+            vacuum(conn)
+        wal_checkpoint(conn)
+        return {"deleted": deleted, "before": before, "after": file_sizes(db_path)}
+    finally:
+        conn.close()
+
+def export_thread(db_path: str, thread_id: str, out_path: str) -> int:
+    """Writes every checkpoint of thread_id, newest first and deserialized to JSON, to out_path."""
+    from langchain_core.load import dumpd
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    try:
+        saver = SqliteSaver(conn)
+        records = []
+        for item in saver.list({"configurable": {"thread_id": thread_id}}):
+            records.append({
+                "config": item.config,
+                "parent_config": item.parent_config,
+                "metadata": item.metadata,
+                "checkpoint": item.checkpoint,
+            })
+    finally:
+        conn.close()
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(records, f, default=dumpd, indent=2)
+    return len(records)
+
+
+class CheckpointMaintenance:
+    """
+    Background thread that periodically prunes every thread to keep_last checkpoints,
+    truncates the WAL and, every vacuum_every runs, vacuums the database.
+    """
+
+    def __init__(self, db_path: str, keep_last: int = DEFAULT_KEEP_LAST, interval_s: float = DEFAULT_INTERVAL_S,
+                 vacuum_every: int = DEFAULT_VACUUM_EVERY):
+        self.db_path = db_path
+        self.keep_last = keep_last
+        self.interval_s = interval_s
+        self.vacuum_every = vacuum_every
+        self.runs = 0
+        self.last_report = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self) -> dict:
+        conn = connect(self.db_path)
+        try:
+            started = time.perf_counter()
+            deleted = prune_all(conn, self.keep_last)
+            self.runs += 1
+            vacuumed = self.vacuum_every > 0 and self.runs % self.vacuum_every == 0
+            if vacuumed:
+                vacuum(conn)
+            wal_checkpoint(conn)
+            self.last_report = {
+                "deleted": sum(deleted.values()),
+                "vacuumed": vacuumed,
+                "elapsed_s": round(time.perf_counter() - started, 3),
+                "files": file_sizes(self.db_path),
+                "threads": thread_storage(conn),
+            }
+            return self.last_report
+        finally:
+            conn.close()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.run_once()
+            except sqlite3.Error as e:
+                self.last_report = {"error": str(e)}
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="checkpoint-maintenance", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def benchmark(turns: int, keep_last: int, compact_every: int, workdir: str = None) -> dict:
+    """
+    Runs turns synthetic turns through a one-node MessagesState graph checkpointed in SQLite,
+    once without retention and once compacting every compact_every turns, and reports file
+    size and resume latency (open a fresh connection, read the state, run one more turn).
+    The node keeps a fixed window of messages so per-checkpoint size stays constant and
+    the comparison isolates checkpoint count (what retention controls) from state size.
+    """
+    import tempfile
+    from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage
+    from langgraph.checkpoint.sqlite import SqliteSaver
+    from langgraph.graph import StateGraph, MessagesState, START
+
+    def reply(state):
+        messages = state["messages"]
+        stale = [RemoveMessage(id=m.id) for m in messages[:-9]]
+        return {"messages": stale + [AIMessage(content=f"Reply to: {messages[-1].content}")]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("reply", reply)
+    builder.add_edge(START, "reply")
+    config = {"configurable": {"thread_id": "bench"}}
+    workdir = workdir or tempfile.mkdtemp(prefix="checkpoint-bench-")
+    results = {}
+
+    for label, retention in (("without_compaction", False), ("with_compaction", True)):
+        db_path = os.path.join(workdir, f"{label}.db")
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        graph = builder.compile(checkpointer=SqliteSaver(conn))
+        started = time.perf_counter()
+        for turn in range(turns):
+            graph.invoke({"messages": [HumanMessage(f"Turn {turn}: what is the weather in Toronto?")]}, config)
+            if retention and (turn + 1) % compact_every == 0:
+                prune_thread(conn, "bench", keep_last)
+        if retention:
+            prune_thread(conn, "bench", keep_last)
+            vacuum(conn)
+        wal_checkpoint(conn)
+        run_s = time.perf_counter() - started
+        conn.close()
+
+        resume_started = time.perf_counter()
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        graph = builder.compile(checkpointer=SqliteSaver(conn))
+        graph.get_state(config)
+        state_read_s = time.perf_counter() - resume_started
+        graph.invoke({"messages": [HumanMessage("One more question")]}, config)
+        resume_s = time.perf_counter() - resume_started
+        storage = thread_storage(conn)["bench"]
+        conn.close()
+
+        results[label] = {
+            "turns": turns,
+            "run_s": round(run_s, 2),
+            "checkpoints": storage["checkpoints"],
+            "file_bytes": sum(file_sizes(db_path).values()),
+            "state_read_ms": round(state_read_s * 1000, 2),
+            "resume_turn_ms": round(resume_s * 1000, 2),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checkpoint retention and compaction for SqliteSaver databases.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    stats_parser = subparsers.add_parser("stats", help="report per-thread storage and file sizes")
+    stats_parser.add_argument("--db", default="memory.db")
+
+    compact_parser = subparsers.add_parser("compact", help="prune old checkpoints, truncate the WAL and vacuum")
+    compact_parser.add_argument("--db", default="memory.db")
+    compact_parser.add_argument("--thread", default=None, help="thread id (default: all threads)")
+    compact_parser.add_argument("--keep", type=int, default=DEFAULT_KEEP_LAST)
+    compact_parser.add_argument("--no-vacuum", action="store_true")
+
+    export_parser = subparsers.add_parser("export", help="export a thread's checkpoints as JSON")
+    export_parser.add_argument("--db", default="memory.db")
+    export_parser.add_argument("--thread", required=True)
+    export_parser.add_argument("--out", required=True)
+
+    bench_parser = subparsers.add_parser("benchmark", help="compare file size and resume latency with and without compaction")
+    bench_parser.add_argument("--turns", type=int, default=10000)
+    bench_parser.add_argument("--keep", type=int, default=20)
+    bench_parser.add_argument("--compact-every", type=int, default=500)
+
+    args = parser.parse_args()
+    if args.command == "stats":
+        conn = sqlite3.connect(args.db)
+        report = {"files": file_sizes(args.db), "threads": thread_storage(conn)}
+        conn.close()
+    elif args.command == "compact":
+        report = compact(args.db, args.keep, args.thread, run_vacuum=not args.no_vacuum)
+    elif args.command == "export":
+        report = {"exported_checkpoints": export_thread(args.db, args.thread, args.out), "out": args.out}
+    else:
+        report = benchmark(args.turns, args.keep, args.compact_every)
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,166 @@
+import argparse
+import asyncio
+import json
+import math
+import random
+import socket
+import time
+import uuid
+
+from aiohttp import web
+
+"""
+Local fake of an Azure OpenAI chat deployment, for exercising llm_client.py without a
+network or a quota.
+
+    python fake_llm_endpoint.py --port 8089 --rps 5 --tps 2000 --error-rate-5xx 0.05
+    AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8089 AZURE_OPENAI_API_KEY=fake ... LLM_MODE=azure python agents_langgraph.py
+
+It serves POST /openai/deployments/{deployment}/chat/completions with OpenAI-shaped replies,
+streamed (SSE) or not, after latency_s seconds. Like a real deployment it enforces a quota,
+here per one-second window: more than rps requests or tps tokens (prompt estimate plus
+max_tokens) in a window get a 429 with Retry-After. On top of that it injects faults:
+
+  - error_rate_429 / error_rate_5xx: share of requests answered 429 / 500-503 at random;
+  - outage: every request fails with 503 until turned off.
+
+GET /_stats returns the status counts; POST /_faults {"outage": true, "error_rate_5xx": 0.2}
+changes the fault settings of a running endpoint.
+"""
+
+SERVER_ERRORS = (500, 502, 503)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _prompt_tokens(body: dict) -> int:
+    # 4 characters per token, as the client-side estimate
+    return max(1, sum(len(str(message.get("content") or "")) for message in body.get("messages", [])) // 4)
+
+
+class FakeDeployment:
+    def __init__(self, rps: float = 0, tps: float = 0, latency_s: float = 0.05, error_rate_429: float = 0.0,
+                 error_rate_5xx: float = 0.0, seed: int = None):
+        self.rps = rps
+        self.tps = tps
+        self.latency_s = latency_s
+        self.error_rate_429 = error_rate_429
+        self.error_rate_5xx = error_rate_5xx
+        self.outage = False
+        self.rng = random.Random(seed)
+        self.status_counts = {}
+        self._window = (0, 0, 0)  # second, requests, tokens
+
+    def _count(self, status: int):
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+    def _error(self, status: int, message: str, retry_after_s: float = None):
+        self._count(status)
+        headers = {}
+        if retry_after_s is not None:
+            headers = {"Retry-After": str(math.ceil(retry_after_s)), "retry-after-ms": str(int(retry_after_s * 1000))}
+        body = {"error": {"code": str(status), "message": message}}
+        return web.json_response(body, status=status, headers=headers)
+
+    def _over_quota(self, tokens: int):
+        """Seconds until the current window ends if this request exceeds the quota, else None."""
+        now = time.monotonic()
+        second, requests, used = self._window
+        if int(now) != second:
+            second, requests, used = int(now), 0, 0
+        requests, used = requests + 1, used + tokens
+        if (self.rps and requests > self.rps) or (self.tps and used > self.tps):
+            return second + 1 - now
+        self._window = (second, requests, used)
+        return None
+
+    def _reply_text(self, body: dict) -> str:
+        question = str(body.get("messages", [{}])[-1].get("content") or "")[:60]
+        return f"Fake reply to: {question}"
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        prompt_tokens = _prompt_tokens(body)
+        reserved = prompt_tokens + int(body.get("max_tokens") or body.get("max_completion_tokens") or 0)
+
+        if self.outage:
+            return self._error(503, "The deployment is unavailable")
+        retry_after = self._over_quota(reserved)
+        if retry_after is not None:
+            return self._error(429, "Requests to this deployment have exceeded the rate limit", retry_after)
+        roll = self.rng.random()
+        if roll < self.error_rate_429:
+            return self._error(429, "Injected rate limit", 1.0)
+        if roll < self.error_rate_429 + self.error_rate_5xx:
+            return self._error(self.rng.choice(SERVER_ERRORS), "Injected server error")
+
+        await asyncio.sleep(self.latency_s)
+        text = self._reply_text(body)
+        completion_tokens = max(1, len(text) // 4)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = request.match_info["deployment"]
+        self._count(200)
+
+        if not body.get("stream"):
+            return web.json_response({
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+                "usage": usage,
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+        for piece in [text[:len(text) // 2], text[len(text) // 2:]]:
+            delta = {"choices": [{"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": None}]}
+            await response.write(f"data: {json.dumps(dict(chunk, **delta))}\n\n".encode())
+        done = {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+        await response.write(f"data: {json.dumps(dict(chunk, **done))}\n\ndata: [DONE]\n\n".encode())
+        await response.write_eof()
+        return response
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({str(status): count for status, count in sorted(self.status_counts.items())})
+
+    async def faults(self, request: web.Request) -> web.Response:
+        for key, value in (await request.json()).items():
+            if key in ("outage", "error_rate_429", "error_rate_5xx", "rps", "tps", "latency_s"):
+                setattr(self, key, value)
+        return web.json_response({"outage": self.outage, "error_rate_429": self.error_rate_429,
+                                  "error_rate_5xx": self.error_rate_5xx, "rps": self.rps, "tps": self.tps})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/openai/deployments/{deployment}/chat/completions", self.chat_completions)
+        app.router.add_get("/_stats", self.stats)
+        app.router.add_post("/_faults", self.faults)
+        return app
+
+
+async def start_fake_endpoint(deployment: FakeDeployment, port: int = None):
+    """Serves deployment on 127.0.0.1 and returns (runner, base url)."""
+    runner = web.AppRunner(deployment.app())
+    await runner.setup()
+    port = port or _free_port()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner, f"http://127.0.0.1:{port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Azure OpenAI chat deployment with quota and fault injection.")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--rps", type=float, default=0, help="requests per second before 429s (0 = unlimited)")
+    parser.add_argument("--tps", type=float, default=0, help="tokens per second before 429s (0 = unlimited)")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per successful reply")
+    parser.add_argument("--error-rate-429", type=float, default=0.0)
+    parser.add_argument("--error-rate-5xx", type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeDeployment(args.rps, args.tps, args.latency, args.error_rate_429, args.error_rate_5xx)
+    print(f"fake deployment on http://127.0.0.1:{args.port}")
+    web.run_app(fake.app(), host="127.0.0.1", port=args.port, print=None)
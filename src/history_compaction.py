@@ -0,0 +1,163 @@
+import json
+import logging
+import os
+
+from langchain_core.messages import HumanMessage, RemoveMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+from llm_client import BACKGROUND, priority
+
+"""
+History compaction for MessagesState graphs.
+
+make_history_compactor() builds a node that runs before the LLM node and keeps the
+conversation within a token budget:
+  - tool results from earlier turns are reduced to their facts (scalar fields, summaries,
+    item names) instead of full payloads such as a 7-day forecast;
+  - once the history exceeds max_tokens, the oldest turns are folded into a running
+    summary message and only the most recent keep_tokens worth of turns are kept verbatim.
+    Summarization is best effort: if the model call fails, the turn goes on uncompacted.
+Because the checkpointer persists the compacted state, stored checkpoints stop growing too.
+"""
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", 3000))
+DEFAULT_KEEP_TOKENS = int(os.getenv("HISTORY_KEEP_TOKENS", 1500))
+
+SUMMARY_MESSAGE_ID = "history-summary"
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+SUMMARIZE_PROMPT = (
+    "You maintain a running summary of a conversation between a user and a travel assistant. "
+    "Update the existing summary with the new messages. Keep every concrete fact the user may refer to later: "
+    "cities, dates, temperatures, events, preferences and decisions. Answer with the updated summary only, "
+    "in at most 200 words."
+)
+
+def _compact_value(value, max_items: int):
+    if isinstance(value, dict):
+        return {key: _compact_value(item, max_items) for key, item in value.items()
+                if not isinstance(item, list) or item}
+    if isinstance(value, list):
+        if value and all(isinstance(item, dict) and "name" in item for item in value):
+            names = [item["name"] for item in value[:max_items]]
+            return names if len(value) <= max_items else names + [f"... {len(value) - max_items} more"]
+        if value and all(isinstance(item, dict) for item in value):
+            return f"{len(value)} records"
+        return value[:max_items]
+    return value
+
+def extract_tool_facts(content, max_chars: int = 400, max_items: int = 5) -> str:
+    """
+    Shrinks a tool result to its facts: JSON payloads keep scalar fields and nested summaries,
+    lists of records collapse to their names or a count, and anything else is truncated.
+    Shaped results (plugins/result_shaping.py) keep their reference and summary lines; the
+    rows stay one fetch_tool_result call away.
+    """
+    if not isinstance(content, str):
+        content = json.dumps(content, default=str)
+    if content.startswith("[ref="):
+        content = "\n".join(content.splitlines()[:2])
+    try:
+        payload = json.loads(content)
+    except ValueError:
+        return content if len(content) <= max_chars else content[:max_chars] + " ...[truncated]"
+    facts = json.dumps(_compact_value(payload, max_items), ensure_ascii=False)
+    return facts if len(facts) <= max_chars else facts[:max_chars] + " ...[truncated]"
+
+def _last_human_index(messages: list) -> int:
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            return index
+    return 0
+
+def _recent_start(messages: list, keep_tokens: int) -> int:
+    """
+    Returns the index where the verbatim window starts: as many trailing messages as fit in
+    keep_tokens, moved forward to a HumanMessage so tool calls and their results stay paired.
+    The current turn (from the last HumanMessage) is always kept.
+    """
+    last_turn = _last_human_index(messages)
+    used = 0
+    start = len(messages)
+    while start > 0 and used + count_tokens_approximately([messages[start - 1]]) <= keep_tokens:
+        start -= 1
+        used += count_tokens_approximately([messages[start]])
+    while start < last_turn and not isinstance(messages[start], HumanMessage):
+        start += 1
+    return min(start, last_turn)
+
+def _summarize(summarizer, previous_summary: str, messages: list) -> str:
+    transcript = "\n".join(
+        f"{message.type}: {extract_tool_facts(message.content) if isinstance(message, ToolMessage) else message.content}"
+        for message in messages if message.content
+    )
+    if summarizer is None:
+        # Offline fallback: keep the tail of the concatenated transcript
+        text = f"{previous_summary}\n{transcript}".strip()
+        return text[-2000:]
+    # Summarization can wait: interactive turns go first when the deployment's budget is short
+    with priority(BACKGROUND):
+        response = summarizer.invoke([
+            SystemMessage(content=SUMMARIZE_PROMPT),
+            HumanMessage(content=f"Existing summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}")
+        ])
+    return response.content.strip()
+
+def make_history_compactor(summarizer=None, max_tokens: int = DEFAULT_MAX_TOKENS, keep_tokens: int = DEFAULT_KEEP_TOKENS):
+    """
+    Returns a graph node that compacts state['messages'].
+    summarizer is a chat model used to fold old turns into the summary (None = extractive fallback).
+    """
+
+    def compact_history(state):
+        messages = state["messages"]
+        tokens_before = count_tokens_approximately(messages)
+        changed = False
+
+        summary = None
+        if messages and messages[0].id == SUMMARY_MESSAGE_ID:
+            summary, messages = messages[0], messages[1:]
+
+        # Shrink tool results of earlier turns; the current turn keeps its full payloads
+        last_turn = _last_human_index(messages)
+        shrunk = []
+        for index, message in enumerate(messages):
+            if isinstance(message, ToolMessage) and index < last_turn:
+                facts = extract_tool_facts(message.content)
+                if facts != message.content:
+                    message = message.model_copy(update={"content": facts})
+                    changed = True
+            shrunk.append(message)
+        messages = shrunk
+
+        summary_tokens = count_tokens_approximately([summary]) if summary else 0
+        if summary_tokens + count_tokens_approximately(messages) > max_tokens:
+            start = _recent_start(messages, keep_tokens)
+            if start > 0:
+                previous = summary.content[len(SUMMARY_PREFIX):] if summary else ""
+                try:
+                    folded = _summarize(summarizer, previous, messages[:start])
+                except Exception as e:
+                    # Best effort: a throttled or unavailable model (429, CircuitOpenError) must
+                    # not fail the turn; the old turns are folded on a later one instead
+                    logger.warning("history compaction: summarization failed, keeping %d messages: %r", len(messages), e)
+                else:
+                    summary = SystemMessage(content=SUMMARY_PREFIX + folded, id=SUMMARY_MESSAGE_ID)
+                    messages = messages[start:]
+                    changed = True
+
+        if not changed:
+            logger.info("history compaction: %d prompt tokens, unchanged", tokens_before)
+            return {}
+
+        compacted = ([summary] if summary else []) + messages
+        logger.info(
+            "history compaction: %d -> %d prompt tokens (%d messages kept)",
+            tokens_before, count_tokens_approximately(compacted), len(compacted)
+        )
+        return {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES)] + compacted}
+
+    return compact_history
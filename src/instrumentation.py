@@ -0,0 +1,370 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+"""
+Latency and token instrumentation for LangGraph agents.
+
+TraceCallbackHandler turns LangChain callback events into spans: one per graph (including
+sub-graphs invoked inside tools, such as researcher_agent behind the supervisor's
+researcher tool), per graph node, per tool and per model call. Each span records wall time,
+prompt/completion tokens, retry count and status, and keeps its parent span, so a slow
+supervisor turn can be broken down into model, sub-graph and search time. Internal chains
+(edges, channel writes, prompt sequences) are folded into their nearest recorded ancestor.
+
+Finished traces are appended to a JSONL file (one span per line) and aggregated into
+MetricsRegistry, which renders the Prometheus text format and can be served on /metrics.
+instrument(graph) wraps a compiled graph so every run carries the handler. The handler keeps no
+inputs or outputs and writes once per trace, so it is cheap enough to leave on.
+"""
+
+DEFAULT_TRACE_FILE = os.getenv("AGENT_TRACE_FILE", "agent_traces.jsonl")
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _token_usage(response) -> tuple:
+    """Returns (prompt_tokens, completion_tokens) from an LLMResult, 0 when not reported."""
+    prompt = completion = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt += usage.get("input_tokens", 0)
+                completion += usage.get("output_tokens", 0)
+    if not prompt and not completion and response.llm_output:
+        usage = response.llm_output.get("token_usage") or {}
+        prompt, completion = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    return prompt, completion
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """Aggregates finished spans into Prometheus counters and duration histograms."""
+
+    def __init__(self, buckets: tuple = DURATION_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._durations = {}
+        self._errors = {}
+        self._retries = {}
+        self._tokens = {}
+
+    def observe(self, span: dict):
+        labels = (span["kind"], span["name"])
+        seconds = span["duration_ms"] / 1000
+        with self._lock:
+            histogram = self._durations.get(labels)
+            if histogram is None:
+                histogram = self._durations[labels] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += seconds
+            histogram["count"] += 1
+            if span["status"] != "ok":
+                self._errors[labels] = self._errors.get(labels, 0) + 1
+            if span["retries"]:
+                self._retries[labels] = self._retries.get(labels, 0) + span["retries"]
+            if span["kind"] == "llm":
+                node = span.get("node") or span["name"]
+                for token_type in ("prompt", "completion"):
+                    key = (node, token_type)
+                    self._tokens[key] = self._tokens.get(key, 0) + span[f"{token_type}_tokens"]
+
+    def render(self) -> str:
+        """Returns all metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP agent_span_duration_seconds Wall time of graphs, nodes, tools and model calls.",
+            "# TYPE agent_span_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (kind, name), histogram in sorted(self._durations.items()):
+                labels = f'kind="{_escape_label(kind)}",name="{_escape_label(name)}"'
+                for bound, count in zip(self.buckets, histogram["buckets"]):
+                    lines.append(f'agent_span_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'agent_span_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram["count"]}')
+                lines.append(f"agent_span_duration_seconds_sum{{{labels}}} {histogram['sum']:.6f}")
+                lines.append(f"agent_span_duration_seconds_count{{{labels}}} {histogram['count']}")
+            for metric, help_text, values in (
+                ("agent_span_errors_total", "Spans that ended with an error.", self._errors),
+                ("agent_span_retries_total", "Retries recorded inside spans.", self._retries),
+            ):
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+                for (kind, name), value in sorted(values.items()):
+                    lines.append(f'{metric}{{kind="{_escape_label(kind)}",name="{_escape_label(name)}"}} {value}')
+            lines += ["# HELP agent_llm_tokens_total Model tokens by calling node.", "# TYPE agent_llm_tokens_total counter"]
+            for (node, token_type), value in sorted(self._tokens.items()):
+                lines.append(f'agent_llm_tokens_total{{node="{_escape_label(node)}",type="{token_type}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+class TraceCallbackHandler(BaseCallbackHandler):
+    """
+    Callback handler building span trees for graph runs. Spans of a trace are written to
+    trace_file (None = no file) and added to metrics when the root run finishes.
+    """
+
+    # Runs in the calling thread/event loop instead of a callback executor
+    run_inline = True
+
+    def __init__(self, trace_file: str = DEFAULT_TRACE_FILE, metrics: MetricsRegistry = None):
+        self.trace_file = trace_file
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self._lock = threading.Lock()
+        self._spans = {}
+        self._owner = {}
+        self._traces = {}
+        self._file = open(trace_file, "a", encoding="utf-8") if trace_file else None
+        self.last_trace = []
+
+    # -- span bookkeeping -------------------------------------------------------------------
+
+    def _start(self, run_id, parent_run_id, kind: str, name: str, **fields):
+        run_id = str(run_id)
+        parent = self._owner.get(str(parent_run_id)) if parent_run_id else None
+        parent_span = self._spans.get(parent) if parent else None
+        if parent_span is None:  # no parent, or its trace was already flushed
+            parent = None
+        trace_id = parent_span["trace_id"] if parent_span else run_id
+        span = {
+            "trace_id": trace_id, "span_id": run_id, "parent_id": parent, "kind": kind, "name": name,
+            "start": time.time(), "_started": time.perf_counter(), "duration_ms": None, "status": "ok",
+            "prompt_tokens": 0, "completion_tokens": 0, "retries": 0, **fields,
+        }
+        with self._lock:
+            self._spans[run_id] = span
+            self._owner[run_id] = run_id
+            self._traces.setdefault(trace_id, []).append(span)
+
+    def _fold(self, run_id, parent_run_id):
+        """Maps an unrecorded internal run onto its nearest recorded ancestor."""
+        if parent_run_id is not None:
+            owner = self._owner.get(str(parent_run_id))
+            if owner is not None:
+                with self._lock:
+                    self._owner[str(run_id)] = owner
+
+    def _end(self, run_id, error: BaseException = None):
+        run_id = str(run_id)
+        with self._lock:
+            owner = self._owner.pop(run_id, None)
+            span = self._spans.get(run_id) if owner == run_id else None
+            if span is None:
+                return
+            span["duration_ms"] = round((time.perf_counter() - span.pop("_started")) * 1000, 3)
+            if error is not None:
+                span["status"] = "error"
+                span["error"] = f"{type(error).__name__}: {error}"[:300]
+            if span["parent_id"] is not None:
+                return
+            # Root finished: the whole trace is complete
+            trace = self._traces.pop(span["trace_id"], [])
+            for finished in trace:
+                self._spans.pop(finished["span_id"], None)
+        self._flush(trace)
+
+    def _flush(self, trace: list):
+        for span in trace:
+            if span["duration_ms"] is None:  # abandoned child, e.g. a timed-out sub-agent
+                span.pop("_started", None)
+                span["status"] = "unfinished"
+                continue
+            self.metrics.observe(span)
+        self.last_trace = trace
+        if self._file is not None:
+            payload = "".join(json.dumps(span, ensure_ascii=False, default=str) + "\n" for span in trace)
+            with self._lock:
+                self._file.write(payload)
+                self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # -- chains: graphs and graph nodes -----------------------------------------------------
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name") or "chain"
+        node = (metadata or {}).get("langgraph_node")
+        parent = self._spans.get(str(parent_run_id)) if parent_run_id else None
+        if parent_run_id is None or name == "LangGraph" or (parent is not None and parent["kind"] == "tool"):
+            # Root runs and graphs invoked from inside a tool (sub-agents)
+            self._start(run_id, parent_run_id, "graph", name)
+        elif node is not None and name == node:
+            self._start(run_id, parent_run_id, "node", name)
+        else:
+            self._fold(run_id, parent_run_id)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    # -- tools ------------------------------------------------------------------------------
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name") or "tool"
+        self._start(run_id, parent_run_id, "tool", name)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    # -- model calls ------------------------------------------------------------------------
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name") or "llm"
+        self._start(run_id, parent_run_id, "llm", name, node=(metadata or {}).get("langgraph_node"))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        self.on_chat_model_start(serialized, prompts, run_id=run_id, parent_run_id=parent_run_id, metadata=metadata, **kwargs)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        span = self._spans.get(str(run_id))
+        if span is not None:
+            span["prompt_tokens"], span["completion_tokens"] = _token_usage(response)
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_retry(self, retry_state, *, run_id, **kwargs):
+        owner = self._owner.get(str(run_id))
+        if owner is not None:
+            with self._lock:
+                self._spans[owner]["retries"] += 1
+
+
+class InstrumentedGraph:
+    """
+    Wraps a compiled graph so every invoke/stream/astream_events call carries the handler.
+    The handler goes into each call's config because compiled graphs let a per-call
+    callbacks list replace the ones set with with_config, and astream_events always sets one.
+    Other attributes are delegated to the wrapped graph.
+    """
+
+    def __init__(self, graph, handler: TraceCallbackHandler):
+        self.graph = graph
+        self.trace_handler = handler
+
+    def _config(self, config):
+        config = dict(config or {})
+        callbacks = config.get("callbacks")
+        if callbacks is None:
+            config["callbacks"] = [self.trace_handler]
+        elif isinstance(callbacks, list):
+            config["callbacks"] = [*callbacks, self.trace_handler]
+        else:
+            callbacks = callbacks.copy()
+            callbacks.add_handler(self.trace_handler, inherit=True)
+            config["callbacks"] = callbacks
+        return config
+
+    def invoke(self, input, config=None, **kwargs):
+        return self.graph.invoke(input, self._config(config), **kwargs)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        return await self.graph.ainvoke(input, self._config(config), **kwargs)
+
+    def stream(self, input, config=None, **kwargs):
+        return self.graph.stream(input, self._config(config), **kwargs)
+
+    def astream(self, input, config=None, **kwargs):
+        return self.graph.astream(input, self._config(config), **kwargs)
+
+    def astream_events(self, input, config=None, **kwargs):
+        return self.graph.astream_events(input, self._config(config), **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.graph, name)
+
+def instrument(graph, handler: TraceCallbackHandler = None) -> InstrumentedGraph:
+    """Returns graph wrapped with handler (a new TraceCallbackHandler by default)."""
+    return InstrumentedGraph(graph, handler or TraceCallbackHandler())
+
+def span_tree(trace: list) -> str:
+    """Renders a finished trace as an indented tree, for logs and the CLI."""
+    children = {}
+    for span in trace:
+        children.setdefault(span["parent_id"], []).append(span)
+    lines = []
+
+    def walk(parent, depth):
+        for span in sorted(children.get(parent, []), key=lambda s: s["start"]):
+            tokens = f" tokens={span['prompt_tokens']}/{span['completion_tokens']}" if span["kind"] == "llm" else ""
+            duration = f"{span['duration_ms']:.1f}ms" if span["duration_ms"] is not None else "unfinished"
+            lines.append(f"{'  ' * depth}{span['kind']}:{span['name']} {duration}{tokens}"
+                         f"{' retries=' + str(span['retries']) if span['retries'] else ''}"
+                         f"{' [' + span['status'] + ']' if span['status'] != 'ok' else ''}")
+            walk(span["span_id"], depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+def start_metrics_server(metrics: MetricsRegistry, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serves metrics.render() on http://host:port/metrics from a daemon thread."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    # Per-turn overhead of leaving instrumentation on, measured on the supervisor graph with
+    # the stub model and an offline search provider.
+    import statistics
+    import tempfile
+
+    os.environ.setdefault("LLM_MODE", "stub")
+    from langchain_core.messages import HumanMessage
+
+    import agents_langgraph
+    from plugins.web_search import FakeSearchProvider, RateLimiter
+
+    agents_langgraph.web_search_client.provider = FakeSearchProvider()
+    agents_langgraph.web_search_client.rate_limiter = RateLimiter(rate_per_second=0)
+    state = {"messages": [HumanMessage("Why did the Roman Empire decline?")]}
+
+    def per_turn_ms(graph, turns: int = 200) -> float:
+        samples = []
+        for _ in range(turns):
+            started = time.perf_counter()
+            graph.invoke(state)
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        handler = TraceCallbackHandler(os.path.join(tmp, "traces.jsonl"))
+        traced = instrument(agents_langgraph.supervisor_agent, handler)
+        per_turn_ms(agents_langgraph.supervisor_agent, 20)
+        plain = per_turn_ms(agents_langgraph.supervisor_agent)
+        instrumented = per_turn_ms(traced)
+        handler.close()
+        print(span_tree(handler.last_trace))
+        print(f"\nper turn: {plain:.2f}ms plain, {instrumented:.2f}ms instrumented "
+              f"(+{instrumented - plain:.2f}ms, {len(handler.last_trace)} spans per trace)")
+        print("\n".join(line for line in handler.metrics.render().splitlines() if "_count" in line))
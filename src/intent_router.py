@@ -0,0 +1,187 @@
+import re
+import threading
+from dataclasses import dataclass, field
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from pydantic import BaseModel, Field
+
+"""
+Single-call intent router for the LangChain multi-agent CLI.
+
+Obvious queries are resolved locally from keyword/regex tables (fast path).
+Everything else costs exactly one structured-output LLM call that scores all
+intents at once, instead of one yes/no classifier call per intent.
+"""
+
+INTENTS = ("weather", "travel", "flight", "other")
+
+WEATHER_KEYWORDS = [
+    "temperature", "rain", "sunny", "cloudy", "forecast", "wind", "humidity",
+    "snow", "storm", "hot", "cold", "climate", "how is it outside", "is it raining",
+    "is it sunny", "is it snowing", "is it hot", "is it cold", "weather"
+]
+
+TRAVEL_KEYWORDS = [
+    "travel tips", "things to do", "places to visit", "day trip", "day trips", "itinerary",
+    "sightseeing", "attractions", "landmarks", "must see", "must-see", "what to see",
+    "what to do", "recommendations", "visiting", "vacation", "holiday", "tourist", "tourism"
+]
+
+FLIGHT_KEYWORDS = [
+    "flight", "flights", "fly", "flying", "airfare", "airfares", "airline", "airlines",
+    "airways", "plane ticket", "plane tickets", "layover", "nonstop", "non-stop",
+    "round trip", "one way", "departing", "boarding pass"
+]
+
+# Word-boundary patterns so "hot" does not match "hotel" and "rain" does not match "train".
+def _compile_keywords(keywords):
+    alternatives = "|".join(re.escape(keyword) for keyword in sorted(keywords, key=len, reverse=True))
+    return re.compile(rf"\b(?:{alternatives})\b", re.IGNORECASE)
+
+KEYWORD_PATTERNS = {
+    "weather": _compile_keywords(WEATHER_KEYWORDS),
+    "travel": _compile_keywords(TRAVEL_KEYWORDS),
+    "flight": _compile_keywords(FLIGHT_KEYWORDS),
+}
+
+
+class IntentScores(BaseModel):
+    """Confidence scores, between 0 and 1, for each supported intent of a user message."""
+
+    weather: float = Field(description="Message asks about weather, temperature, climate or atmospheric conditions.")
+    travel: float = Field(description="Message asks for travel information, tips or recommendations about a destination.")
+    flight: float = Field(description="Message asks for flight information, bookings, schedules or airfare between locations.")
+    other: float = Field(description="Message is about none of the above.")
+
+
+@dataclass
+class RouteDecision:
+    intent: str
+    scores: dict = field(default_factory=dict)
+    source: str = "keywords"
+
+
+class IntentRouter:
+    """
+    Routes a user message to one of INTENTS with at most one LLM call.
+
+    The keyword fast path is taken only when exactly one intent matches; mixed or
+    unmatched messages fall through to a single structured-output classification.
+    """
+
+    system_prompt = (
+        "You are an intent classifier for a travel assistant. "
+        "Score how likely the user message belongs to each intent, using values between 0 and 1. "
+        "Questions about flight information, schedules, bookings or airfare are 'flight', not 'travel'. "
+        "Questions about travel information, tips or recommendations for a destination are 'travel'. "
+        "Questions about weather, temperature or climate are 'weather'. "
+        "Anything else is 'other'."
+    )
+
+    def __init__(self, llm, min_confidence: float = 0.5):
+        self.llm = llm
+        self.min_confidence = min_confidence
+        self._classifier = llm.with_structured_output(IntentScores)
+        self._lock = threading.Lock()
+        self._counters = {"total": 0, "fast_path": 0, "llm": 0, "llm_errors": 0}
+
+    def keyword_hits(self, user_input: str) -> dict:
+        return {intent: len(pattern.findall(user_input)) for intent, pattern in KEYWORD_PATTERNS.items()}
+
+    def fast_path(self, user_input: str):
+        """Returns a RouteDecision when the keyword tables are unambiguous, otherwise None."""
+        hits = self.keyword_hits(user_input)
+        matched = [intent for intent, count in hits.items() if count]
+        if len(matched) != 1:
+            return None
+        scores = {intent: 0.0 for intent in INTENTS}
+        scores[matched[0]] = 1.0
+        return RouteDecision(intent=matched[0], scores=scores, source="keywords")
+
+    def _messages(self, user_input: str):
+        return [SystemMessage(content=self.system_prompt), HumanMessage(content=user_input)]
+
+    def _decide(self, result: IntentScores) -> RouteDecision:
+        scores = {intent: float(getattr(result, intent)) for intent in INTENTS}
+        intent = max(scores, key=scores.get)
+        if scores[intent] < self.min_confidence:
+            intent = "other"
+        return RouteDecision(intent=intent, scores=scores, source="llm")
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def route(self, user_input: str, on_classify=None) -> RouteDecision:
+        """
+        on_classify, if given, is called with no arguments once the fast path has failed and
+        just before the LLM classification call, e.g. to start work that overlaps it.
+        """
+        self._count("total")
+        decision = self.fast_path(user_input)
+        if decision is not None:
+            self._count("fast_path")
+            return decision
+
+        if on_classify is not None:
+            on_classify()
+        self._count("llm")
+        try:
+            result = self._classifier.invoke(self._messages(user_input))
+        except Exception:
+            self._count("llm_errors")
+            return RouteDecision(intent="other", scores={}, source="llm_error")
+        return self._decide(result)
+
+    async def aroute(self, user_input: str) -> RouteDecision:
+        """Async variant of route, using ainvoke for the classification call."""
+        self._count("total")
+        decision = self.fast_path(user_input)
+        if decision is not None:
+            self._count("fast_path")
+            return decision
+
+        self._count("llm")
+        try:
+            result = await self._classifier.ainvoke(self._messages(user_input))
+        except Exception:
+            self._count("llm_errors")
+            return RouteDecision(intent="other", scores={}, source="llm_error")
+        return self._decide(result)
+
+    async def abatch_route(self, user_inputs: list, configs: list = None, max_concurrency: int = None) -> list:
+        """
+        Routes many messages: fast-path hits locally, the rest through one abatch() of the
+        classifier, which providers with a batch endpoint serve in fewer requests. configs
+        optionally holds one RunnableConfig per message (e.g. per-message callbacks).
+        """
+        decisions = []
+        pending = []
+        for i, user_input in enumerate(user_inputs):
+            self._count("total")
+            decision = self.fast_path(user_input)
+            if decision is not None:
+                self._count("fast_path")
+            else:
+                self._count("llm")
+                pending.append(i)
+            decisions.append(decision)
+        if pending:
+            config = [dict(configs[i] if configs else {}, max_concurrency=max_concurrency) for i in pending]
+            results = await self._classifier.abatch([self._messages(user_inputs[i]) for i in pending], config=config,
+                                                    return_exceptions=True)
+            for i, result in zip(pending, results):
+                if isinstance(result, Exception):
+                    self._count("llm_errors")
+                    decisions[i] = RouteDecision(intent="other", scores={}, source="llm_error")
+                else:
+                    decisions[i] = self._decide(result)
+        return decisions
+
+    def stats(self) -> dict:
+        """Returns routing counters plus the share of turns served by the fast path."""
+        with self._lock:
+            counters = dict(self._counters)
+        counters["fast_path_ratio"] = round(counters["fast_path"] / counters["total"], 3) if counters["total"] else 0.0
+        counters["llm_calls_per_turn"] = round(counters["llm"] / counters["total"], 3) if counters["total"] else 0.0
+        return counters
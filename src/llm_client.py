@@ -0,0 +1,586 @@
+import asyncio
+import itertools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from tenacity import RetryCallState
+
+"""
+Shared client layer in front of the chat deployment.
+
+Every agent of the process reaches the deployment through the one registry "chat_model";
+create_chat_model() wraps it in GovernedChatModel, which routes each call through the
+process-wide LLMGovernor (get_governor()):
+
+  - RateLimiter: token buckets for requests per minute (LLM_RPM) and tokens per minute
+    (LLM_TPM), holding at most LLM_BURST_S seconds of budget. A call reserves its prompt
+    estimate plus its completion allowance and settles against the reported usage;
+  - priorities: callers wait in priority order, so interactive turns (the default) go ahead
+    of background work such as history summarization (with priority(BACKGROUND): ...);
+  - RetryPolicy: 408/409/429/5xx and connection errors are retried up to LLM_MAX_ATTEMPTS
+    times with decorrelated jitter, never sooner than the server's Retry-After, so callers
+    throttled together do not come back together. The client SDK's own retries are off;
+  - CircuitBreaker: after LLM_BREAKER_FAILURES consecutive 5xx or connection failures calls
+    fail fast with CircuitOpenError for LLM_BREAKER_RESET_S seconds, then one probe call
+    decides whether to close it again; a probe that is cancelled or abandoned counts as a
+    failure. 429s show the deployment is up and do not count.
+
+A streamed call is retried only if it fails before its first chunk. Retries are reported to
+the callbacks of the model run through on_retry, as langchain's own retries are; langchain-core
+does not hand _stream() its run manager, so retries of streamed calls are not reported.
+fake_llm_endpoint.py serves a local deployment with a quota and injected 429/5xx to try it:
+
+    python llm_client.py
+"""
+
+INTERACTIVE, BACKGROUND = 0, 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# Azure OpenAI grants 6 requests per minute per 1000 tokens per minute of quota
+DEFAULT_TPM = float(os.getenv("LLM_TPM", 30000))
+DEFAULT_RPM = float(os.getenv("LLM_RPM", DEFAULT_TPM * 6 / 1000))
+DEFAULT_BURST_S = float(os.getenv("LLM_BURST_S", 10))
+DEFAULT_COMPLETION_TOKENS = int(os.getenv("LLM_COMPLETION_ESTIMATE", 256))
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", 5))
+DEFAULT_BACKOFF_BASE_S = float(os.getenv("LLM_BACKOFF_BASE_S", 0.5))
+DEFAULT_BACKOFF_CAP_S = float(os.getenv("LLM_BACKOFF_CAP_S", 20))
+DEFAULT_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", 5))
+DEFAULT_BREAKER_RESET_S = float(os.getenv("LLM_BREAKER_RESET_S", 30))
+
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+# Exception types of the openai SDK and the standard library that mean "no response"
+CONNECTION_ERRORS = {"APIConnectionError", "APITimeoutError", "ConnectionError", "TimeoutError"}
+# How often a caller re-checks while a more urgent caller is waiting
+PRIORITY_POLL_S = 0.01
+
+request_priority = ContextVar("llm_request_priority", default=INTERACTIVE)
+
+@contextmanager
+def priority(level: int):
+    """Model calls made inside the block wait for the rate limiter at priority level."""
+    token = request_priority.set(level)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, retry_after_s: float):
+        super().__init__(f"Chat deployment circuit is open; retry in {retry_after_s:.1f}s")
+        self.retry_after_s = retry_after_s
+
+
+class TokenBucket:
+    """rate_per_s refill up to capacity; the level may go negative when usage is settled late."""
+
+    def __init__(self, rate_per_s: float, capacity: float):
+        self.rate_per_s = rate_per_s
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate_per_s)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount is available; amounts above capacity only wait for a full bucket."""
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate_per_s)
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= amount
+
+
+class RateLimiter:
+    """
+    Request and token budgets shared by every caller of the process. acquire() blocks
+    until both buckets have room and no caller of a more urgent priority is waiting.
+    """
+
+    def __init__(self, rpm: float = DEFAULT_RPM, tpm: float = DEFAULT_TPM, burst_s: float = DEFAULT_BURST_S):
+        self.requests = TokenBucket(rpm / 60, rpm / 60 * burst_s) if rpm else None
+        self.tokens = TokenBucket(tpm / 60, tpm / 60 * burst_s) if tpm else None
+        self._waiting = {level: 0 for level in PRIORITY_NAMES}
+        self._waited_s = {level: 0.0 for level in PRIORITY_NAMES}
+        self._acquired = {level: 0 for level in PRIORITY_NAMES}
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, cost: int, level: int) -> float:
+        """Takes the budget and returns 0, or returns how long to wait before trying again."""
+        with self._lock:
+            if any(count for other, count in self._waiting.items() if other < level):
+                return PRIORITY_POLL_S
+            wait = max(
+                self.requests.wait_time(1) if self.requests else 0.0,
+                self.tokens.wait_time(cost) if self.tokens else 0.0,
+            )
+            if wait > 0:
+                return wait
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens:
+                self.tokens.take(cost)
+            return 0.0
+
+    def _waiter(self, level: int, delta: int):
+        with self._lock:
+            self._waiting[level] += delta
+
+    def _done(self, level: int, waited_s: float):
+        with self._lock:
+            self._acquired[level] += 1
+            self._waited_s[level] += waited_s
+
+    def acquire(self, cost: int, level: int = None):
+        level = request_priority.get() if level is None else level
+        started = time.monotonic()
+        wait = self._try_acquire(cost, level)
+        if wait:
+            self._waiter(level, 1)
+            try:
+                while wait:
+                    time.sleep(wait)
+                    wait = self._try_acquire(cost, level)
+            finally:
+                self._waiter(level, -1)
+        self._done(level, time.monotonic() - started)
+
+    async def aacquire(self, cost: int, level: int = None):
+        level = request_priority.get() if level is None else level
+        started = time.monotonic()
+        wait = self._try_acquire(cost, level)
+        if wait:
+            self._waiter(level, 1)
+            try:
+                while wait:
+                    await asyncio.sleep(wait)
+                    wait = self._try_acquire(cost, level)
+            finally:
+                self._waiter(level, -1)
+        self._done(level, time.monotonic() - started)
+
+    def settle(self, reserved: int, used: int):
+        """Corrects the token bucket once the real usage of a call is known."""
+        if self.tokens and used != reserved:
+            with self._lock:
+                self.tokens.take(used - reserved)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                PRIORITY_NAMES[level]: {
+                    "acquired": self._acquired[level],
+                    "mean_wait_ms": round(self._waited_s[level] / self._acquired[level] * 1000, 1) if self._acquired[level] else 0.0,
+                }
+                for level in PRIORITY_NAMES
+            }
+
+
+class RetryPolicy:
+    """Decorrelated jitter: each delay is uniform in [base, 3 x previous delay], capped."""
+
+    def __init__(self, max_attempts: int = DEFAULT_MAX_ATTEMPTS, base_s: float = DEFAULT_BACKOFF_BASE_S,
+                 cap_s: float = DEFAULT_BACKOFF_CAP_S, rng: random.Random = None):
+        self.max_attempts = max_attempts
+        self.base_s = base_s
+        self.cap_s = cap_s
+        self.rng = rng or random.Random()
+
+    def delays(self) -> Iterator[float]:
+        delay = self.base_s
+        while True:
+            delay = min(self.cap_s, self.rng.uniform(self.base_s, delay * 3))
+            yield delay
+
+
+class CircuitBreaker:
+    """closed -> open after failure_threshold consecutive failures -> half-open after reset_s -> one probe."""
+
+    def __init__(self, failure_threshold: int = DEFAULT_BREAKER_FAILURES, reset_s: float = DEFAULT_BREAKER_RESET_S):
+        self.failure_threshold = failure_threshold
+        self.reset_s = reset_s
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        # Token of the half-open probe in flight; only its holder can settle it
+        self._probe = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Raises CircuitOpenError unless the call may go ahead. Returns a token when the call is
+        the half-open probe, which must end in record(ok, probe=token) or release_probe(token),
+        and None otherwise.
+        """
+        with self._lock:
+            if self.state == "closed":
+                return None
+            remaining = self.opened_at + self.reset_s - time.monotonic()
+            if self.state == "open" and remaining > 0:
+                raise CircuitOpenError(remaining)
+            # Half-open: a single probe call decides, everyone else keeps failing fast
+            if self._probe is not None:
+                raise CircuitOpenError(self.reset_s)
+            self.state = "half-open"
+            self._probe = object()
+            return self._probe
+
+    def release_probe(self, probe):
+        """
+        Ends the probe holding token probe as a failure if it recorded no outcome (cancelled,
+        abandoned stream). Any other token, such as a stale one, is ignored.
+        """
+        with self._lock:
+            if probe is None or probe is not self._probe:
+                return
+            self._probe = None
+            self.failures += 1
+            self.times_opened += 1
+            self.state, self.opened_at = "open", time.monotonic()
+
+    def record(self, ok: bool, probe=None):
+        with self._lock:
+            if self._probe is not None and probe is not self._probe:
+                # A call admitted before the circuit opened; the probe in flight decides
+                return
+            self._probe = None
+            if ok:
+                self.state, self.failures = "closed", 0
+                return
+            self.failures += 1
+            if self.state == "half-open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                self.state, self.opened_at = "open", time.monotonic()
+
+
+def _status_of(error: Exception):
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status
+    return getattr(getattr(error, "response", None), "status_code", None)
+
+def _is_connection_error(error: Exception) -> bool:
+    return any(cls.__name__ in CONNECTION_ERRORS for cls in type(error).__mro__)
+
+def _retry_after_s(error: Exception):
+    """Seconds from the retry-after-ms or Retry-After header of an error response, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+def _retry_state(attempt: int, error: Exception, delay_s: float) -> RetryCallState:
+    """The tenacity state callback handlers receive in on_retry, for a failed attempt."""
+    state = RetryCallState(retry_object=None, fn=None, args=(), kwargs={})
+    state.attempt_number = attempt
+    state.set_exception((type(error), error, error.__traceback__))
+    state.upcoming_sleep = delay_s
+    return state
+
+def _usage_of(message) -> int:
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("total_tokens", 0)
+
+
+class LLMGovernor:
+    """Rate limiter, retry policy and circuit breaker applied to every call of the deployment."""
+
+    def __init__(self, limiter: RateLimiter = None, retry: RetryPolicy = None, breaker: CircuitBreaker = None):
+        self.limiter = limiter or RateLimiter()
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self._lock = threading.Lock()
+        self.metrics = {"calls": 0, "attempts": 0, "retries": 0, "throttled": 0, "server_errors": 0,
+                        "failed": 0, "rejected_open": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self.metrics[key] += 1
+
+    @contextmanager
+    def _attempt(self, attempt: int):
+        """
+        Admits one attempt through the circuit breaker. A probe attempt left without an
+        outcome, through cancellation or a stream closed early, reopens the circuit.
+        """
+        try:
+            probe = self.breaker.before_call()
+        except CircuitOpenError:
+            self._count("rejected_open")
+            if attempt > 1:
+                # The circuit opened while this call was retrying: the call failed
+                self._count("failed")
+            raise
+        self._count("attempts")
+        try:
+            yield probe
+        finally:
+            self.breaker.release_probe(probe)
+
+    def _failure_delay(self, error: Exception, attempt: int, delays: Iterator[float], cost: int, probe=None) -> float:
+        """
+        Books a failed attempt and returns the delay before the next one; re-raises the error
+        when it is not transient or the attempts are used up.
+        """
+        # A rejected request consumed no tokens
+        self.limiter.settle(cost, 0)
+        status = _status_of(error)
+        transient = status in RETRYABLE_STATUSES or (status is None and _is_connection_error(error))
+        if status == 429:
+            self._count("throttled")
+        elif transient:
+            self._count("server_errors")
+        # Only outages count against the circuit; a 429 or a 4xx means the deployment is up
+        self.breaker.record(not transient or status == 429, probe)
+        if not transient or attempt >= self.retry.max_attempts:
+            self._count("failed")
+            raise error
+        self._count("retries")
+        return max(next(delays), _retry_after_s(error) or 0.0)
+
+    def call(self, fn, cost: int, run_manager=None):
+        """Runs fn() -> ChatResult under the rate limits, retries and circuit breaker."""
+        self._count("calls")
+        delays = self.retry.delays()
+        for attempt in itertools.count(1):
+            with self._attempt(attempt) as probe:
+                self.limiter.acquire(cost)
+                try:
+                    result = fn()
+                except Exception as e:
+                    delay = self._failure_delay(e, attempt, delays, cost, probe)
+                    if run_manager:
+                        run_manager.on_retry(_retry_state(attempt, e, delay))
+                else:
+                    self.breaker.record(True, probe)
+                    self.limiter.settle(cost, _usage_of(result.generations[0].message) or cost)
+                    return result
+            time.sleep(delay)
+
+    async def acall(self, fn, cost: int, run_manager=None):
+        """Async call(); fn() returns an awaitable."""
+        self._count("calls")
+        delays = self.retry.delays()
+        for attempt in itertools.count(1):
+            with self._attempt(attempt) as probe:
+                await self.limiter.aacquire(cost)
+                try:
+                    result = await fn()
+                except Exception as e:
+                    delay = self._failure_delay(e, attempt, delays, cost, probe)
+                    if run_manager:
+                        await run_manager.on_retry(_retry_state(attempt, e, delay))
+                else:
+                    self.breaker.record(True, probe)
+                    self.limiter.settle(cost, _usage_of(result.generations[0].message) or cost)
+                    return result
+            await asyncio.sleep(delay)
+
+    def stream(self, fn, cost: int, run_manager=None) -> Iterator[ChatGenerationChunk]:
+        """Yields the chunks of fn(); an attempt that already yielded a chunk is not retried."""
+        self._count("calls")
+        delays = self.retry.delays()
+        for attempt in itertools.count(1):
+            with self._attempt(attempt) as probe:
+                self.limiter.acquire(cost)
+                used, started = 0, False
+                try:
+                    for chunk in fn():
+                        started = True
+                        used += _usage_of(chunk.message)
+                        yield chunk
+                except Exception as e:
+                    if started:
+                        self.breaker.record(False, probe)
+                        self._count("failed")
+                        raise
+                    delay = self._failure_delay(e, attempt, delays, cost, probe)
+                    if run_manager:
+                        run_manager.on_retry(_retry_state(attempt, e, delay))
+                else:
+                    self.breaker.record(True, probe)
+                    self.limiter.settle(cost, used or cost)
+                    return
+            time.sleep(delay)
+
+    async def astream(self, fn, cost: int, run_manager=None) -> AsyncIterator[ChatGenerationChunk]:
+        self._count("calls")
+        delays = self.retry.delays()
+        for attempt in itertools.count(1):
+            with self._attempt(attempt) as probe:
+                await self.limiter.aacquire(cost)
+                used, started = 0, False
+                try:
+                    async for chunk in fn():
+                        started = True
+                        used += _usage_of(chunk.message)
+                        yield chunk
+                except Exception as e:
+                    if started:
+                        self.breaker.record(False, probe)
+                        self._count("failed")
+                        raise
+                    delay = self._failure_delay(e, attempt, delays, cost, probe)
+                    if run_manager:
+                        await run_manager.on_retry(_retry_state(attempt, e, delay))
+                else:
+                    self.breaker.record(True, probe)
+                    self.limiter.settle(cost, used or cost)
+                    return
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        with self._lock:
+            metrics = dict(self.metrics)
+        return {**metrics, "circuit": self.breaker.state, "circuit_opened": self.breaker.times_opened,
+                "waits": self.limiter.stats()}
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+def get_governor() -> LLMGovernor:
+    """Returns the process-wide governor, so every model instance shares one set of budgets."""
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                _governor = LLMGovernor()
+    return _governor
+
+
+class GovernedChatModel(BaseChatModel):
+    """
+    Wraps a chat model so each call goes through governor (default: get_governor()).
+    Tool binding and structured output are delegated to the wrapped model's bind_tools.
+    """
+
+    inner: Any
+    governor: Any = None
+    completion_tokens: int = DEFAULT_COMPLETION_TOKENS
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        if self.governor is None:
+            self.governor = get_governor()
+
+    @property
+    def _llm_type(self) -> str:
+        return f"governed-{self.inner._llm_type}"
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        bound = self.inner.bind_tools(tools, tool_choice=tool_choice, **kwargs)
+        return self.bind(**bound.kwargs)
+
+    def _cost(self, messages: List[BaseMessage], **kwargs) -> int:
+        completion = kwargs.get("max_tokens") or getattr(self.inner, "max_tokens", None) or self.completion_tokens
+        return count_tokens_approximately(messages) + completion
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        return self.governor.call(lambda: self.inner._generate(messages, stop=stop, **kwargs), self._cost(messages, **kwargs),
+                                  run_manager=run_manager)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        return await self.governor.acall(lambda: self.inner._agenerate(messages, stop=stop, **kwargs),
+                                         self._cost(messages, **kwargs), run_manager=run_manager)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        chunks = self.governor.stream(lambda: self.inner._stream(messages, stop=stop, **kwargs), self._cost(messages, **kwargs),
+                                      run_manager=run_manager)
+        for chunk in chunks:
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        chunks = self.governor.astream(lambda: self.inner._astream(messages, stop=stop, **kwargs), self._cost(messages, **kwargs),
+                                       run_manager=run_manager)
+        async for chunk in chunks:
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+if __name__ == "__main__":
+    # Supervisor-style fan-out (three calls per turn) against a fake deployment with a quota of
+    # 20 requests/s and 5% injected 5xx: the SDK's own retries versus the governed client,
+    # then the same deployment during an outage.
+    import aiohttp
+    from langchain_core.messages import HumanMessage
+
+    from fake_llm_endpoint import FakeDeployment, start_fake_endpoint
+    from model_factory import create_azure_model
+
+    TURNS, QUOTA_RPS = 40, 20
+
+    def azure_model(url: str, **kwargs):
+        os.environ.update(AZURE_OPENAI_API_KEY="fake", AZURE_OPENAI_ENDPOINT=url,
+                          AZURE_OPENAI_DEPLOYMENT_NAME="fake-gpt", AZURE_OPENAI_API_VERSION="2024-06-01")
+        return create_azure_model(**kwargs)
+
+    async def turn(model, n: int):
+        # Supervisor, researcher and explainer of one turn hit the deployment at once;
+        # the last one is the background summarization of the previous turn
+        async def call(text, level):
+            with priority(level):
+                return await model.ainvoke([HumanMessage(text)])
+
+        return await asyncio.gather(
+            call(f"supervisor {n}", INTERACTIVE), call(f"researcher {n}", INTERACTIVE), call(f"summarize {n}", BACKGROUND),
+            return_exceptions=True,
+        )
+
+    async def run(label: str, model, fake: FakeDeployment, url: str, turns: int = TURNS):
+        fake.status_counts.clear()
+        started = time.perf_counter()
+        results = await asyncio.gather(*(turn(model, n) for n in range(turns)))
+        elapsed = time.perf_counter() - started
+        errors = sum(isinstance(r, Exception) for batch in results for r in batch)
+        async with aiohttp.ClientSession() as http:
+            async with http.get(f"{url}/_stats") as response:
+                statuses = await response.json()
+        print(f"{label:<28} {elapsed:6.2f}s  failed calls {errors:>3}/{turns * 3}  deployment statuses {statuses}")
+
+    async def main():
+        fake = FakeDeployment(rps=QUOTA_RPS, latency_s=0.05, error_rate_5xx=0.05, seed=1)
+        runner, url = await start_fake_endpoint(fake)
+        try:
+            await run("SDK retries (max_retries=2)", azure_model(url), fake, url)
+            await asyncio.sleep(1.1)
+
+            governor = LLMGovernor(RateLimiter(rpm=QUOTA_RPS * 60, tpm=0, burst_s=1), RetryPolicy(base_s=0.1, cap_s=2),
+                                   CircuitBreaker(failure_threshold=5, reset_s=1))
+            governed = GovernedChatModel(inner=azure_model(url, max_retries=0), governor=governor)
+            await run("governed client", governed, fake, url)
+            print(f"{'':<28} {governor.stats()}")
+
+            fake.outage = True
+            for label, model in (("outage, SDK retries", azure_model(url)), ("outage, governed", governed)):
+                await asyncio.sleep(1.1)
+                await run(label, model, fake, url, turns=10)
+            print(f"{'':<28} {governor.stats()}")
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(main())
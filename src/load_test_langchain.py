@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+# Keep the flight cache in memory so load tests never touch flight_cache.db.
+os.environ.setdefault("FLIGHT_CACHE_DB", "")
+
+from agents_langchain_async import AsyncTravelAssistant
+from plugins.search_flights import flight_search_cache
+from stub_llm import StubChatModel
+
+"""
+Load test for the async LangChain assistant against a local stub model.
+
+Runs --sessions concurrent conversations of --turns turns each and reports
+throughput and p50/p99 turn latency. Nothing leaves the machine: the model is
+StubChatModel and SerpAPI is replaced with a fake coroutine.
+
+    python load_test_langchain.py --sessions 500 --turns 4 --concurrency 200 --latency 0.05
+"""
+
+SAMPLE_QUERIES = [
+    "What are the best flights from Toronto, Ontario to Mumbai, India?",
+    "How is the weather in Mumbai in November?",
+    "What are the best day trips from Mumbai in November?",
+    "I'd like to spend a couple of weeks visiting India, this coming November, 2025",
+    "How far away is the Taj Mahal from Mumbai?",
+]
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+async def run_session(assistant: AsyncTravelAssistant, session_id: int, turns: int, latencies: list):
+    for turn in range(turns):
+        query = SAMPLE_QUERIES[(session_id + turn) % len(SAMPLE_QUERIES)]
+        started = time.perf_counter()
+        await assistant.handle(query)
+        latencies.append(time.perf_counter() - started)
+
+async def run(sessions: int, turns: int, concurrency: int, latency: float) -> dict:
+    async def fake_serpapi_search(params, **kwargs):
+        await asyncio.sleep(latency)
+        return {"best_flights": [{"price": 999, "departure_id": params["departure_id"]}]}
+
+    flight_search_cache.async_search = fake_serpapi_search
+    assistant = AsyncTravelAssistant(StubChatModel(latency_s=latency), max_concurrency=concurrency)
+    latencies = []
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(run_session(assistant, i, turns, latencies) for i in range(sessions)))
+    finally:
+        await assistant.aclose()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "sessions": sessions,
+        "turns": len(latencies),
+        "concurrency": concurrency,
+        "stub_latency_s": latency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_turns_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "routing": assistant.router.stats(),
+        "flight_cache": flight_search_cache.stats(),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the async LangChain assistant against a stub model.")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="synthetic stub model latency in seconds")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.sessions, args.turns, args.concurrency, args.latency))
+    for key, value in report.items():
+        print(f"{key:>24}: {value}")
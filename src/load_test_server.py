@@ -0,0 +1,171 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import time
+from collections import Counter
+
+# Keep the flight cache in memory so load tests never touch flight_cache.db.
+os.environ.setdefault("FLIGHT_CACHE_DB", "")
+
+import aiohttp
+from aiohttp import web
+
+from load_test_langchain import SAMPLE_QUERIES, percentile
+
+"""
+Load generator for agent_server.py.
+
+Without --url it starts the server in-process on a free port, with every agent on
+StubChatModel (--latency seconds per model call), a fake web search provider and an
+in-memory checkpoint store, then keeps --clients closed-loop clients busy for --duration
+seconds against the chosen endpoint and reports throughput, p50/p99 latency and how many
+requests were shed with 429. --burst then fires that many requests at once to show the
+admission queue rejecting the overflow rather than letting latency grow without bound.
+
+    python load_test_server.py --endpoint router --clients 64 --duration 10 --latency 0.05
+    python load_test_server.py --endpoint travel --stream --clients 32
+    python load_test_server.py --url http://127.0.0.1:8080 --endpoint supervisor
+"""
+
+ENDPOINTS = ["router", "supervisor", "travel"]
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def start_stub_server(latency: float, limits: dict = None):
+    """Runs agent_server on stub components and returns (runner, base url)."""
+    from agent_memory_langgraph import build_graph
+    from agent_registry import registry
+    from agent_server import create_app
+    from agents_langchain_async import AsyncTravelAssistant
+    from plugins.web_search import FakeSearchProvider
+    from session_manager import SessionManager
+    from stub_llm import StubChatModel
+
+    import agents_langgraph
+
+    registry.register("chat_model", lambda: StubChatModel(latency_s=latency))
+    agents_langgraph.web_search_client.provider = FakeSearchProvider()
+    model = registry.get("chat_model")
+    app = create_app(
+        assistant=AsyncTravelAssistant(model, max_concurrency=256),
+        supervisor=registry.get("supervisor_agent"),
+        sessions=SessionManager(build_graph(model), ":memory:", pool_size=1),
+        limits=limits,
+        queue_timeout_s=5,
+    )
+    runner = web.AppRunner(app)
+    await runner.setup()
+    port = _free_port()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner, f"http://127.0.0.1:{port}"
+
+def _request(endpoint: str, client_id: int, turn: int, stream: bool):
+    query = SAMPLE_QUERIES[(client_id + turn) % len(SAMPLE_QUERIES)]
+    path = f"/v1/travel/load-{client_id}" if endpoint == "travel" else f"/v1/{endpoint}"
+    return path, {"message": query, "stream": stream}
+
+async def _call(http: aiohttp.ClientSession, url: str, body: dict, stream: bool):
+    """Returns (status, time to first byte or None); streamed replies are read to the end."""
+    started = time.perf_counter()
+    async with http.post(url, json=body) as response:
+        if response.status != 200:
+            await response.read()
+            return response.status, None
+        if not stream:
+            await response.json()
+            return 200, None
+        first_byte = None
+        async for line in response.content:
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            if line.startswith(b"event: error"):
+                return 500, first_byte
+        return 200, first_byte
+
+async def run_load(base_url: str, endpoint: str, clients: int, duration: float, stream: bool) -> dict:
+    latencies, first_bytes, statuses = [], [], Counter()
+    deadline = time.perf_counter() + duration
+
+    async def client(http, client_id):
+        turn = 0
+        while time.perf_counter() < deadline:
+            path, body = _request(endpoint, client_id, turn, stream)
+            started = time.perf_counter()
+            status, first_byte = await _call(http, base_url + path, body, stream)
+            statuses[status] += 1
+            if status == 200:
+                latencies.append(time.perf_counter() - started)
+                if first_byte is not None:
+                    first_bytes.append(first_byte)
+            elif status in (429, 503):
+                await asyncio.sleep(0.05)
+            turn += 1
+
+    connector = aiohttp.TCPConnector(limit=0)
+    started = time.perf_counter()
+    async with aiohttp.ClientSession(connector=connector) as http:
+        await asyncio.gather(*(client(http, i) for i in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    report = {
+        "endpoint": endpoint,
+        "clients": clients,
+        "stream": stream,
+        "elapsed_s": round(elapsed, 2),
+        "completed": len(latencies),
+        "throughput_req_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+        "statuses": dict(statuses),
+    }
+    if first_bytes:
+        report["first_byte_p50_ms"] = round(statistics.median(first_bytes) * 1000, 1)
+    return report
+
+async def run_burst(base_url: str, endpoint: str, requests: int) -> dict:
+    """Fires requests at once; past max_concurrency + max_queue the server answers 429."""
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as http:
+        results = await asyncio.gather(*(
+            _call(http, base_url + path, body, False)
+            for path, body in (_request(endpoint, i, 0, False) for i in range(requests))
+        ))
+    return {"burst": requests, "burst_statuses": dict(Counter(status for status, _ in results))}
+
+async def main(args):
+    runner = None
+    base_url = args.url
+    if base_url is None:
+        runner, base_url = await start_stub_server(args.latency)
+    try:
+        report = await run_load(base_url, args.endpoint, args.clients, args.duration, args.stream)
+        if args.burst:
+            report.update(await run_burst(base_url, args.endpoint, args.burst))
+        async with aiohttp.ClientSession() as http:
+            async with http.get(base_url + "/stats") as response:
+                report["server"] = (await response.json())[args.endpoint]
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sustained-throughput load test of the agent HTTP server.")
+    parser.add_argument("--url", help="server to target; default starts a stub server in-process")
+    parser.add_argument("--endpoint", choices=ENDPOINTS, default="router")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of sustained load")
+    parser.add_argument("--stream", action="store_true", help="request server-sent event replies")
+    parser.add_argument("--burst", type=int, default=0, help="then send this many requests at once")
+    parser.add_argument("--latency", type=float, default=0.05, help="synthetic stub model latency in seconds")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    for key, value in report.items():
+        print(f"{key:>22}: {json.dumps(value) if isinstance(value, dict) else value}")
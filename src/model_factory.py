@@ -0,0 +1,288 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatResult
+
+from stub_llm import StubChatModel
+
+"""
+Pluggable chat model factory.
+
+create_chat_model() returns the model every agent script uses, selected by LLM_MODE:
+  - azure  (default): AzureChatOpenAI configured from the AZURE_OPENAI_* variables;
+  - stub:   StubChatModel, rule-based replies with no network access;
+  - record: the Azure client wrapped in RecordingChatModel, which appends every
+            request/response pair (tool calls included) to LLM_RECORDING as JSON lines;
+  - replay: ReplayChatModel, which answers from LLM_RECORDING with synthetic latency
+            (LLM_REPLAY_LATENCY_S) and token rate (LLM_REPLAY_TOKENS_PER_SECOND).
+Recording once against the real endpoint and replaying with zero latency measures the
+framework overhead of a graph on its own; replaying with latency added back shows how
+the same run behaves against a model of known speed.
+
+Models that call the deployment (azure, record) are wrapped in llm_client.GovernedChatModel,
+which shares one rate limit, retry policy and circuit breaker across the process; the SDK's
+own retries are turned off. LLM_GOVERNOR=0 disables the wrapper, LLM_GOVERNOR=1 applies it
+to every mode.
+"""
+
+LLM_MODES = ("azure", "stub", "record", "replay")
+GOVERNED_MODES = ("azure", "record")
+DEFAULT_RECORDING = os.getenv("LLM_RECORDING", "llm_recording.jsonl")
+
+def _canonical_message(message: BaseMessage) -> dict:
+    """
+    Message fields that identify a request. Tool results contribute only the tool name, and
+    call ids are dropped: both differ between runs (random ids, synthetic data, timestamps)
+    while the conversation is otherwise the same.
+    """
+    if isinstance(message, ToolMessage):
+        return {"type": "tool", "name": message.name}
+    entry = {"type": message.type, "content": message.content}
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        entry["tool_calls"] = [{"name": call["name"], "args": call["args"]} for call in tool_calls]
+    return entry
+
+def _tool_name(tool: dict) -> str:
+    return tool.get("function", tool).get("name", "")
+
+def request_key(messages: List[BaseMessage], tools: Optional[list] = None) -> str:
+    """Stable hash of a model request: canonical messages plus the names of the bound tools."""
+    payload = {
+        "messages": [_canonical_message(message) for message in messages],
+        "tools": sorted(_tool_name(tool) for tool in tools or []),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class RecordingChatModel(BaseChatModel):
+    """
+    Wraps a chat model and appends every request/response pair to path (JSON lines).
+    Tool binding and structured output are delegated to the wrapped model's bind_tools.
+    """
+
+    inner: Any
+    path: str = DEFAULT_RECORDING
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        self._lock = threading.Lock()
+
+    @property
+    def _llm_type(self) -> str:
+        return f"recording-{self.inner._llm_type}"
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        bound = self.inner.bind_tools(tools, tool_choice=tool_choice, **kwargs)
+        return self.bind(**bound.kwargs)
+
+    def _record(self, messages: List[BaseMessage], result: ChatResult, latency_s: float, **kwargs):
+        message = result.generations[0].message
+        record = {
+            "key": request_key(messages, kwargs.get("tools")),
+            "request": [message_to_dict(m) for m in messages],
+            "tools": [_tool_name(tool) for tool in kwargs.get("tools") or []],
+            "response": message_to_dict(message),
+            "latency_s": round(latency_s, 4),
+        }
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        started = time.perf_counter()
+        result = self.inner._generate(messages, stop=stop, **kwargs)
+        self._record(messages, result, time.perf_counter() - started, **kwargs)
+        return result
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        started = time.perf_counter()
+        result = await self.inner._agenerate(messages, stop=stop, **kwargs)
+        await asyncio.to_thread(self._record, messages, result, time.perf_counter() - started, **kwargs)
+        return result
+
+
+def load_recording(path: str) -> dict:
+    """Reads a recording into {request key: [response messages in recorded order]}."""
+    responses = defaultdict(list)
+    if not os.path.exists(path):
+        return responses
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                responses[record["key"]].append(messages_from_dict([record["response"]])[0])
+    return responses
+
+
+class ReplayChatModel(StubChatModel):
+    """
+    Answers from a recording made by RecordingChatModel. Each call waits latency_s plus
+    output tokens / tokens_per_second (streamed replies pace the tokens instead).
+    A request that was recorded several times replays its responses in order, cycling.
+    Unrecorded requests fall back to the StubChatModel rules, or raise KeyError when
+    fallback is "error".
+    """
+
+    path: str = DEFAULT_RECORDING
+    fallback: str = "stub"
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        self._responses = load_recording(self.path)
+        self._positions = defaultdict(int)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _reply(self, messages: List[BaseMessage], tools: Optional[list], tool_choice: Any) -> AIMessage:
+        key = request_key(messages, tools)
+        with self._lock:
+            recorded = self._responses.get(key)
+            if recorded:
+                self._hits += 1
+                response = recorded[self._positions[key] % len(recorded)]
+                self._positions[key] += 1
+            else:
+                self._misses += 1
+        if not recorded:
+            if self.fallback == "error":
+                raise KeyError(f"No recorded response for request {key[:12]}")
+            return super()._reply(messages, tools, tool_choice)
+        # Fresh message and tool call ids, so replaying the same response twice in one thread
+        # neither replaces the earlier message nor pairs tool results with the wrong call.
+        return response.model_copy(update={
+            "id": None,
+            "usage_metadata": None,
+            "tool_calls": [dict(call, id=f"call_{uuid.uuid4().hex[:12]}") for call in response.tool_calls],
+        })
+
+    def _delay(self, result: ChatResult) -> float:
+        delay = self.latency_s
+        if self.tokens_per_second:
+            delay += result.generations[0].message.usage_metadata["output_tokens"] / self.tokens_per_second
+        return delay
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        result = self._result(messages, **kwargs)
+        if self._delay(result):
+            time.sleep(self._delay(result))
+        return result
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        result = self._result(messages, **kwargs)
+        if self._delay(result):
+            await asyncio.sleep(self._delay(result))
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls = self._hits + self._misses
+            return {
+                "recorded_requests": len(self._responses),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / calls, 3) if calls else 0.0,
+            }
+
+
+def create_azure_model(temperature: float = 0.7, **kwargs):
+    from langchain_openai import AzureChatOpenAI
+
+    return AzureChatOpenAI(
+        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        deployment_name=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+        openai_api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+        temperature=temperature,
+        **kwargs
+    )
+
+def _governed(mode: str) -> bool:
+    setting = os.getenv("LLM_GOVERNOR", "auto").lower()
+    if setting in ("0", "1"):
+        return setting == "1"
+    return mode in GOVERNED_MODES
+
+def create_chat_model(mode: str = None, temperature: float = 0.7, recording: str = None, governed: bool = None, **kwargs):
+    """
+    Returns the chat model for mode (default: LLM_MODE, else "azure").
+    recording overrides LLM_RECORDING for the record and replay modes; governed overrides
+    LLM_GOVERNOR.
+    """
+    mode = (mode or os.getenv("LLM_MODE", "azure")).lower()
+    recording = recording or DEFAULT_RECORDING
+    governed = _governed(mode) if governed is None else governed
+    if governed:
+        # The governor retries with jitter; SDK retries on top would multiply the attempts
+        kwargs.setdefault("max_retries", 0)
+
+    if mode == "azure":
+        model = create_azure_model(temperature=temperature, **kwargs)
+    elif mode == "stub":
+        model = StubChatModel(
+            latency_s=float(os.getenv("LLM_STUB_LATENCY_S", 0)),
+            tokens_per_second=float(os.getenv("LLM_STUB_TOKENS_PER_SECOND", 0)),
+        )
+    elif mode == "record":
+        model = RecordingChatModel(inner=create_azure_model(temperature=temperature, **kwargs), path=recording)
+    elif mode == "replay":
+        model = ReplayChatModel(
+            path=recording,
+            latency_s=float(os.getenv("LLM_REPLAY_LATENCY_S", 0)),
+            tokens_per_second=float(os.getenv("LLM_REPLAY_TOKENS_PER_SECOND", 0)),
+            fallback=os.getenv("LLM_REPLAY_FALLBACK", "stub"),
+        )
+    else:
+        raise ValueError(f"Unknown LLM_MODE '{mode}', expected one of {', '.join(LLM_MODES)}")
+
+    if not governed:
+        return model
+    from llm_client import GovernedChatModel
+
+    return GovernedChatModel(inner=model)
+
+
+if __name__ == "__main__":
+    # Record a few turns of the memory agent (against the stub, so this runs offline), then
+    # replay them with and without synthetic model latency to split framework overhead
+    # from model time.
+    from agent_memory_langgraph import build_graph
+
+    questions = ["What's the weather in Toronto?", "Any cultural events in Paris?", "Which cities do you support?"]
+
+    def run_turns(model) -> float:
+        agent = build_graph(model).compile()
+        started = time.perf_counter()
+        for question in questions:
+            agent.invoke({"messages": [HumanMessage(question)]})
+        return (time.perf_counter() - started) / len(questions)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "recording.jsonl")
+        run_turns(RecordingChatModel(inner=StubChatModel(), path=path))
+        with open(path, encoding="utf-8") as f:
+            print(f"recorded {sum(1 for _ in f)} model calls")
+
+        replay = ReplayChatModel(path=path, fallback="error")
+        overhead = run_turns(replay)
+        print(f"framework overhead: {overhead * 1000:.1f}ms per turn, replay {replay.stats()}")
+
+        slow = ReplayChatModel(path=path, latency_s=0.2, tokens_per_second=50)
+        total = run_turns(slow)
+        print(f"with 200ms + 50 tok/s model: {total * 1000:.1f}ms per turn "
+              f"({(total - overhead) / total:.0%} model time)")
@@ -0,0 +1,199 @@
+import bisect
+import json
+import os
+import pickle
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+
+"""
+In-memory airport index built once from airports_by_country.json.
+
+Country and city lookups are dictionary hits on case- and accent-normalized keys.
+City names that do not match exactly ("Toronto, Ontario", "Sao Paolo") fall back to
+a prefix search and then to a trigram similarity search.
+A pickled snapshot of the index can be written next to the JSON file so a cold
+start does not need to parse JSON at all.
+"""
+
+PLUGINS_DIR = os.path.dirname(os.path.abspath(__file__))
+AIRPORTS_JSON_PATH = os.path.join(PLUGINS_DIR, "airports_by_country.json")
+AIRPORTS_SNAPSHOT_PATH = os.path.join(PLUGINS_DIR, "airports_by_country.pkl")
+
+SNAPSHOT_VERSION = 1
+
+@lru_cache(maxsize=4096)
+def normalize(text: str) -> str:
+    """
+    Lower-cases, strips accents and collapses punctuation/whitespace, e.g. "  Bogotá " -> "bogota".
+    """
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return re.sub(r"[^\w]+", " ", stripped.casefold()).strip()
+
+def trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AirportIndex:
+    """
+    Hash maps from normalized country/city names to IATA codes, plus prefix and trigram
+    indexes over city names for fuzzy matching.
+    """
+
+    def __init__(self, airports: list, source_mtime: float = 0.0):
+        self.source_mtime = source_mtime
+        self.airports = {}
+        self.by_country = defaultdict(list)
+        self.by_city = defaultdict(list)
+        self.city_names = {}
+        self.city_trigram_count = {}
+        self.trigram_index = defaultdict(set)
+
+        for airport in airports:
+            code = airport["iata_code"]
+            self.airports[code] = airport
+            country_key = normalize(airport["country"])
+            city_key = normalize(airport["city"])
+            if code not in self.by_country[country_key]:
+                self.by_country[country_key].append(code)
+            if code not in self.by_city[city_key]:
+                self.by_city[city_key].append(code)
+            self.city_names[city_key] = airport["city"]
+            self.city_trigram_count[city_key] = len(trigrams(city_key))
+            for gram in trigrams(city_key):
+                self.trigram_index[gram].add(city_key)
+
+        self.by_country = dict(self.by_country)
+        self.by_city = dict(self.by_city)
+        self.trigram_index = {gram: frozenset(keys) for gram, keys in self.trigram_index.items()}
+        self.sorted_cities = sorted(self.by_city)
+
+    @classmethod
+    def from_json(cls, json_path: str = AIRPORTS_JSON_PATH):
+        with open(json_path, "r", encoding="utf-8") as f:
+            airports = json.load(f)
+        return cls(airports, source_mtime=os.path.getmtime(json_path))
+
+    def codes_by_country(self, country_name: str) -> list:
+        return list(self.by_country.get(normalize(country_name), []))
+
+    def codes_by_city(self, city: str) -> list:
+        """
+        Returns the IATA codes for a city name, trying in order: exact match, each
+        comma-separated part ("Toronto, Ontario"), prefix match and trigram similarity.
+        """
+        key = normalize(city)
+        if not key:
+            return []
+        codes = self.by_city.get(key)
+        if codes:
+            return list(codes)
+        for part in city.split(","):
+            codes = self.by_city.get(normalize(part))
+            if codes:
+                return list(codes)
+        for city_key in (self.match_prefix(key) or self.match_fuzzy(key)):
+            return list(self.by_city[city_key])
+        return []
+
+    def match_prefix(self, prefix: str) -> list:
+        """Returns the normalized city keys starting with prefix (at least 3 characters)."""
+        if len(prefix) < 3:
+            return []
+        start = bisect.bisect_left(self.sorted_cities, prefix)
+        matches = []
+        for city_key in self.sorted_cities[start:]:
+            if not city_key.startswith(prefix):
+                break
+            matches.append(city_key)
+        return matches
+
+    def match_fuzzy(self, key: str, threshold: float = 0.45) -> list:
+        """Returns city keys ordered by trigram Jaccard similarity, best first, above threshold."""
+        query = trigrams(key)
+        overlap = defaultdict(int)
+        for gram in query:
+            for city_key in self.trigram_index.get(gram, ()):
+                overlap[city_key] += 1
+        scored = []
+        for city_key, shared in overlap.items():
+            score = shared / (len(query) + self.city_trigram_count[city_key] - shared)
+            if score >= threshold:
+                scored.append((score, city_key))
+        return [city_key for _, city_key in sorted(scored, reverse=True)]
+
+    def save_snapshot(self, snapshot_path: str = AIRPORTS_SNAPSHOT_PATH):
+        """Writes the built index as a pickle, atomically replacing any previous snapshot."""
+        tmp_path = f"{snapshot_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"version": SNAPSHOT_VERSION, "state": self.__dict__}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot_path)
+
+    @classmethod
+    def load_snapshot(cls, snapshot_path: str = AIRPORTS_SNAPSHOT_PATH, json_path: str = AIRPORTS_JSON_PATH):
+        """Returns the pickled index, or None when it is missing, unreadable or older than the JSON file."""
+        try:
+            with open(snapshot_path, "rb") as f:
+                snapshot = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+            return None
+        index = cls.__new__(cls)
+        index.__dict__.update(snapshot["state"])
+        if os.path.exists(json_path) and os.path.getmtime(json_path) > index.source_mtime:
+            return None
+        return index
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_airport_index() -> AirportIndex:
+    """
+    Returns the process-wide airport index, building it on first use.
+    A valid snapshot is preferred over parsing the JSON file.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = AirportIndex.load_snapshot() or AirportIndex.from_json()
+    return _index
+
+def reset_airport_index():
+    """Drops the cached index so the next lookup rebuilds it (e.g. after editing the JSON file)."""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+if __name__ == "__main__":
+    # Micro-benchmark: the original load-and-scan lookup versus the in-memory index.
+    import timeit
+
+    def scan_lookup(city: str):
+        with open(AIRPORTS_JSON_PATH, "r", encoding="utf-8") as f:
+            airports = json.load(f)
+        return [airport["iata_code"] for airport in airports if airport["city"].lower() == city.lower()]
+
+    runs = 20000
+    index = AirportIndex.from_json()
+    cold_json = timeit.timeit(AirportIndex.from_json, number=200) / 200
+    index.save_snapshot()
+    cold_snapshot = timeit.timeit(AirportIndex.load_snapshot, number=200) / 200
+    before = timeit.timeit(lambda: scan_lookup("Mumbai"), number=runs) / runs
+    after = timeit.timeit(lambda: index.codes_by_city("Mumbai"), number=runs) / runs
+    fuzzy = timeit.timeit(lambda: index.codes_by_city("Toronto, Ontario"), number=runs) / runs
+
+    print(f"cold start from JSON:     {cold_json * 1e6:8.1f} us")
+    print(f"cold start from snapshot: {cold_snapshot * 1e6:8.1f} us")
+    print(f"city lookup (scan):       {before * 1e6:8.1f} us")
+    print(f"city lookup (index):      {after * 1e6:8.1f} us  ({before / after:.0f}x faster)")
+    print(f"fuzzy lookup (index):     {fuzzy * 1e6:8.1f} us  -> {index.codes_by_city('Toronto, Ontario')}")
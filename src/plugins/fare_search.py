@@ -0,0 +1,291 @@
+import asyncio
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+"""
+Fare search over every airport pair and date of a trip.
+
+FareSearch expands a city pair into departure x arrival airports and the outbound/return
+dates into a flexible window of +/- flex_days (the trip length stays the same). It runs
+one search per combination on a bounded worker pool, normalizes the SerpAPI google_flights
+payloads into Itinerary records, drops duplicates and returns the top_k ranked by price,
+duration or stops. Only format_itineraries(), a few lines of text, reaches the agent; the
+raw payloads stay in the flight cache.
+
+Backends expose search(params) -> dict and async asearch(params, **kwargs) -> dict.
+SerpApiBackend goes through the flight search cache; FakeFareBackend generates
+deterministic offers locally for offline runs and benchmarks.
+"""
+
+DEFAULT_MAX_WORKERS = int(os.getenv("FARE_SEARCH_WORKERS", 8))
+DEFAULT_FLEX_DAYS = int(os.getenv("FARE_SEARCH_FLEX_DAYS", 0))
+DEFAULT_TOP_K = int(os.getenv("FARE_SEARCH_TOP_K", 5))
+
+SORT_KEYS = {
+    "price": lambda itinerary: (itinerary.price, itinerary.duration_min, itinerary.stops),
+    "duration": lambda itinerary: (itinerary.duration_min, itinerary.price, itinerary.stops),
+    "stops": lambda itinerary: (itinerary.stops, itinerary.price, itinerary.duration_min),
+}
+
+def route_params(departure_id: str, arrival_id: str, outbound_date: str, return_date: str, api_key: str = None) -> dict:
+    """SerpAPI google_flights parameters for one airport pair and one pair of dates (round trip)."""
+    return {
+        "engine": "google_flights",
+        "hl": "en",
+        "departure_id": departure_id,
+        "arrival_id": arrival_id,
+        "outbound_date": outbound_date,
+        "return_date": return_date,
+        "currency": "USD",
+        "type": "1",
+        "api_key": api_key
+    }
+
+
+@dataclass(frozen=True)
+class Itinerary:
+    price: float
+    currency: str
+    origin: str
+    destination: str
+    outbound_date: str
+    return_date: str
+    duration_min: int
+    stops: int
+    airlines: tuple
+    flight_numbers: tuple
+    departure_time: str = ""
+    arrival_time: str = ""
+
+    @property
+    def dedup_key(self) -> tuple:
+        return (self.flight_numbers, self.outbound_date, self.return_date)
+
+    def describe(self) -> str:
+        hours, minutes = divmod(self.duration_min, 60)
+        stops = "nonstop" if not self.stops else f"{self.stops} stop{'s' if self.stops > 1 else ''}"
+        flights = ", ".join(self.flight_numbers) or "/".join(self.airlines)
+        return (f"{self.currency} {self.price:,.0f} {self.origin}->{self.destination} "
+                f"{self.outbound_date} to {self.return_date}, {hours}h{minutes:02d} {stops} ({flights})")
+
+
+@dataclass
+class FareSearchResult:
+    itineraries: list
+    searched: int = 0
+    failed: int = 0
+    found: int = 0
+    elapsed_s: float = 0.0
+    errors: list = field(default_factory=list)
+
+
+def normalize_itineraries(response: dict, params: dict) -> list:
+    """Converts the best_flights/other_flights offers of one SerpAPI response into Itinerary records."""
+    itineraries = []
+    for offer in (response.get("best_flights") or []) + (response.get("other_flights") or []):
+        legs = offer.get("flights") or []
+        if not legs or offer.get("price") is None:
+            continue
+        itineraries.append(Itinerary(
+            price=float(offer["price"]),
+            currency=params.get("currency", "USD"),
+            origin=legs[0].get("departure_airport", {}).get("id", params.get("departure_id", "")),
+            destination=legs[-1].get("arrival_airport", {}).get("id", params.get("arrival_id", "")),
+            outbound_date=params.get("outbound_date", ""),
+            return_date=params.get("return_date", ""),
+            duration_min=int(offer.get("total_duration") or sum(leg.get("duration", 0) for leg in legs)),
+            stops=len(legs) - 1,
+            airlines=tuple(dict.fromkeys(leg.get("airline", "") for leg in legs)),
+            flight_numbers=tuple(leg.get("flight_number", "") for leg in legs),
+            departure_time=legs[0].get("departure_airport", {}).get("time", ""),
+            arrival_time=legs[-1].get("arrival_airport", {}).get("time", ""),
+        ))
+    return itineraries
+
+def rank_itineraries(itineraries: list, sort_by: str = "price", top_k: int = DEFAULT_TOP_K) -> list:
+    """Keeps the cheapest copy of each flight combination and returns the top_k by sort_by."""
+    unique = {}
+    for itinerary in itineraries:
+        kept = unique.get(itinerary.dedup_key)
+        if kept is None or itinerary.price < kept.price:
+            unique[itinerary.dedup_key] = itinerary
+    return sorted(unique.values(), key=SORT_KEYS[sort_by])[:top_k]
+
+def format_itineraries(result: FareSearchResult) -> str:
+    """Compact text summary for the agent: one line per itinerary."""
+    if not result.itineraries:
+        failures = f" ({result.failed} searches failed: {result.errors[0]})" if result.failed else ""
+        return f"[Flight Agent] No flights found across {result.searched} airport/date combinations{failures}."
+    failures = f", {result.failed} failed" if result.failed else ""
+    lines = [f"[Flight Agent] Top {len(result.itineraries)} of {result.found} offers "
+             f"({result.searched} airport/date combinations searched{failures}):"]
+    lines += [f"{i + 1}. {itinerary.describe()}" for i, itinerary in enumerate(result.itineraries)]
+    return "\n".join(lines)
+
+
+class SerpApiBackend:
+    """Searches through a FlightSearchCache, so repeated combinations are served from cache."""
+
+    def __init__(self, cache, api_key: str = None):
+        self.cache = cache
+        self.api_key = api_key
+
+    def params(self, departure_id: str, arrival_id: str, outbound_date: str, return_date: str) -> dict:
+        return route_params(departure_id, arrival_id, outbound_date, return_date, self.api_key)
+
+    def search(self, params: dict) -> dict:
+        return self.cache.get_or_fetch(params)
+
+    async def asearch(self, params: dict, **kwargs) -> dict:
+        return await self.cache.aget_or_fetch(params, **kwargs)
+
+
+class FakeFareBackend:
+    """
+    Deterministic offline backend: the offers for a combination depend only on its
+    airports and dates. Records every params dict it receives in calls.
+    """
+
+    AIRLINES = ("Air Canada", "British Airways", "Emirates", "Lufthansa", "Air India", "Qatar Airways")
+
+    def __init__(self, latency_s: float = 0.0, offers: int = 4, api_key: str = None):
+        self.latency_s = latency_s
+        self.offers = offers
+        self.api_key = api_key
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def params(self, departure_id: str, arrival_id: str, outbound_date: str, return_date: str) -> dict:
+        return route_params(departure_id, arrival_id, outbound_date, return_date, self.api_key)
+
+    def _response(self, params: dict) -> dict:
+        with self._lock:
+            self.calls.append(params)
+        seed = zlib.crc32(f"{params['departure_id']}{params['arrival_id']}{params['outbound_date']}".encode())
+        offers = []
+        for i in range(self.offers):
+            h = zlib.crc32(f"{seed}-{i}".encode())
+            stops = h % 3
+            airline = self.AIRLINES[(h >> 4) % len(self.AIRLINES)]
+            legs = [{
+                "departure_airport": {"id": params["departure_id"] if leg == 0 else f"X{leg}{h % 9}",
+                                      "time": f"{params['outbound_date']} {(h >> 8) % 24:02d}:{(h >> 12) % 60:02d}"},
+                "arrival_airport": {"id": params["arrival_id"] if leg == stops else f"X{leg + 1}{h % 9}"},
+                "duration": 240 + (h >> 16) % 420,
+                "airline": airline,
+                "flight_number": f"{airline[:2].upper()} {100 + (h >> leg) % 900}",
+            } for leg in range(stops + 1)]
+            offers.append({"flights": legs, "price": 600 + (h >> 20) % 1400 - 150 * (2 - stops),
+                           "total_duration": sum(leg["duration"] for leg in legs) + 90 * stops})
+        return {"best_flights": offers[:2], "other_flights": offers[2:]}
+
+    def search(self, params: dict) -> dict:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return self._response(params)
+
+    async def asearch(self, params: dict, **kwargs) -> dict:
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        return self._response(params)
+
+
+class FareSearch:
+    """
+    Expands a trip into airport/date combinations, searches them concurrently (at most
+    max_workers at a time) and ranks the normalized offers.
+    """
+
+    def __init__(self, backend, max_workers: int = DEFAULT_MAX_WORKERS):
+        self.backend = backend
+        self.max_workers = max_workers
+
+    def expand(self, departure_ids: list, arrival_ids: list, outbound_date: str, return_date: str,
+               flex_days: int = DEFAULT_FLEX_DAYS, today: date = None) -> list:
+        """
+        Returns the search params for every airport pair and every date shift in
+        [-flex_days, +flex_days]. Shifted dates that would depart before today are skipped.
+        """
+        outbound, inbound = date.fromisoformat(outbound_date), date.fromisoformat(return_date)
+        today = today or date.today()
+        combinations = []
+        for shift in range(-flex_days, flex_days + 1):
+            delta = timedelta(days=shift)
+            if shift and outbound + delta < today:
+                continue
+            for departure_id in departure_ids:
+                for arrival_id in arrival_ids:
+                    if departure_id != arrival_id:
+                        combinations.append(self.backend.params(
+                            departure_id, arrival_id, (outbound + delta).isoformat(), (inbound + delta).isoformat()
+                        ))
+        return combinations
+
+    def _collect(self, combinations: list, responses: list, started: float, sort_by: str, top_k: int) -> FareSearchResult:
+        result = FareSearchResult(itineraries=[], searched=len(combinations))
+        itineraries = []
+        for params, response in zip(combinations, responses):
+            if isinstance(response, BaseException) or not isinstance(response, dict) or "error" in response:
+                result.failed += 1
+                result.errors.append(str(response.get("error") if isinstance(response, dict) else response))
+                continue
+            itineraries.extend(normalize_itineraries(response, params))
+        result.found = len(itineraries)
+        result.itineraries = rank_itineraries(itineraries, sort_by, top_k)
+        result.elapsed_s = time.perf_counter() - started
+        return result
+
+    def search(self, departure_ids: list, arrival_ids: list, outbound_date: str, return_date: str,
+               flex_days: int = DEFAULT_FLEX_DAYS, sort_by: str = "price", top_k: int = DEFAULT_TOP_K) -> FareSearchResult:
+        started = time.perf_counter()
+        combinations = self.expand(departure_ids, arrival_ids, outbound_date, return_date, flex_days)
+
+        def safe_search(params):
+            try:
+                return self.backend.search(params)
+            except Exception as e:
+                return e
+
+        if len(combinations) <= 1:
+            responses = [safe_search(params) for params in combinations]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(combinations))) as pool:
+                responses = list(pool.map(safe_search, combinations))
+        return self._collect(combinations, responses, started, sort_by, top_k)
+
+    async def asearch(self, departure_ids: list, arrival_ids: list, outbound_date: str, return_date: str,
+                      flex_days: int = DEFAULT_FLEX_DAYS, sort_by: str = "price", top_k: int = DEFAULT_TOP_K,
+                      **search_kwargs) -> FareSearchResult:
+        """Async variant of search; a semaphore keeps at most max_workers searches in flight."""
+        started = time.perf_counter()
+        combinations = self.expand(departure_ids, arrival_ids, outbound_date, return_date, flex_days)
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def bounded_search(params):
+            async with semaphore:
+                return await self.backend.asearch(params, **search_kwargs)
+
+        responses = await asyncio.gather(*(bounded_search(params) for params in combinations), return_exceptions=True)
+        return self._collect(combinations, responses, started, sort_by, top_k)
+
+
+if __name__ == "__main__":
+    # Toronto (2 airports) to India (2 airports) with a +/- 2 day window against a fake
+    # backend with 300ms per search: 20 combinations, searched 8 at a time.
+    outbound = date.today() + timedelta(days=30)
+    backend = FakeFareBackend(latency_s=0.3)
+    fares = FareSearch(backend)
+    result = fares.search(["YYZ", "YTZ"], ["BOM", "DEL"], outbound.isoformat(), (outbound + timedelta(days=14)).isoformat(),
+                          flex_days=2)
+    print(format_itineraries(result))
+    print(f"\n{result.searched} searches in {result.elapsed_s:.2f}s "
+          f"(sequential: {result.searched * backend.latency_s:.2f}s), {result.found} offers -> {len(result.itineraries)}")
+
+    result = asyncio.run(fares.asearch(["YYZ", "YTZ"], ["BOM", "DEL"], outbound.isoformat(),
+                                       (outbound + timedelta(days=14)).isoformat(), flex_days=2, sort_by="duration"))
+    print(f"async: {result.searched} searches in {result.elapsed_s:.2f}s, fastest: {result.itineraries[0].describe()}")
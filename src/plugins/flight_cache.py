@@ -0,0 +1,319 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+"""
+Two-tier response cache for Google Flights (SerpAPI) searches.
+
+Entries are keyed on the normalized (departure_id, arrival_id, outbound_date, return_date,
+currency, type) tuple and expire after a per-entry TTL so fares do not go stale.
+The memory tier is an LRU bounded by a byte budget; the optional SQLite tier survives
+restarts and is shared by every process pointing at the same file.
+Concurrent misses for the same key are coalesced into a single upstream request.
+"""
+
+KEY_FIELDS = ("departure_id", "arrival_id", "outbound_date", "return_date", "currency", "type")
+
+DEFAULT_TTL_SECONDS = float(os.getenv("FLIGHT_CACHE_TTL", 15 * 60))
+DEFAULT_MEMORY_BUDGET_BYTES = int(os.getenv("FLIGHT_CACHE_MEMORY_BYTES", 32 * 1024 * 1024))
+DEFAULT_DB_PATH = os.getenv("FLIGHT_CACHE_DB", "flight_cache.db")
+
+def _normalize_field(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple, set)):
+        return ",".join(sorted(str(item).strip().upper() for item in value))
+    return ",".join(sorted(part.strip().upper() for part in str(value).split(",")))
+
+def cache_key(params: dict) -> str:
+    """
+    Returns the cache key for a SerpAPI google_flights parameter dict, e.g.
+    {"departure_id": ["YYZ"], "arrival_id": "bom", ...} -> "YYZ|BOM|2025-11-11|2025-11-25|USD|1".
+    """
+    return "|".join(_normalize_field(params.get(name)) for name in KEY_FIELDS)
+
+
+class MemoryTier:
+    """In-process LRU whose total size, measured as serialized JSON bytes, stays under budget_bytes."""
+
+    def __init__(self, budget_bytes: int = DEFAULT_MEMORY_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, now: float):
+        """Returns (status, value, expires_at) where status is "hit", "miss" or "expired"."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return "miss", None, None
+            value, expires_at, size = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.used_bytes -= size
+                return "expired", None, None
+            self._entries.move_to_end(key)
+            return "hit", value, expires_at
+
+    def set(self, key: str, value, expires_at: float, size: int) -> int:
+        """
+        Stores value and returns the number of entries evicted to respect the byte budget.
+        A value larger than the whole budget is not kept, and drops the key's previous value.
+        """
+        evicted = 0
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.used_bytes -= previous[2]
+            if size > self.budget_bytes:
+                return 0
+            while self._entries and self.used_bytes + size > self.budget_bytes:
+                _, (_, _, old_size) = self._entries.popitem(last=False)
+                self.used_bytes -= old_size
+                evicted += 1
+            self._entries[key] = (value, expires_at, size)
+            self.used_bytes += size
+        return evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.used_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SqliteTier:
+    """Persistent tier storing JSON payloads with their absolute expiry time."""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS flight_cache ("
+            "key TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str, now: float):
+        """Returns (status, payload, expires_at) where status is "hit", "miss" or "expired"."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM flight_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return "miss", None, None
+            payload, expires_at = row
+            if expires_at <= now:
+                self._conn.execute("DELETE FROM flight_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return "expired", None, None
+            return "hit", payload, expires_at
+
+    def set(self, key: str, payload: str, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO flight_cache (key, payload, expires_at) VALUES (?, ?, ?)",
+                (key, payload, expires_at)
+            )
+            self._conn.commit()
+
+    def purge_expired(self, now: float = None) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM flight_cache WHERE expires_at <= ?", (now or time.time(),))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM flight_cache")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class FlightSearchCache:
+    """
+    Read-through cache in front of a SerpAPI search.
+
+    search_factory is the GoogleSearch class (or any object with the same
+    constructor(params) / get_dict() shape), which lets callers plug in a fake.
+    async_search is the coroutine function used by aget_or_fetch, called as
+    async_search(params, **search_kwargs).
+    Cached payloads are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, search_factory=None, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 memory_tier: MemoryTier = None, disk_tier: SqliteTier = None, clock=time.time,
+                 async_search=None):
+        self.search_factory = search_factory
+        self.async_search = async_search
+        self.ttl_seconds = ttl_seconds
+        self.memory_tier = memory_tier if memory_tier is not None else MemoryTier()
+        self.disk_tier = disk_tier
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._ainflight = {}
+        self.metrics = {
+            "memory_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0,
+            "evictions": 0, "expirations": 0, "upstream_calls": 0, "upstream_errors": 0
+        }
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.metrics[name] += amount
+
+    def lookup(self, key: str):
+        """Returns (hit, value) from the memory tier, then the disk tier (promoting disk hits)."""
+        now = self.clock()
+        status, value, _ = self.memory_tier.get(key, now)
+        if status == "expired":
+            self._count("expirations")
+        if status == "hit":
+            self._count("memory_hits")
+            return True, value
+        if self.disk_tier is None:
+            return False, None
+        status, payload, expires_at = self.disk_tier.get(key, now)
+        if status == "expired":
+            self._count("expirations")
+        if status != "hit":
+            return False, None
+        self._count("disk_hits")
+        value = json.loads(payload)
+        self._count("evictions", self.memory_tier.set(key, value, expires_at, len(payload)))
+        return True, value
+
+    def store(self, key: str, value, ttl_seconds: float = None):
+        payload = json.dumps(value)
+        expires_at = self.clock() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        self._count("evictions", self.memory_tier.set(key, value, expires_at, len(payload)))
+        if self.disk_tier is not None:
+            self.disk_tier.set(key, payload, expires_at)
+
+    def get_or_fetch(self, params: dict, fetch=None, ttl_seconds: float = None):
+        """
+        Returns the cached response for params, or calls fetch() (default: search_factory(params).get_dict())
+        once per key even when many threads miss at the same time.
+        Responses carrying an "error" key are returned but never cached.
+        """
+        key = cache_key(params)
+        hit, value = self.lookup(key)
+        if hit:
+            return value
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.metrics["misses"] += 1
+            else:
+                self.metrics["coalesced"] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            self._count("upstream_calls")
+            if fetch is None:
+                value = self.search_factory(params).get_dict()
+            else:
+                value = fetch()
+            if not (isinstance(value, dict) and "error" in value):
+                self.store(key, value, ttl_seconds)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            self._count("upstream_errors")
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def aget_or_fetch(self, params: dict, ttl_seconds: float = None, **search_kwargs):
+        """
+        Async counterpart of get_or_fetch: concurrent misses on the same event loop await
+        a single async_search(params, **search_kwargs) task.
+        """
+        key = cache_key(params)
+        hit, value = self.lookup(key)
+        if hit:
+            return value
+
+        inflight_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            task = self._ainflight.get(inflight_key)
+            if task is None:
+                task = asyncio.ensure_future(self._afetch_and_store(inflight_key, params, ttl_seconds, search_kwargs))
+                self._ainflight[inflight_key] = task
+                self.metrics["misses"] += 1
+            else:
+                self.metrics["coalesced"] += 1
+        # Shielded so one cancelled caller does not cancel the fetch for everyone else.
+        return await asyncio.shield(task)
+
+    async def _afetch_and_store(self, inflight_key, params: dict, ttl_seconds: float, search_kwargs: dict):
+        try:
+            self._count("upstream_calls")
+            value = await self.async_search(params, **search_kwargs)
+            if not (isinstance(value, dict) and "error" in value):
+                self.store(inflight_key[1], value, ttl_seconds)
+            return value
+        except BaseException:
+            self._count("upstream_errors")
+            raise
+        finally:
+            with self._lock:
+                self._ainflight.pop(inflight_key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            metrics = dict(self.metrics)
+        hits = metrics["memory_hits"] + metrics["disk_hits"] + metrics["coalesced"]
+        lookups = hits + metrics["misses"]
+        metrics["hit_ratio"] = round(hits / lookups, 3) if lookups else 0.0
+        metrics["memory_entries"] = len(self.memory_tier)
+        metrics["memory_bytes"] = self.memory_tier.used_bytes
+        return metrics
+
+    def clear(self):
+        self.memory_tier.clear()
+        if self.disk_tier is not None:
+            self.disk_tier.clear()
+
+
+if __name__ == "__main__":
+    # 20 concurrent identical searches and a rephrased repeat cost a single upstream call
+    # (tests/test_flight_cache.py runs the same checks against a fake GoogleSearch)
+    from concurrent.futures import ThreadPoolExecutor
+
+    calls = []
+
+    def slow_search():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"best_flights": [{"price": 1234}]}
+
+    cache = FlightSearchCache(disk_tier=SqliteTier(":memory:"))
+    params = {"departure_id": ["YYZ"], "arrival_id": ["BOM"], "outbound_date": "2025-11-11",
+              "return_date": "2025-11-25", "currency": "USD", "type": "1"}
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        list(pool.map(lambda _: cache.get_or_fetch(params, fetch=slow_search), range(20)))
+    cache.get_or_fetch(dict(params, departure_id="yyz", arrival_id=" bom", currency="usd"), fetch=slow_search)
+    print(f"upstream calls: {len(calls)}")
+    print(cache.stats())
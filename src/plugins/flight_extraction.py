@@ -0,0 +1,310 @@
+import re
+import threading
+from datetime import date, timedelta
+from typing import Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from pydantic import BaseModel, Field, ValidationError, field_validator, model_validator
+
+from plugins.airport_index import get_airport_index, normalize
+
+"""
+Flight detail extraction for the flight tool: origin, destination, departure and return date.
+
+A deterministic parser runs first. City names are matched against the airport index and
+dates are read from absolute forms ("November 11, 2025", "11 Nov 2025", "2025-11-11") and
+relative ones ("two weeks later", "for 10 days", "tomorrow", "in 3 weeks"). The LLM is only
+asked for the fields the parser could not fill, through schema-constrained structured
+output (FlightDetails), and is retried once when its answer fails validation. The
+extractor never raises: fields it cannot fill are None, and get_flight_info asks the user
+for them.
+"""
+
+FIELDS = ("origin", "destination", "departure_date", "return_date")
+
+MONTHS = {
+    "jan": 1, "january": 1, "feb": 2, "february": 2, "mar": 3, "march": 3, "apr": 4, "april": 4,
+    "may": 5, "jun": 6, "june": 6, "jul": 7, "july": 7, "aug": 8, "august": 8, "sep": 9, "sept": 9,
+    "september": 9, "oct": 10, "october": 10, "nov": 11, "november": 11, "dec": 12, "december": 12,
+}
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "a couple of": 2, "couple of": 2, "a few": 3, "three": 3,
+    "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11,
+    "twelve": 12, "fourteen": 14, "fifteen": 15, "twenty": 20, "thirty": 30,
+}
+
+UNIT_DAYS = {"day": 1, "night": 1, "week": 7, "fortnight": 14}
+
+_MONTH = "|".join(sorted(MONTHS, key=len, reverse=True))
+_NUMBER = r"\d{1,3}|" + "|".join(re.escape(word) for word in sorted(NUMBER_WORDS, key=len, reverse=True))
+_UNIT = r"(?P<unit>day|night|week|fortnight)s?"
+
+# Each pattern yields one absolute date; positions decide which one is the departure.
+_ISO_DATE = re.compile(r"\b(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})\b")
+_MONTH_DAY = re.compile(
+    rf"\b(?P<month>{_MONTH})\.?\s+(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\b(?:,?\s*(?P<year>\d{{4}})\b)?", re.IGNORECASE
+)
+_DAY_MONTH = re.compile(
+    rf"\b(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<month>{_MONTH})\b\.?(?:,?\s*(?P<year>\d{{4}})\b)?", re.IGNORECASE
+)
+_NUMERIC_DATE = re.compile(r"\b(?P<month>\d{1,2})/(?P<day>\d{1,2})/(?P<year>\d{4})\b")
+
+_TODAY = re.compile(r"\b(?P<word>today|tonight|tomorrow|day after tomorrow)\b", re.IGNORECASE)
+_IN_DURATION = re.compile(rf"\bin\s+(?P<count>{_NUMBER})\s+{_UNIT}\b", re.IGNORECASE)
+_NEXT_WEEK = re.compile(r"\bnext\s+week\b", re.IGNORECASE)
+
+# Stay lengths, applied to the departure date when no return date is given.
+_LATER = re.compile(rf"\b(?P<count>{_NUMBER})\s+{_UNIT}\s+(?:later|after(?:wards)?)\b", re.IGNORECASE)
+_STAY = re.compile(rf"\b(?:for|spend|stay(?:ing)?)\s+(?:a\s+stay\s+of\s+)?(?P<count>{_NUMBER})\s+{_UNIT}\b", re.IGNORECASE)
+_AFTER = re.compile(rf"\bafter\s+(?P<count>{_NUMBER})\s+{_UNIT}\b", re.IGNORECASE)
+
+# Words before a city that tell which end of the trip it is.
+ORIGIN_CUES = {"from", "between", "leaving", "departing", "out of"}
+DESTINATION_CUES = {"to", "and", "into", "visit", "visiting", "in", "towards", "for"}
+
+_WORD = re.compile(r"[^\W\d_][\w'.-]*")
+
+
+class FlightDetails(BaseModel):
+    """Flight search details mentioned in a user message. Use null for anything not mentioned."""
+
+    origin: Optional[str] = Field(default=None, description="Departure city name, optionally followed by province or country.")
+    destination: Optional[str] = Field(default=None, description="Arrival city name, optionally followed by province or country.")
+    departure_date: Optional[str] = Field(default=None, description="Outbound date as YYYY-MM-DD.")
+    return_date: Optional[str] = Field(default=None, description="Return date as YYYY-MM-DD.")
+
+    @field_validator("departure_date", "return_date")
+    @classmethod
+    def _iso_date(cls, value):
+        if value in (None, ""):
+            return None
+        date.fromisoformat(value)
+        return value
+
+    @field_validator("origin", "destination")
+    @classmethod
+    def _city(cls, value):
+        if value is not None and not value.strip():
+            return None
+        return value.strip() if value else value
+
+    @model_validator(mode="after")
+    def _return_after_departure(self):
+        if self.departure_date and self.return_date and self.return_date < self.departure_date:
+            raise ValueError("return_date must not be before departure_date")
+        return self
+
+
+def _count(text: str) -> int:
+    text = re.sub(r"\s+", " ", text.lower())
+    return int(text) if text.isdigit() else NUMBER_WORDS[text]
+
+def _duration_days(match) -> int:
+    return _count(match.group("count")) * UNIT_DAYS[match.group("unit").lower()]
+
+def _make_date(year, month, day, today: date):
+    """Builds a date, rolling a year-less date forward to its next occurrence."""
+    month = MONTHS[month.lower().rstrip(".")] if not str(month).isdigit() else int(month)
+    try:
+        if year:
+            return date(int(year), month, int(day))
+        candidate = date(today.year, month, int(day))
+        return candidate if candidate >= today else date(today.year + 1, month, int(day))
+    except ValueError:
+        return None
+
+def parse_dates(query: str, today: date = None) -> tuple:
+    """
+    Returns (departure_date, return_date) as ISO strings or None. The first two dates found
+    are departure and return; a stay length ("two weeks later", "for 10 days") fills a
+    missing return date from the departure date.
+    """
+    today = today or date.today()
+    found = []
+    taken = []
+    for pattern in (_ISO_DATE, _MONTH_DAY, _DAY_MONTH, _NUMERIC_DATE):
+        for match in pattern.finditer(query):
+            if any(start < match.end() and match.start() < end for start, end in taken):
+                continue
+            value = _make_date(match.group("year"), match.group("month"), match.group("day"), today)
+            if value:
+                found.append((match.start(), value))
+                taken.append(match.span())
+    for match in _TODAY.finditer(query):
+        offset = {"today": 0, "tonight": 0, "tomorrow": 1, "day after tomorrow": 2}[match.group("word").lower()]
+        found.append((match.start(), today + timedelta(days=offset)))
+    for match in _IN_DURATION.finditer(query):
+        found.append((match.start(), today + timedelta(days=_duration_days(match))))
+    for match in _NEXT_WEEK.finditer(query):
+        found.append((match.start(), today + timedelta(days=7 - today.weekday())))
+    found.sort(key=lambda item: item[0])
+
+    departure = found[0][1] if found else None
+    return_date = found[1][1] if len(found) > 1 else None
+    if departure and not return_date:
+        stay = _LATER.search(query) or _STAY.search(query) or _AFTER.search(query)
+        if stay:
+            return_date = departure + timedelta(days=_duration_days(stay))
+    if return_date and departure and return_date < departure:
+        return_date = None
+    return (departure.isoformat() if departure else None, return_date.isoformat() if return_date else None)
+
+def find_cities(query: str) -> list:
+    """
+    Returns [(position, city name, cue word)] for capitalized word spans of the query that
+    are city names in the airport index. The cue is the word right before the span.
+    """
+    index = get_airport_index()
+    words = [(m.start(), m.end(), m.group()) for m in _WORD.finditer(query)]
+    longest = max((len(key.split()) for key in index.by_city), default=1)
+    cities = []
+    i = 0
+    while i < len(words):
+        matched = None
+        for n in range(min(longest, len(words) - i), 0, -1):
+            span = words[i:i + n]
+            if not all(word[0].isupper() for _, _, word in span):
+                continue
+            key = normalize(" ".join(word for _, _, word in span))
+            if key in index.by_city:
+                matched = (n, index.city_names[key])
+                break
+        if matched is None:
+            i += 1
+            continue
+        n, city = matched
+        before = query[:words[i][0]].lower().split()
+        cue = " ".join(before[-2:]) if before[-2:] == ["out", "of"] else (before[-1] if before else "")
+        cities.append((words[i][0], city, cue))
+        i += n
+    return cities
+
+def parse_cities(query: str) -> tuple:
+    """Returns (origin, destination) from the city names in the query, using the word before each as a cue."""
+    cities = find_cities(query)
+    origin = next((city for _, city, cue in cities if cue in ORIGIN_CUES), None)
+    destination = next((city for _, city, cue in cities if cue in DESTINATION_CUES and city != origin), None)
+    rest = [city for _, city, _ in cities if city not in (origin, destination)]
+    if destination is None and rest:
+        destination = rest.pop(-1 if origin is None and len(rest) > 1 else 0)
+    if origin is None and rest:
+        origin = rest[0]
+    return origin, destination
+
+def parse_flight_details(query: str, today: date = None) -> dict:
+    """Deterministic extraction; every key of FIELDS is present, None when not found."""
+    origin, destination = parse_cities(query)
+    departure_date, return_date = parse_dates(query, today)
+    return {"origin": origin, "destination": destination, "departure_date": departure_date, "return_date": return_date}
+
+
+class FlightDetailExtractor:
+    """
+    Parser first, structured-output LLM call for the missing fields only, one retry when the
+    LLM answer does not validate. Parsed fields always win over LLM values.
+    """
+
+    def __init__(self, llm, system_prompt: str, max_retries: int = 1):
+        self.llm = llm
+        self.system_prompt = system_prompt
+        self.max_retries = max_retries
+        self._structured = llm.with_structured_output(FlightDetails)
+        self._lock = threading.Lock()
+        self._counters = {"total": 0, "parser_only": 0, "llm": 0, "llm_retries": 0, "llm_errors": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _messages(self, query: str, details: dict, missing: list, error: Exception = None) -> list:
+        known = ", ".join(f"{name}={details[name]}" for name in FIELDS if details[name]) or "none"
+        messages = [
+            SystemMessage(content=self.system_prompt),
+            HumanMessage(content=f"{query}\n\nAlready known: {known}. Fill in: {', '.join(missing)}. Today is {date.today().isoformat()}."),
+        ]
+        if error is not None:
+            messages.append(HumanMessage(content=f"Your previous answer was invalid ({error}). Answer again following the schema exactly."))
+        return messages
+
+    def _merge(self, details: dict, missing: list, result: FlightDetails) -> dict:
+        merged = dict(details)
+        for name in missing:
+            merged[name] = getattr(result, name)
+        # Re-check ordering against the parsed fields the LLM did not see as its own output
+        if merged["departure_date"] and merged["return_date"] and merged["return_date"] < merged["departure_date"]:
+            merged["return_date"] = None
+        return merged
+
+    def _prepare(self, query: str, parsed: dict = None):
+        self._count("total")
+        details = dict(parsed) if parsed is not None else parse_flight_details(query)
+        missing = [name for name in FIELDS if not details[name]]
+        if not missing:
+            self._count("parser_only")
+        return details, missing
+
+    def extract(self, query: str, parsed: dict = None) -> dict:
+        """parsed: parse_flight_details(query) when already computed (e.g. speculatively)."""
+        details, missing = self._prepare(query, parsed)
+        if not missing:
+            return details
+        self._count("llm")
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._count("llm_retries")
+            try:
+                result = self._structured.invoke(self._messages(query, details, missing, error))
+                return self._merge(details, missing, result)
+            except (ValidationError, ValueError) as e:
+                error = e
+            except Exception:
+                break
+        self._count("llm_errors")
+        return details
+
+    async def aextract(self, query: str, parsed: dict = None) -> dict:
+        """Async variant of extract, using ainvoke for the LLM call."""
+        details, missing = self._prepare(query, parsed)
+        if not missing:
+            return details
+        self._count("llm")
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._count("llm_retries")
+            try:
+                result = await self._structured.ainvoke(self._messages(query, details, missing, error))
+                return self._merge(details, missing, result)
+            except (ValidationError, ValueError) as e:
+                error = e
+            except Exception:
+                break
+        self._count("llm_errors")
+        return details
+
+    def stats(self) -> dict:
+        """Returns extraction counters plus the share of queries that needed no LLM call."""
+        with self._lock:
+            counters = dict(self._counters)
+        counters["parser_only_ratio"] = round(counters["parser_only"] / counters["total"], 3) if counters["total"] else 0.0
+        return counters
+
+
+if __name__ == "__main__":
+    import timeit
+
+    queries = [
+        "What are the best flights from Toronto, Ontario to Mumbai, India?",
+        "I'd like to spend a couple of weeks visiting India, this coming November, 2025",
+        "Which are the best flights between Toronto, Ontario and Mumbai, departing on November 11, 2025 and coming back two weeks later?",
+        "I need booking details about British Airways flight from Toronto, Ontario and Mumbai, departing on November 11, 2025 and coming back on November 25, 2025",
+        "Flights to Paris tomorrow, back after 10 days",
+        "Fly London to Tokyo on 3 March 2026 for a fortnight",
+    ]
+    for query in queries:
+        print(f"{query}\n    -> {parse_flight_details(query, today=date(2025, 10, 1))}")
+    runs = 2000
+    cost = timeit.timeit(lambda: parse_flight_details(queries[2]), number=runs) / runs
+    print(f"\nparser cost: {cost * 1e6:.1f}us per query")
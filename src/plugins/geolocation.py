@@ -0,0 +1,402 @@
+import asyncio
+import bisect
+import csv
+import ipaddress
+import json
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+import aiohttp
+import requests
+
+from plugins.airport_index import PLUGINS_DIR, get_airport_index, normalize
+
+"""
+IP geolocation for origin inference in get_flight_info.
+
+Geolocator maps a client IP (or, without one, this machine) to its country and that
+country's airports. Resolvers are tried in order:
+
+  - OfflineResolver: a local CIDR -> ISO-2 table (GEOIP_CIDR_FILE, CSV rows "network,country";
+    by default plugins/geoip_cidr.csv when that file exists) held as sorted integer ranges and
+    searched with bisect, one table per IP version. It only knows client addresses: locating
+    this machine, as the CLI does, always falls through to ipinfo.io;
+  - IpinfoResolver: https://ipinfo.io with a strict timeout (GEOIP_TIMEOUT_S, default 1s),
+    disabled with GEOIP_ONLINE=0.
+
+Results are cached per IP for GEOIP_TTL_S seconds, so repeated lookups of the same client
+never leave the process; misses, which include timed-out lookups, only for
+GEOIP_NEGATIVE_TTL_S seconds (default 60). Concurrent misses for the same IP share one
+resolution. ISO-2 codes are turned into the country names of
+airports_by_country.json and their airports through CountryAirports, built once with
+pycountry (falling back to gl_country_codes.json when pycountry is not installed).
+
+The HTTP server sets current_client_ip for each request, so tools that call locate()
+without an IP geolocate the caller rather than the server.
+"""
+
+# Not shipped (see README); plugins/geoip_cidr_sample.csv shows the format. GEOIP_CIDR_FILE=""
+# turns the offline resolver off
+DEFAULT_CIDR_PATH = os.path.join(PLUGINS_DIR, "geoip_cidr.csv")
+DEFAULT_CIDR_FILE = os.getenv("GEOIP_CIDR_FILE", DEFAULT_CIDR_PATH)
+DEFAULT_TTL_S = float(os.getenv("GEOIP_TTL_S", 3600))
+# Misses include timeouts of the online lookup, so they are retried much sooner
+DEFAULT_NEGATIVE_TTL_S = float(os.getenv("GEOIP_NEGATIVE_TTL_S", 60))
+DEFAULT_TIMEOUT_S = float(os.getenv("GEOIP_TIMEOUT_S", 1.0))
+DEFAULT_MAX_ENTRIES = int(os.getenv("GEOIP_CACHE_SIZE", 10000))
+ONLINE_LOOKUPS = os.getenv("GEOIP_ONLINE", "1") != "0"
+IPINFO_URL = "https://ipinfo.io/{ip}json"
+GL_COUNTRY_CODES_PATH = os.path.join(PLUGINS_DIR, "gl_country_codes.json")
+
+# Client IP of the request being served; None means "this machine"
+current_client_ip = ContextVar("current_client_ip", default=None)
+
+
+@dataclass
+class Location:
+    country_code: str
+    country: str = None
+    airports: list = field(default_factory=list)
+    source: str = ""
+
+
+class CountryAirports:
+    """ISO-2 code -> (country name as spelled in the airport index, airport codes)."""
+
+    def __init__(self, index=None, gl_codes_path: str = GL_COUNTRY_CODES_PATH):
+        index = index or get_airport_index()
+        names = {}
+        for airport in index.airports.values():
+            names.setdefault(normalize(airport["country"]), airport["country"])
+
+        self.by_code = {}
+        for code, name in self._codes_for(names.values(), gl_codes_path):
+            self.by_code[code] = (name, index.codes_by_country(name))
+
+    @staticmethod
+    def _codes_for(country_names, gl_codes_path: str):
+        try:
+            import pycountry
+        except ImportError:
+            pycountry = None
+        with open(gl_codes_path, "r", encoding="utf-8") as f:
+            gl_codes = {normalize(entry["country"]): entry["code"].upper() for entry in json.load(f)}
+
+        for name in country_names:
+            code = None
+            if pycountry is not None:
+                try:
+                    code = pycountry.countries.lookup(name).alpha_2
+                except LookupError:
+                    pass
+            code = code or gl_codes.get(normalize(name))
+            if code:
+                yield code, name
+
+    def get(self, country_code: str):
+        """Returns (country name, airports), or None for a country without known airports."""
+        return self.by_code.get((country_code or "").upper())
+
+
+def _address(ip: str):
+    """(IP version, integer value) of an address, or None; inet_pton is several times faster than ipaddress."""
+    for family, version in ((socket.AF_INET, 4), (socket.AF_INET6, 6)):
+        try:
+            return version, int.from_bytes(socket.inet_pton(family, ip), "big")
+        except (OSError, TypeError):
+            continue
+    return None
+
+def _network_range(network: str) -> tuple:
+    """(IP version, first address, last address) of a CIDR block such as "1.0.0.0/24"."""
+    address, _, prefix = network.strip().partition("/")
+    parsed = _address(address)
+    if parsed is None:
+        raise ValueError(f"Invalid network '{network}'")
+    version, value = parsed
+    bits = 32 if version == 4 else 128
+    host_bits = bits - int(prefix or bits)
+    start = value >> host_bits << host_bits
+    return version, start, start | ((1 << host_bits) - 1)
+
+
+class CidrTable:
+    """
+    Non-overlapping IP ranges with their country, one sorted list per IP version.
+    lookup() is a bisect over the range starts.
+    """
+
+    def __init__(self, rows: list):
+        ranges = {4: [], 6: []}
+        for network, country in rows:
+            version, start, end = _network_range(network)
+            ranges[version].append((start, end, country.strip().upper()))
+        self.starts, self.ends, self.countries = {}, {}, {}
+        for version, entries in ranges.items():
+            entries.sort()
+            self.starts[version] = [start for start, _, _ in entries]
+            self.ends[version] = [end for _, end, _ in entries]
+            self.countries[version] = [country for _, _, country in entries]
+
+    @classmethod
+    def from_csv(cls, path: str):
+        """Reads "network,country" rows (e.g. "1.0.0.0/24,AU"); a header row and blank lines are skipped."""
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            rows = [row[:2] for row in csv.reader(f) if len(row) >= 2 and not row[0].startswith("#")]
+        if rows and not rows[0][0][:1].isdigit() and ":" not in rows[0][0]:
+            rows = rows[1:]
+        return cls(rows)
+
+    def lookup(self, ip: str):
+        parsed = _address(ip)
+        if parsed is None:
+            return None
+        version, value = parsed
+        i = bisect.bisect_right(self.starts[version], value) - 1
+        if i >= 0 and value <= self.ends[version][i]:
+            return self.countries[version][i]
+        return None
+
+    def __len__(self):
+        return sum(len(starts) for starts in self.starts.values())
+
+
+class Resolver:
+    """Maps an IP address (None for this machine) to an ISO-2 country code, or None."""
+
+    name = "resolver"
+
+    def resolve(self, ip: str = None):
+        raise NotImplementedError
+
+    async def aresolve(self, ip: str = None, session: aiohttp.ClientSession = None):
+        return self.resolve(ip)
+
+
+class OfflineResolver(Resolver):
+    name = "offline"
+
+    def __init__(self, table: CidrTable):
+        self.table = table
+
+    def resolve(self, ip: str = None):
+        # The table knows nothing about this machine's public address
+        return self.table.lookup(ip) if ip else None
+
+
+class IpinfoResolver(Resolver):
+    name = "ipinfo"
+
+    def __init__(self, timeout_s: float = DEFAULT_TIMEOUT_S):
+        self.timeout_s = timeout_s
+
+    @staticmethod
+    def _url(ip: str) -> str:
+        return IPINFO_URL.format(ip=f"{ip}/" if ip else "")
+
+    @staticmethod
+    def _is_public(ip: str) -> bool:
+        try:
+            return ipaddress.ip_address(ip).is_global
+        except ValueError:
+            return False
+
+    def resolve(self, ip: str = None):
+        if ip and not self._is_public(ip):
+            return None
+        try:
+            response = requests.get(self._url(ip), timeout=self.timeout_s)
+            response.raise_for_status()
+            return response.json().get("country")
+        except (requests.exceptions.RequestException, ValueError):
+            return None
+
+    async def aresolve(self, ip: str = None, session: aiohttp.ClientSession = None):
+        if ip and not self._is_public(ip):
+            return None
+        owns_session = session is None
+        session = session or aiohttp.ClientSession()
+        try:
+            async with session.get(self._url(ip), timeout=aiohttp.ClientTimeout(total=self.timeout_s)) as response:
+                response.raise_for_status()
+                return (await response.json(content_type=None)).get("country")
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            return None
+        finally:
+            if owns_session:
+                await session.close()
+
+
+class Geolocator:
+    """
+    Per-IP TTL cache in front of a chain of resolvers. locate() returns a Location, cached
+    for ttl_s seconds, or None when no resolver knows the address, cached for negative_ttl_s.
+    Concurrent misses for the same IP wait for the first one's resolution.
+    """
+
+    def __init__(self, resolvers: list, ttl_s: float = DEFAULT_TTL_S, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 countries: CountryAirports = None, negative_ttl_s: float = DEFAULT_NEGATIVE_TTL_S):
+        self.resolvers = resolvers
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+        self.max_entries = max_entries
+        self.countries = countries or CountryAirports()
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._ainflight = {}
+        self._lock = threading.Lock()
+        self.metrics = {"hits": 0, "misses": 0, "coalesced": 0, "unresolved": 0}
+
+    def _cached(self, key: str):
+        """(found, location) for key; the caller holds the lock."""
+        entry = self._cache.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return False, None
+        self._cache.move_to_end(key)
+        self.metrics["hits"] += 1
+        return True, entry[1]
+
+    def _store(self, key: str, location):
+        with self._lock:
+            ttl_s = self.ttl_s if location is not None else self.negative_ttl_s
+            self._cache[key] = (time.monotonic() + ttl_s, location)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+            if location is None:
+                self.metrics["unresolved"] += 1
+        return location
+
+    def _location(self, country_code: str, source: str):
+        country = self.countries.get(country_code)
+        if country is None:
+            return Location(country_code=country_code.upper(), source=source)
+        return Location(country_code=country_code.upper(), country=country[0], airports=list(country[1]), source=source)
+
+    def _resolve(self, key: str, ip: str):
+        for resolver in self.resolvers:
+            code = resolver.resolve(ip)
+            if code:
+                return self._store(key, self._location(code, resolver.name))
+        return self._store(key, None)
+
+    def locate(self, ip: str = None):
+        ip = ip or current_client_ip.get()
+        key = ip or "self"
+        with self._lock:
+            found, location = self._cached(key)
+            if found:
+                return location
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+                self.metrics["misses"] += 1
+            else:
+                self.metrics["coalesced"] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            location = self._resolve(key, ip)
+            future.set_result(location)
+            return location
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def alocate(self, ip: str = None, session: aiohttp.ClientSession = None):
+        """Async counterpart of locate: concurrent misses on the same event loop await one resolution."""
+        ip = ip or current_client_ip.get()
+        key = ip or "self"
+        inflight_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            found, location = self._cached(key)
+            if found:
+                return location
+            task = self._ainflight.get(inflight_key)
+            if task is None:
+                task = asyncio.ensure_future(self._aresolve(inflight_key, ip, session))
+                self._ainflight[inflight_key] = task
+                self.metrics["misses"] += 1
+            else:
+                self.metrics["coalesced"] += 1
+        # Shielded so one cancelled caller does not cancel the lookup for everyone else.
+        return await asyncio.shield(task)
+
+    async def _aresolve(self, inflight_key, ip: str, session: aiohttp.ClientSession):
+        try:
+            for resolver in self.resolvers:
+                code = await resolver.aresolve(ip, session=session)
+                if code:
+                    return self._store(inflight_key[1], self._location(code, resolver.name))
+            return self._store(inflight_key[1], None)
+        finally:
+            with self._lock:
+                self._ainflight.pop(inflight_key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.metrics, "entries": len(self._cache)}
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+def default_resolvers(cidr_file: str = DEFAULT_CIDR_FILE, online: bool = ONLINE_LOOKUPS) -> list:
+    resolvers = []
+    # An explicitly configured table must exist; the default one is optional
+    if cidr_file and (cidr_file != DEFAULT_CIDR_PATH or os.path.exists(cidr_file)):
+        resolvers.append(OfflineResolver(CidrTable.from_csv(cidr_file)))
+    if online:
+        resolvers.append(IpinfoResolver())
+    return resolvers
+
+
+_geolocator = None
+_geolocator_lock = threading.Lock()
+
+def get_geolocator() -> Geolocator:
+    """Returns the process-wide geolocator, loading the CIDR table and country map on first use."""
+    global _geolocator
+    if _geolocator is None:
+        with _geolocator_lock:
+            if _geolocator is None:
+                _geolocator = Geolocator(default_resolvers())
+    return _geolocator
+
+
+if __name__ == "__main__":
+    # Offline lookups against a synthetic table of 200,000 ranges, versus the uncached ipinfo.io call.
+    import random
+    import timeit
+
+    rng = random.Random(7)
+    codes = sorted(CountryAirports().by_code)
+    rows = [(f"{ipaddress.IPv4Address(block << 8)}/24", rng.choice(codes)) for block in sorted(rng.sample(range(1 << 24), 200_000))]
+    started = time.perf_counter()
+    table = CidrTable(rows)
+    print(f"table build:            {(time.perf_counter() - started) * 1000:8.1f} ms ({len(table)} ranges)")
+
+    geolocator = Geolocator([OfflineResolver(table)], countries=CountryAirports())
+    ips = [str(ipaddress.IPv4Address((int(ipaddress.ip_network(network).network_address)) + 7)) for network, _ in rows[:1000]]
+    runs = 20000
+    lookup = timeit.timeit(lambda: table.lookup(rng.choice(ips)), number=runs) / runs
+    cold = timeit.timeit(lambda: (geolocator.clear(), geolocator.locate(rng.choice(ips))), number=runs) / runs
+    warm = timeit.timeit(lambda: geolocator.locate(ips[0]), number=runs) / runs
+    print(f"CIDR bisect lookup:     {lookup * 1e6:8.1f} us")
+    print(f"locate (cache miss):    {cold * 1e6:8.1f} us")
+    print(f"locate (cache hit):     {warm * 1e6:8.1f} us -> {geolocator.locate(ips[0])}")
+
+    started = time.perf_counter()
+    print(f"ipinfo.io (this host):  {IpinfoResolver().resolve()} in {(time.perf_counter() - started) * 1000:.0f} ms")
@@ -0,0 +1,210 @@
+import functools
+import hashlib
+import inspect
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+
+"""
+Result shaping for tool outputs that end up in ToolMessage content.
+
+Whatever a tool returns is serialized into its ToolMessage, re-sent to the model on every
+later turn of the thread and stored in every checkpoint. shape_result(budget_tokens, render)
+wraps a tool so that it returns a compact rendering of its payload within a token budget:
+
+  - render_forecast: the 7-day forecast as CSV rows under a one-line summary;
+  - render_events / top_k_rows: the first K records as CSV rows;
+  - render_compact_json: JSON without whitespace, for anything else.
+
+The full payload is kept out of band in a ResultStore under a reference id ("ref=r-..."),
+which heads the rendering together with the number of rows that were left out. The
+fetch_tool_result tool returns the full payload for a reference when the model needs it.
+
+Set TOOL_RESULT_SHAPING=0 to return the raw payloads again.
+"""
+
+SHAPING_ENABLED = os.getenv("TOOL_RESULT_SHAPING", "1") != "0"
+DEFAULT_STORE_SIZE = int(os.getenv("TOOL_RESULT_STORE_SIZE", 1024))
+# Same estimate as langchain_core's count_tokens_approximately
+CHARS_PER_TOKEN = 4.0
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class ResultStore:
+    """Bounded in-memory LRU of full tool payloads, keyed by a content-derived reference id."""
+
+    def __init__(self, max_entries: int = DEFAULT_STORE_SIZE):
+        self.max_entries = max_entries
+        self._payloads = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, tool_name: str, payload) -> str:
+        serialized = json.dumps(payload, sort_keys=True, default=str)
+        ref = "r-" + hashlib.sha1(f"{tool_name}:{serialized}".encode()).hexdigest()[:12]
+        with self._lock:
+            self._payloads[ref] = payload
+            self._payloads.move_to_end(ref)
+            while len(self._payloads) > self.max_entries:
+                self._payloads.popitem(last=False)
+        return ref
+
+    def get(self, ref: str):
+        with self._lock:
+            payload = self._payloads.get(ref)
+            if payload is not None:
+                self._payloads.move_to_end(ref)
+            return payload
+
+    def __len__(self):
+        return len(self._payloads)
+
+# Shared by every shaped tool of the process and by fetch_tool_result
+result_store = ResultStore()
+
+
+def _csv_value(value) -> str:
+    if isinstance(value, float):
+        value = round(value, 1)
+    text = str(value)
+    return f'"{text}"' if "," in text else text
+
+def top_k_rows(records: list, columns: list, k: int = None) -> list:
+    """CSV lines (header first) for the first k records, restricted to columns."""
+    lines = [",".join(columns)]
+    for record in records[:k]:
+        lines.append(",".join(_csv_value(record.get(column, "")) for column in columns))
+    return lines
+
+def render_compact_json(payload) -> list:
+    return [json.dumps(payload, separators=(",", ":"), default=str)]
+
+def render_forecast(payload: dict) -> list:
+    summary = payload.get("weekly_summary", {})
+    head = (
+        f"{payload['city']} ({payload.get('continent')}): now {payload.get('current_temperature_c')}C, "
+        f"{payload.get('current_humidity_percent')}% humidity, {payload.get('current_condition')}. "
+        f"Week avg {summary.get('average_temperature_c', 0):.1f}C, {summary.get('average_humidity_percent', 0):.0f}% humidity, "
+        f"wind mostly {summary.get('dominant_wind_direction')}."
+    )
+    rows = top_k_rows(payload.get("weekly_forecast", []),
+                      ["date", "temperature_c", "humidity_percent", "condition", "wind_speed_kph", "wind_direction"])
+    return [head] + rows
+
+def render_events(payload: dict, k: int = 3) -> list:
+    # The description only restates name, type and venue, so it is left to the stored payload
+    events = payload.get("events", [])
+    rows = top_k_rows(events, ["date", "name", "type", "location"], k)
+    return [f"{payload['city']} ({payload.get('continent')}) events, {len(rows) - 1} of {len(events)}:"] + rows
+
+
+def fit_to_budget(lines: list, budget_tokens: int, ref: str) -> str:
+    """
+    Joins lines under a "[ref=...]" header, dropping trailing lines until the text fits in
+    budget_tokens; the header also counts the dropped rows. history_compaction keeps the first
+    two lines (the reference and the summary) of the tool results of earlier turns.
+    """
+    kept = list(lines)
+    while True:
+        omitted = len(lines) - len(kept)
+        header = f"[ref={ref}; {omitted} more rows]" if omitted > 0 else f"[ref={ref}]"
+        text = "\n".join([header] + kept)
+        if estimate_tokens(text) <= budget_tokens or len(kept) <= 1:
+            return text
+        kept.pop()
+
+def shape_result(budget_tokens: int, render=render_compact_json, store: ResultStore = None, enabled: bool = None):
+    """
+    Decorator for a tool returning a JSON-like payload: the tool returns render(payload) cut to
+    budget_tokens instead, with the full payload in store under the reference id it names.
+    Name, signature and docstring are kept, so the tool schema the model sees is unchanged.
+    Error payloads ({"error": ...}) are returned whole and not stored.
+    """
+    def decorator(tool):
+        if not (SHAPING_ENABLED if enabled is None else enabled):
+            return tool
+
+        @functools.wraps(tool)
+        def shaped(*args, **kwargs) -> str:
+            payload = tool(*args, **kwargs)
+            if isinstance(payload, dict) and "error" in payload:
+                return render_compact_json(payload)[0]
+            ref = (store or result_store).put(tool.__name__, payload)
+            lines = render(payload)
+            return fit_to_budget(lines, budget_tokens, ref)
+
+        shaped.__annotations__ = dict(tool.__annotations__, **{"return": str})
+        shaped.__signature__ = inspect.signature(tool).replace(return_annotation=str)
+        shaped.budget_tokens = budget_tokens
+        return shaped
+    return decorator
+
+def fetch_tool_result(ref: str) -> str:
+    """
+    Returns the full result of an earlier tool call, by the reference id ("ref=r-...") shown
+    at the top of its compact output. Use it only when the compact output lacks a needed detail.
+
+    Args:
+        ref (str): The reference id, e.g. "r-0123456789ab".
+    """
+    payload = result_store.get(ref.strip().removeprefix("ref="))
+    if payload is None:
+        return json.dumps({"error": f"No stored result for reference '{ref}'; call the original tool again."})
+    return json.dumps(payload, separators=(",", ":"), default=str)
+
+
+if __name__ == "__main__":
+    # Prompt tokens and checkpoint size of a multi-turn memory-agent thread, raw versus shaped tool results
+    import asyncio
+    import sys
+    import tempfile
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from langchain_core.messages import HumanMessage
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    from plugins.synth_data_gen import event_by_city_search, weather_by_city_search
+    from stub_llm import StubChatModel
+
+    def measure(shaped: bool, turns: int = 12) -> dict:
+        import agent_memory_langgraph
+
+        weather = shape_result(agent_memory_langgraph.WEATHER_RESULT_BUDGET, render_forecast, enabled=shaped)(weather_by_city_search)
+        events = shape_result(agent_memory_langgraph.EVENTS_RESULT_BUDGET, render_events, enabled=shaped)(event_by_city_search)
+        agent_memory_langgraph.tools[:2] = [weather, events]
+        model = StubChatModel()
+        prompt_tokens = []
+
+        async def run():
+            with tempfile.TemporaryDirectory() as tmp:
+                async with AsyncSqliteSaver.from_conn_string(os.path.join(tmp, "memory.db")) as saver:
+                    graph = agent_memory_langgraph.build_graph(model).compile(checkpointer=saver)
+                    config = {"configurable": {"thread_id": "shaping"}}
+                    for turn in range(turns):
+                        city = ["Paris", "Tokyo", "Mumbai", "Lima"][turn % 4]
+                        state = await graph.ainvoke({"messages": [HumanMessage(city)]}, config)
+                        # The last model call of the turn is the one reading the fresh tool result
+                        prompt_tokens.append(state["messages"][-1].usage_metadata["input_tokens"])
+                    # Every checkpoint stores the whole messages channel again, so the total is
+                    # roughly the number of steps times the size of the compacted history
+                    async with saver.conn.execute(
+                        "SELECT COUNT(*), (SELECT SUM(LENGTH(checkpoint)) FROM checkpoints) + (SELECT SUM(LENGTH(value)) FROM writes),"
+                        " (SELECT LENGTH(checkpoint) FROM checkpoints ORDER BY rowid DESC LIMIT 1) FROM checkpoints"
+                    ) as cursor:
+                        return await cursor.fetchone()
+
+        checkpoints, checkpoint_bytes, last_checkpoint_bytes = asyncio.run(run())
+        return {"mean_prompt_tokens": round(sum(prompt_tokens) / len(prompt_tokens)), "max_prompt_tokens": max(prompt_tokens),
+                "checkpoints": checkpoints, "checkpoint_bytes": checkpoint_bytes, "last_checkpoint_bytes": last_checkpoint_bytes}
+
+    raw = weather_by_city_search("Paris")
+    print("weather tool output, raw:    ", estimate_tokens(json.dumps(raw)), "tokens")
+    print("weather tool output, shaped: ", estimate_tokens(shape_result(200, render_forecast)(weather_by_city_search)("Paris")), "tokens")
+    print("events tool output, raw:     ", estimate_tokens(json.dumps(event_by_city_search("Paris"))), "tokens")
+    print("events tool output, shaped:  ", estimate_tokens(shape_result(120, render_events)(event_by_city_search)("Paris")), "tokens")
+    print("thread, raw:   ", measure(False))
+    print("thread, shaped:", measure(True))
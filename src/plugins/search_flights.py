@@ -1,21 +1,44 @@
 import os
+import asyncio
+import aiohttp
 import certifi
 import requests
-import pycountry
 import json
-import pycountry
 
-from serpapi import GoogleSearch
+from plugins.airport_index import get_airport_index
+from plugins.fare_search import FareSearch, SerpApiBackend, format_itineraries, route_params, DEFAULT_FLEX_DAYS, DEFAULT_TOP_K
+from plugins.flight_cache import FlightSearchCache, SqliteTier, DEFAULT_DB_PATH
+from plugins.geolocation import get_geolocator
 
 os.environ['REQUESTS_CA_BUNDLE'] = certifi.where()
 google_search_api_key = os.getenv("GOOGLE_API_KEY")
+SERPAPI_SEARCH_URL = "https://serpapi.com/search.json"
 
-def get_my_country():
+def google_search(params: dict):
+    """GoogleSearch client for params; serpapi is imported on the first upstream search, not at import."""
+    from serpapi import GoogleSearch
+
+    return GoogleSearch(params)
+
+# Repeated route/date searches are served from memory or from the SQLite tier until their TTL expires.
+# Set FLIGHT_CACHE_DB to an empty string to keep the cache in memory only.
+flight_search_cache = FlightSearchCache(
+    search_factory=google_search,
+    disk_tier=SqliteTier(DEFAULT_DB_PATH) if DEFAULT_DB_PATH else None,
+    async_search=lambda params, **kwargs: aserpapi_search(params, **kwargs)
+)
+
+# One search per departure/arrival airport pair and date shift, run concurrently through the cache above.
+# Only the top-K ranked itineraries are returned to the agent, as a few lines of text.
+fare_search = FareSearch(SerpApiBackend(flight_search_cache, api_key=google_search_api_key))
+
+def get_my_country(timeout: float = 5.0):
   """
   Fetches the user's country based on their IP address using ipinfo.io.
+  Uncached; the flight tools go through get_geolocator() instead.
   """
   try:
-      response = requests.get('https://ipinfo.io/json')
+      response = requests.get('https://ipinfo.io/json', timeout=timeout)
       response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
       data = response.json()
       country = data.get('country')
@@ -35,91 +58,153 @@ def get_root_directory():
   return os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 
 def get_iata_codes_by_country(country_name: str):
-    json_path=f"{get_root_directory()}/src/plugins/airports_by_country.json"
-    with open(json_path, "r", encoding="utf-8") as f:
-        airports = json.load(f)
-    return [airport["iata_code"] for airport in airports if airport["country"].lower() == country_name.lower()]
+    return get_airport_index().codes_by_country(country_name)
 
 def get_iata_code_by_city(city: str):
-    json_path=f"{get_root_directory()}/src/plugins/airports_by_country.json"
-    with open(json_path, "r", encoding="utf-8") as f:
-        airports = json.load(f)
-    return [airport["iata_code"] for airport in airports if airport["city"].lower() == city.lower()]
+    return get_airport_index().codes_by_city(city)
+
+def _origin_prompt(location):
+    """The reply asking for a departure city, naming the country and airports the client was located in."""
+    if location is None or not location.airports:
+        return None
+    return (f"[Flight Agent] You seem to be located in {location.country} ({', '.join(location.airports)}). "
+            "Please provide your departure city.")
+
+def _missing_flight_fields(to_city: str, outbound_date: str, return_date: str) -> list:
+    missing = []
+    if not to_city:
+        missing.append("destination city")
+    if not outbound_date:
+        missing.append("outbound (departure) date")
+    if not return_date:
+        missing.append("return date")
+    return missing
+
+def resolve_airports(from_city: str, to_city: str, airports: dict = None) -> tuple:
+    """
+    Resolves both cities to their IATA codes; airports maps city names to codes resolved
+    beforehand (e.g. speculatively) and is consulted first.
+    Raises ValueError when a city has no known airport.
+    """
+    airports = airports or {}
+    departure_airports = airports.get(from_city) or get_iata_code_by_city(from_city)
+    if not departure_airports:
+        raise ValueError(f"No IATA codes found for country: {from_city}")
+
+    arrival_airports = airports.get(to_city) or get_iata_code_by_city(to_city)
+    if not arrival_airports:
+        raise ValueError(f"No IATA codes found for country: {to_city}")
+    return departure_airports, arrival_airports
 
-def get_flight_info(from_city: str = None, to_city: str = None, outbound_date: str = None, return_date: str = None) -> dict:
+def build_flight_search_params(from_city: str, to_city: str, outbound_date: str, return_date: str) -> dict:
+    """
+    Resolves both cities to IATA codes and returns the SerpAPI google_flights parameters
+    for a single search covering all of their airports.
+    Raises ValueError when a city has no known airport.
+    """
+    departure_airports, arrival_airports = resolve_airports(from_city, to_city)
+    return route_params(departure_airports, arrival_airports, outbound_date, return_date, google_search_api_key)
+
+def get_flight_info(from_city: str = None, to_city: str = None, outbound_date: str = None, return_date: str = None,
+                    flex_days: int = DEFAULT_FLEX_DAYS, top_k: int = DEFAULT_TOP_K, airports: dict = None) -> str:
     """
     Fetches flight information using the Google Flights API.
+    Every airport pair of the two cities is searched on the given dates, +/- flex_days,
+    and the top_k cheapest itineraries are returned as a short text summary.
+    airports optionally maps city names to already resolved IATA codes.
     If any required parameter is missing, returns an appropriate message.
     """
     
     try:
         missing = []
         if not from_city:
-            # Get the departure country from the user's IP address
-            from_country = get_my_country()
-            city = get_iata_codes_by_country(from_country)
-            if city is None:
-                missing.append("departure city")
-            else:
-                return f"[Flight Agent] You seem to be located in {city}. Please provide your departure city."
-        if not to_city:
-            missing.append("destination city")
-        if not outbound_date:
-            missing.append("outbound (departure) date")
-        if not return_date:
-            missing.append("return date")
+            # Infer the departure country from the client's IP address (cached, local when a CIDR table is set)
+            origin_prompt = _origin_prompt(get_geolocator().locate())
+            if origin_prompt:
+                return origin_prompt
+            missing.append("departure city")
+        missing += _missing_flight_fields(to_city, outbound_date, return_date)
+        if missing:
+            return f"[Flight Agent] Unable to process your request. Please provide the following information: {', '.join(missing)}."
+
+        departure_airports, arrival_airports = resolve_airports(from_city, to_city, airports)
+        result = fare_search.search(departure_airports, arrival_airports, outbound_date, return_date,
+                                    flex_days=flex_days, top_k=top_k)
+        return format_itineraries(result)
+    except Exception as e:
+        return f"[Flight Agent] An error occurred while fetching flight information: {str(e)}. Please submit your query again."
+
+async def aget_my_country(session: aiohttp.ClientSession = None, timeout: float = 5.0):
+    """
+    Async variant of get_my_country, bounded by timeout seconds.
+    """
+    owns_session = session is None
+    session = session or aiohttp.ClientSession()
+    try:
+        async with session.get('https://ipinfo.io/json', timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            response.raise_for_status()
+            data = await response.json(content_type=None)
+        country = data.get('country')
+        if country:
+            return country
+        else:
+            return "Country information not found in the response."
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        return f"Error connecting to IP geolocation service: {e}"
+    except ValueError:
+        return "Error parsing JSON response."
+    finally:
+        if owns_session:
+            await session.close()
+
+async def aserpapi_search(params: dict, session: aiohttp.ClientSession = None, timeout: float = 30.0) -> dict:
+    """
+    Calls the SerpAPI JSON endpoint over aiohttp; list parameters are sent comma-separated.
+    """
+    query = {key: ",".join(value) if isinstance(value, (list, tuple)) else value
+             for key, value in params.items() if value is not None}
+    owns_session = session is None
+    session = session or aiohttp.ClientSession()
+    try:
+        async with session.get(SERPAPI_SEARCH_URL, params=query, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            return await response.json(content_type=None)
+    finally:
+        if owns_session:
+            await session.close()
+
+async def aget_flight_info(from_city: str = None, to_city: str = None, outbound_date: str = None, return_date: str = None,
+                           session: aiohttp.ClientSession = None, flex_days: int = DEFAULT_FLEX_DAYS,
+                           top_k: int = DEFAULT_TOP_K, airports: dict = None) -> str:
+    """
+    Async variant of get_flight_info; geolocation and SerpAPI calls go through aiohttp
+    and share the flight search cache with the synchronous path.
+    """
+    try:
+        missing = []
+        if not from_city:
+            origin_prompt = _origin_prompt(await get_geolocator().alocate(session=session))
+            if origin_prompt:
+                return origin_prompt
+            missing.append("departure city")
+        missing += _missing_flight_fields(to_city, outbound_date, return_date)
         if missing:
             return f"[Flight Agent] Unable to process your request. Please provide the following information: {', '.join(missing)}."
 
-        departure_airport = get_iata_code_by_city(from_city)
-        if not departure_airport:
-            raise ValueError(f"No IATA codes found for country: {from_city}")
-
-        arrival_airport = get_iata_code_by_city(to_city)
-        if not arrival_airport:
-            raise ValueError(f"No IATA codes found for country: {to_city}")
-
-        params = {
-            "engine": "google_flights",
-            "hl": "en",
-            "departure_id": departure_airport,
-            "arrival_id": arrival_airport,
-            "outbound_date": outbound_date,
-            "return_date": return_date,
-            "currency": "USD",
-            "type": "1",
-            "api_key": google_search_api_key
-        }
-        
-        search = GoogleSearch(params)
-        results = search.get_dict()
-        
-        return results
+        departure_airports, arrival_airports = resolve_airports(from_city, to_city, airports)
+        result = await fare_search.asearch(departure_airports, arrival_airports, outbound_date, return_date,
+                                           flex_days=flex_days, top_k=top_k, session=session)
+        return format_itineraries(result)
     except Exception as e:
         return f"[Flight Agent] An error occurred while fetching flight information: {str(e)}. Please submit your query again."
 
 if __name__ == "__main__":
-  country_code = get_my_country()
-  if country_code:
-      print(f"You appear to be in the country with code: {country_code}")
-
-      # You can use the `pycountry` library to get the full country name
-      # if you have the country code.
-      # pip install pycountry
-      try:
-          
-          departure_country = pycountry.countries.get(alpha_2=country_code)
-          if departure_country:
-              print(f"Full country name: {departure_country.name}")
-      except ImportError:
-          print("Install 'pycountry' (pip install pycountry) for full country names.")
-      except Exception as e:
-          print(f"Error getting full country name: {e}")
-
-  codes = get_iata_codes_by_country(departure_country.name)
-  if not codes:
-      print(f"No IATA codes found for country: {departure_country}")
+  # The geolocator maps the ISO-2 code to the airport index's country name and airports
+  location = get_geolocator().locate()
+  if location is None or not location.airports:
+      print(f"No IATA codes found for this location: {location}")
       exit(1)
+  print(f"You appear to be in {location.country} ({location.country_code}), via {location.source}")
+  codes = location.airports
   departure_airport = codes[0]  # Use the first IATA code for departure
 
   arrival_country = "India"  # Example: hardcoded for testing
@@ -142,7 +227,7 @@ if __name__ == "__main__":
     "api_key": google_search_api_key
   }
 
-  search = GoogleSearch(params)
+  search = google_search(params)
   results = search.get_dict()
 
   print(results)
\ No newline at end of file
@@ -1,27 +1,155 @@
-import random
-from datetime import datetime, timedelta
-from collections import Counter
+import os
+import time
+from datetime import date, datetime
+
+import numpy as np
+
+"""
+Synthetic weather and event data for the travel agents and for load-test fixtures.
+
+All lookup tables are built once at import time. weather_for_cities() and events_for_cities()
+generate data for many cities and days in one batched NumPy call and return columnar arrays;
+the LangChain tools weather_by_city_search/event_by_city_search are thin wrappers that render
+one city as a dict. Every generator takes an explicit seed (or numpy Generator) so fixtures are
+reproducible; the tools draw from a module generator seeded by SYNTH_DATA_SEED (unseeded if unset)
+which can be reset with seed_synthetic_data().
+"""
+
+CITY_CONTINENT_MAP = {
+    "New York": "North America", "Toronto": "North America", "Los Angeles": "North America", "Mexico City": "North America",
+    "São Paulo": "South America", "Buenos Aires": "South America", "Lima": "South America", "Bogotá": "South America",
+    "London": "Europe", "Paris": "Europe", "Berlin": "Europe", "Rome": "Europe",
+    "Tokyo": "Asia", "Beijing": "Asia", "Mumbai": "Asia", "Bangkok": "Asia",
+    "Cairo": "Africa", "Lagos": "Africa", "Nairobi": "Africa", "Cape Town": "Africa"
+}
+
+TEMP_RANGES = {
+    "North America": (10, 25),
+    "Europe": (10, 25),
+    "Asia": (20, 35),
+    "South America": (20, 35),
+    "Africa": (25, 45)
+}
+
+WEATHER_CONDITIONS = np.array(["Sunny", "Cloudy", "Rainy", "Stormy", "Snowy", "Windy", "Foggy"])
+WIND_DIRECTIONS = np.array(["N", "NE", "E", "SE", "S", "SW", "W", "NW"])
+EVENT_TYPES = np.array(["Festival", "Concert", "Exhibition", "Parade", "Theater", "Food Fair", "Cultural Workshop"])
+VENUES = np.array(["City Hall", "Central Park", "Downtown Arena", "Museum of Art", "Opera House", "Riverfront", "Main Square"])
+
+# Per-city tables indexed by city code (position in CITIES)
+CITIES = np.array(list(CITY_CONTINENT_MAP))
+CITY_INDEX = {city: code for code, city in enumerate(CITY_CONTINENT_MAP)}
+CITY_CONTINENTS = np.array([CITY_CONTINENT_MAP[city] for city in CITIES])
+CITY_TEMP_MIN = np.array([TEMP_RANGES[CITY_CONTINENT_MAP[city]][0] for city in CITIES], dtype=np.float64)
+CITY_TEMP_SPAN = np.array([TEMP_RANGES[CITY_CONTINENT_MAP[city]][1] for city in CITIES], dtype=np.float64) - CITY_TEMP_MIN
+
+_rng = np.random.default_rng(int(os.environ["SYNTH_DATA_SEED"]) if os.getenv("SYNTH_DATA_SEED") else None)
+
+def seed_synthetic_data(seed=None):
+    """Reseeds the generator used by the tool functions (None = fresh OS entropy)."""
+    global _rng
+    _rng = np.random.default_rng(seed)
+
+def _generator(seed):
+    if seed is None:
+        return _rng
+    if isinstance(seed, np.random.Generator):
+        return seed
+    return np.random.default_rng(seed)
+
+def city_codes(cities) -> np.ndarray:
+    """Maps city names to codes into CITIES; raises ValueError for unsupported cities."""
+    if isinstance(cities, str):
+        cities = [cities]
+    try:
+        return np.fromiter((CITY_INDEX[city] for city in cities), dtype=np.intp, count=len(cities))
+    except KeyError as e:
+        raise ValueError(f"City '{e.args[0]}' is not in the supported list.") from None
+
+def _as_codes(cities) -> np.ndarray:
+    if isinstance(cities, np.ndarray) and np.issubdtype(cities.dtype, np.integer):
+        return cities
+    return city_codes(cities)
+
+def _start_day(start) -> np.datetime64:
+    return np.datetime64(start or date.today(), "D")
+
+def weather_for_cities(cities, days: int = 7, seed=None, start=None) -> dict:
+    """
+    Generates a daily forecast for every city in one batch.
+
+    Args:
+        cities: sequence of supported city names (repeats allowed) or an array of city codes.
+        days: number of forecast days per city.
+        seed: int seed or numpy Generator for reproducible output (None = module generator).
+        start: first forecast date (date or ISO string); defaults to today.
+
+    Returns:
+        dict of arrays; per-day arrays have shape (len(cities), days):
+            city, continent, date (datetime64[D], shape (days,)), temperature_c, humidity_percent,
+            condition, wind_speed_kph, wind_direction, plus per-city weekly summary arrays
+            average_temperature_c, average_humidity_percent, dominant_wind_direction.
+    """
+    codes = _as_codes(cities)
+    n = len(codes)
+    # One uniform draw per field; discrete fields are scaled and truncated, which keeps a
+    # single RNG call per batch and is as uniform as rng.integers for these small ranges.
+    # float64, so the rounded readings serialize as 5.7 rather than 5.699999809265137
+    uniform = _generator(seed).random((5, n, days))
+
+    temperature = np.round(CITY_TEMP_MIN[codes, None] + uniform[0] * CITY_TEMP_SPAN[codes, None], 1)
+    humidity = (uniform[1] * 81).astype(np.int16) + 20
+    conditions = (uniform[2] * len(WEATHER_CONDITIONS)).astype(np.intp)
+    wind_speed = np.round(uniform[3] * 35 + 5, 1)
+    directions = (uniform[4] * len(WIND_DIRECTIONS)).astype(np.intp)
+
+    # Most frequent wind direction per row: bincount over (row, direction) pairs
+    offsets = directions + len(WIND_DIRECTIONS) * np.arange(n)[:, None]
+    counts = np.bincount(offsets.ravel(), minlength=n * len(WIND_DIRECTIONS))
+    dominant = counts.reshape(n, len(WIND_DIRECTIONS)).argmax(axis=1)
+
+    return {
+        "city": CITIES[codes],
+        "continent": CITY_CONTINENTS[codes],
+        "date": _start_day(start) + np.arange(days),
+        "temperature_c": temperature,
+        "humidity_percent": humidity,
+        "condition": WEATHER_CONDITIONS[conditions],
+        "wind_speed_kph": wind_speed,
+        "wind_direction": WIND_DIRECTIONS[directions],
+        "average_temperature_c": np.round(temperature.sum(axis=1) / days, 1),
+        "average_humidity_percent": np.round(humidity.sum(axis=1) / days, 1),
+        "dominant_wind_direction": WIND_DIRECTIONS[dominant],
+    }
+
+def events_for_cities(cities, events_per_city: int = 5, seed=None, start=None, horizon_days: int = 30) -> dict:
+    """
+    Generates events_per_city events for every city in one batch, dated 1..horizon_days after start.
+    Returns arrays of shape (len(cities), events_per_city) for date, type and location, plus city/continent.
+    """
+    codes = _as_codes(cities)
+    uniform = _generator(seed).random((3, len(codes), events_per_city), dtype=np.float32)
+    return {
+        "city": CITIES[codes],
+        "continent": CITY_CONTINENTS[codes],
+        "date": _start_day(start) + (uniform[0] * horizon_days).astype(np.int64) + 1,
+        "type": EVENT_TYPES[(uniform[1] * len(EVENT_TYPES)).astype(np.intp)],
+        "location": VENUES[(uniform[2] * len(VENUES)).astype(np.intp)],
+    }
 
 def supported_cities_search() -> dict:
     """
     Renders a list of supported cities and continent eacg belongs to.
     Supported cities include major cities from North America, South America, Europe, Asia, and Africa.
     """
-    city_continent_map = {
-        "New York": "North America", "Toronto": "North America", "Los Angeles": "North America", "Mexico City": "North America",
-        "São Paulo": "South America", "Buenos Aires": "South America", "Lima": "South America", "Bogotá": "South America",
-        "London": "Europe", "Paris": "Europe", "Berlin": "Europe", "Rome": "Europe",
-        "Tokyo": "Asia", "Beijing": "Asia", "Mumbai": "Asia", "Bangkok": "Asia",
-        "Cairo": "Africa", "Lagos": "Africa", "Nairobi": "Africa", "Cape Town": "Africa"
-    }
-    return city_continent_map
+    return dict(CITY_CONTINENT_MAP)
 
 def weather_by_city_search(city_name:str) -> dict:
     """
     Renders a 7-day weather forecast for a supported city. Your response should include the current weather, a weekly forecast, and summary statistics.
 
     Args:
-        city_name (str): The name of the city to get the weather forecast for. 
+        city_name (str): The name of the city to get the weather forecast for.
             Supported cities include major cities from North America, South America, Europe, Asia, and Africa.
 
     Returns:
@@ -36,78 +164,44 @@ def weather_by_city_search(city_name:str) -> dict:
             - weekly_summary (dict): Summary statistics for the week (average temperature, humidity, dominant wind direction).
         If the city is not supported, returns a dictionary with an "error" key and message.
     """
-    # city_continent_map = {
-    #     "New York": "North America", "Toronto": "North America", "Los Angeles": "North America", "Mexico City": "North America",
-    #     "São Paulo": "South America", "Buenos Aires": "South America", "Lima": "South America", "Bogotá": "South America",
-    #     "London": "Europe", "Paris": "Europe", "Berlin": "Europe", "Rome": "Europe",
-    #     "Tokyo": "Asia", "Beijing": "Asia", "Mumbai": "Asia", "Bangkok": "Asia",
-    #     "Cairo": "Africa", "Lagos": "Africa", "Nairobi": "Africa", "Cape Town": "Africa"
-    # }
-
-    city_continent_map = supported_cities_search()
-
-    weather_conditions = ["Sunny", "Cloudy", "Rainy", "Stormy", "Snowy", "Windy", "Foggy"]
-
-    if city_name not in city_continent_map:
+    if city_name not in CITY_INDEX:
         return {"error": f"City '{city_name}' is not in the supported list."}
 
-    continent = city_continent_map[city_name]
-
-    temp_ranges = {
-        "North America": (10, 25),
-        "Europe": (10, 25),
-        "Asia": (20, 35),
-        "South America": (20, 35),
-        "Africa": (25, 45)
-    }
+    batch = weather_for_cities([city_name], days=7)
+    dates = np.datetime_as_string(batch["date"]).tolist()
+    temps = batch["temperature_c"][0].tolist()
+    humidities = batch["humidity_percent"][0].tolist()
+    conditions = batch["condition"][0].tolist()
+    wind_speeds = batch["wind_speed_kph"][0].tolist()
+    wind_directions = batch["wind_direction"][0].tolist()
 
-    min_temp, max_temp = temp_ranges[continent]
-
-    wind_forecast = []
-    temps = []
-    humidities = []
-    wind_directions = []
-
-    for i in range(7):
-        day = datetime.now() + timedelta(days=i)
-        temp = round(random.uniform(min_temp, max_temp), 1)
-        humidity = random.randint(20, 100)
-        wind_dir = random.choice(["N", "NE", "E", "SE", "S", "SW", "W", "NW"])
-
-        wind_data = {
-            "date": day.strftime("%Y-%m-%d"),
-            "temperature_c": temp,
-            "humidity_percent": humidity,
-            "condition": random.choice(weather_conditions),
-            "wind_speed_kph": round(random.uniform(5, 40), 1),
-            "wind_direction": wind_dir
+    weekly_forecast = [
+        {
+            "date": dates[i],
+            "temperature_c": temps[i],
+            "humidity_percent": humidities[i],
+            "condition": conditions[i],
+            "wind_speed_kph": wind_speeds[i],
+            "wind_direction": wind_directions[i]
         }
+        for i in range(len(dates))
+    ]
 
-        wind_forecast.append(wind_data)
-        temps.append(temp)
-        humidities.append(humidity)
-        wind_directions.append(wind_dir)
-
-    # Weekly summary
-    summary = {
-        "average_temperature_c": round(sum(temps) / len(temps), 1),
-        "average_humidity_percent": round(sum(humidities) / len(humidities), 1),
-        "dominant_wind_direction": Counter(wind_directions).most_common(1)[0][0]
-    }
-
-    data = {
+    return {
         "city": city_name,
-        "continent": continent,
+        "continent": CITY_CONTINENT_MAP[city_name],
         "current_temperature_c": temps[0],
         "current_humidity_percent": humidities[0],
-        "current_condition": wind_forecast[0]["condition"],
+        "current_condition": conditions[0],
         "timestamp": datetime.now().isoformat(),
-        "weekly_forecast": wind_forecast,
-        "weekly_summary": summary
+        "weekly_forecast": weekly_forecast,
+        "weekly_summary": {
+            "average_temperature_c": float(batch["average_temperature_c"][0]),
+            "average_humidity_percent": float(batch["average_humidity_percent"][0]),
+            "dominant_wind_direction": str(batch["dominant_wind_direction"][0])
+        }
     }
 
-    return data
-
 def event_by_city_search(city_name: str) -> dict:
     """
     Renders a list of cultural events for a supported city. Your response should include a list of events with their details.
@@ -128,39 +222,52 @@ def event_by_city_search(city_name: str) -> dict:
                 - description (str): Short description.
             If the city is not supported, returns a dictionary with an "error" key and message.
     """
-    # city_continent_map = {
-    #     "New York": "North America", "Toronto": "North America", "Los Angeles": "North America", "Mexico City": "North America",
-    #     "São Paulo": "South America", "Buenos Aires": "South America", "Lima": "South America", "Bogotá": "South America",
-    #     "London": "Europe", "Paris": "Europe", "Berlin": "Europe", "Rome": "Europe",
-    #     "Tokyo": "Asia", "Beijing": "Asia", "Mumbai": "Asia", "Bangkok": "Asia",
-    #     "Cairo": "Africa", "Lagos": "Africa", "Nairobi": "Africa", "Cape Town": "Africa"
-    # }
-
-    city_continent_map = supported_cities_search()
-
-    event_types = ["Festival", "Concert", "Exhibition", "Parade", "Theater", "Food Fair", "Cultural Workshop"]
-    venues = ["City Hall", "Central Park", "Downtown Arena", "Museum of Art", "Opera House", "Riverfront", "Main Square"]
-
-    if city_name not in city_continent_map:
+    if city_name not in CITY_INDEX:
         return {"error": f"City '{city_name}' is not in the supported list."}
 
-    continent = city_continent_map[city_name]
-    events = []
-    for i in range(5):
-        event_date = (datetime.now() + timedelta(days=random.randint(1, 30))).strftime("%Y-%m-%d")
-        event_type = random.choice(event_types)
-        venue = random.choice(venues)
-        event = {
-            "name": f"{city_name} {event_type} {i+1}",
-            "date": event_date,
-            "type": event_type,
-            "location": venue,
-            "description": f"A wonderful {event_type.lower()} happening at {venue} in {city_name}."
+    batch = events_for_cities([city_name], events_per_city=5)
+    dates = np.datetime_as_string(batch["date"][0]).tolist()
+    event_types = batch["type"][0].tolist()
+    venues = batch["location"][0].tolist()
+
+    events = [
+        {
+            "name": f"{city_name} {event_types[i]} {i+1}",
+            "date": dates[i],
+            "type": event_types[i],
+            "location": venues[i],
+            "description": f"A wonderful {event_types[i].lower()} happening at {venues[i]} in {city_name}."
         }
-        events.append(event)
+        for i in range(len(dates))
+    ]
 
     return {
         "city": city_name,
-        "continent": continent,
+        "continent": CITY_CONTINENT_MAP[city_name],
         "events": events
-    }
\ No newline at end of file
+    }
+
+
+if __name__ == "__main__":
+    # Bulk generation throughput, and the per-call cost of the tool wrappers
+    cities = np.tile(np.arange(len(CITIES)), 50_000)
+    for days in (7, 30):
+        started = time.perf_counter()
+        batch = weather_for_cities(cities, days=days, seed=42)
+        elapsed = time.perf_counter() - started
+        city_days = batch["temperature_c"].size
+        print(f"weather_for_cities: {city_days:,} city-days in {elapsed:.3f}s ({city_days / elapsed / 1e6:.1f}M city-days/s)")
+
+    started = time.perf_counter()
+    events = events_for_cities(cities, events_per_city=5, seed=42)
+    elapsed = time.perf_counter() - started
+    print(f"events_for_cities: {events['type'].size:,} events in {elapsed:.3f}s ({events['type'].size / elapsed / 1e6:.1f}M events/s)")
+
+    started = time.perf_counter()
+    for _ in range(10_000):
+        weather_by_city_search("Toronto")
+    print(f"weather_by_city_search: {(time.perf_counter() - started) / 10_000 * 1e6:.1f}us per call")
+
+    a = weather_for_cities(["Paris", "Lagos"], seed=7, start="2025-11-11")
+    b = weather_for_cities(["Paris", "Lagos"], seed=7, start="2025-11-11")
+    print("reproducible:", all(np.array_equal(a[key], b[key]) for key in a))
@@ -0,0 +1,221 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+"""
+Web search providers for the researcher and explainer agents.
+
+SearchProvider implementations return plain result dicts ({"title", "href", "body"}).
+CachedSearch wraps a provider with a normalized-query TTL cache, coalescing of
+concurrent identical searches, a token-bucket rate limit on upstream calls and a
+batch API that runs several queries side by side.
+"""
+
+DEFAULT_TTL_SECONDS = float(os.getenv("WEB_SEARCH_CACHE_TTL", 30 * 60))
+# Empty result lists (a failed or throttled DDG call often looks like one) are retried sooner
+DEFAULT_EMPTY_TTL_SECONDS = float(os.getenv("WEB_SEARCH_EMPTY_CACHE_TTL", 60))
+DEFAULT_MAX_ENTRIES = int(os.getenv("WEB_SEARCH_CACHE_ENTRIES", 1024))
+DEFAULT_RATE_PER_SECOND = float(os.getenv("WEB_SEARCH_RATE_PER_SECOND", 2))
+
+def normalize_query(query: str) -> str:
+    """Case-folds and collapses whitespace/punctuation so "Roman  Empire?" and "roman empire" share a cache entry."""
+    return re.sub(r"[\W_]+", " ", query.casefold()).strip()
+
+def format_results(results: list) -> str:
+    """Renders the results for the model, skipping those without a title or body."""
+    output = []
+    for res in results or []:
+        if not (res.get("title") and res.get("body")):
+            continue
+        output.append(
+            f"Title: {res['title']}\nURL: {res['href']}\nSnippet: {res['body']}\n"
+        )
+    return "\n---\n".join(output) if output else "No results found."
+
+
+class SearchProvider:
+    """Interface for search backends."""
+
+    def search(self, query: str, max_results: int = 5) -> list:
+        raise NotImplementedError
+
+
+class DDGSProvider(SearchProvider):
+    """
+    DuckDuckGo provider keeping one long-lived DDGS session per thread, so repeated
+    searches reuse its connection pool instead of opening a new TLS session each time.
+    """
+
+    def __init__(self, verify: bool = False):
+        self.verify = verify
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            from duckduckgo_search import DDGS
+            client = self._local.client = DDGS(verify=self.verify)
+        return client
+
+    def search(self, query: str, max_results: int = 5) -> list:
+        results = self._client().text(query, max_results=max_results) or []
+        return [res for res in results if res.get("title") and res.get("body")]
+
+
+class FakeSearchProvider(SearchProvider):
+    """Deterministic offline provider; records every query it receives in calls."""
+
+    def __init__(self, latency_s: float = 0.0):
+        self.latency_s = latency_s
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def search(self, query: str, max_results: int = 5) -> list:
+        with self._lock:
+            self.calls.append(query)
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return [
+            {"title": f"Result {i + 1} for {query}", "href": f"https://example.com/{i + 1}", "body": f"Snippet {i + 1} about {query}."}
+            for i in range(max_results)
+        ]
+
+
+class RateLimiter:
+    """Token bucket: at most burst calls at once, refilled at rate_per_second."""
+
+    def __init__(self, rate_per_second: float = DEFAULT_RATE_PER_SECOND, burst: int = None):
+        self.rate_per_second = rate_per_second
+        self.capacity = float(burst if burst is not None else max(1, int(rate_per_second)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate_per_second <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate_per_second)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate_per_second
+            time.sleep(wait)
+
+
+class CachedSearch:
+    """
+    Caching, coalescing and rate-limited front end for a SearchProvider.
+    Cached result lists are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, provider: SearchProvider, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, rate_limiter: RateLimiter = None,
+                 max_workers: int = 4, clock=time.monotonic, empty_ttl_seconds: float = DEFAULT_EMPTY_TTL_SECONDS):
+        self.provider = provider
+        self.ttl_seconds = ttl_seconds
+        self.empty_ttl_seconds = empty_ttl_seconds
+        self.max_entries = max_entries
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.max_workers = max_workers
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.metrics = {"hits": 0, "misses": 0, "coalesced": 0, "expirations": 0, "evictions": 0, "upstream_calls": 0}
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        results, expires_at = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            self.metrics["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return results
+
+    def _store(self, key, results):
+        ttl = self.ttl_seconds if results else self.empty_ttl_seconds
+        self._entries[key] = (results, self.clock() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.metrics["evictions"] += 1
+
+    def search(self, query: str, max_results: int = 5) -> list:
+        key = (normalize_query(query), max_results)
+        with self._lock:
+            results = self._lookup(key)
+            if results is not None:
+                self.metrics["hits"] += 1
+                return results
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+                self.metrics["misses"] += 1
+            else:
+                self.metrics["coalesced"] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            self.rate_limiter.acquire()
+            with self._lock:
+                self.metrics["upstream_calls"] += 1
+            results = self.provider.search(query, max_results=max_results)
+            with self._lock:
+                self._store(key, results)
+            future.set_result(results)
+            return results
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def search_many(self, queries: list, max_results: int = 5) -> list:
+        """
+        Runs several queries concurrently (subject to the rate limit) and returns their
+        result lists in input order. Failed queries yield an empty list.
+        """
+        def safe_search(query):
+            try:
+                return self.search(query, max_results=max_results)
+            except Exception:
+                return []
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, max(1, len(queries)))) as pool:
+            return list(pool.map(safe_search, queries))
+
+    def stats(self) -> dict:
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics["entries"] = len(self._entries)
+        lookups = metrics["hits"] + metrics["misses"] + metrics["coalesced"]
+        metrics["hit_ratio"] = round((metrics["hits"] + metrics["coalesced"]) / lookups, 3) if lookups else 0.0
+        return metrics
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+if __name__ == "__main__":
+    # The researcher and explainer often search the same query in one turn; with the
+    # cache only the first search goes upstream.
+    cached = CachedSearch(FakeSearchProvider(latency_s=0.2), rate_limiter=RateLimiter(rate_per_second=5, burst=2))
+    started = time.perf_counter()
+    cached.search_many(["Decline of the Roman Empire", "decline of the roman empire?", "Roman Empire economy", "Fall of Rome"])
+    cached.search("Decline of the  Roman Empire")
+    print(f"elapsed: {time.perf_counter() - started:.2f}s, upstream queries: {cached.provider.calls}")
+    print(cached.stats())
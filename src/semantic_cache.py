@@ -0,0 +1,274 @@
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+"""
+Two-level response cache for the LLM-only weather and travel tools.
+
+Level 1 is an exact-match LRU keyed on the normalized prompt. Level 2 is a semantic index:
+the variable part of the prompt (the location or destination the tool was called with) is
+embedded and compared by cosine similarity against earlier entries of the same tool, so
+"Argentina, Buenos Aires" can reuse the answer cached for "Buenos Aires Argentina". The default embedder is a hashed
+character n-gram vectorizer that needs no model download; any callable mapping a list of
+strings to an (n, dim) array, such as a local sentence-transformers model, can replace it.
+Both levels expire entries after ttl_seconds and evict the least recently used entry when
+full. stats() reports hit rates and the model latency saved by hits.
+
+A similar name is not always the same subject: "South Wales" scores 0.86 against "New
+South Wales". A semantic hit is therefore refused when one text's words are a strict subset
+of the other's or their numbers differ; with same_words=True, as the weather and travel
+tools use it, the word sets must be equal, so only order, case and punctuation may differ.
+"""
+
+DEFAULT_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL", 60 * 60))
+DEFAULT_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_ENTRIES", 2048))
+# With the n-gram embedder, 0.85 accepts word order changes and small suffixes ("New York City"
+# ~ "New York city, NY" is 0.92, then refused by the word check) but not qualified places
+# ("Paris" ~ "Paris, Texas" is 0.67)
+DEFAULT_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.85))
+
+_NUMBERS = re.compile(r"\d+")
+
+def normalize_prompt(text: str) -> str:
+    return re.sub(r"[\W_]+", " ", text.casefold()).strip()
+
+
+class HashingVectorizer:
+    """
+    Offline embedder: character n-grams of the normalized text (with word boundaries marked)
+    hashed into dim buckets with a sign bit, then L2-normalized.
+    """
+
+    def __init__(self, dim: int = 1024, ngram_range: tuple = (2, 4)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def _features(self, text: str) -> dict:
+        padded = f" {normalize_prompt(text)} "
+        features = {}
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            for i in range(len(padded) - n + 1):
+                h = zlib.crc32(padded[i:i + n].encode())
+                index, sign = h % self.dim, 1.0 if h & 0x80000000 else -1.0
+                features[index] = features.get(index, 0.0) + sign
+        return features
+
+    def __call__(self, texts: list) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for index, value in self._features(text).items():
+                vectors[row, index] = value
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+def sentence_transformer_embedder(model_name: str = "all-MiniLM-L6-v2"):
+    """Local embedding model (requires the optional sentence-transformers package)."""
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name)
+    return lambda texts: model.encode(texts, normalize_embeddings=True).astype(np.float32)
+
+
+class VectorIndex:
+    """
+    Fixed-capacity cosine index over normalized vectors with TTL and LRU eviction.
+    Rows are preallocated; lookups are one matrix-vector product over the live rows.
+    """
+
+    def __init__(self, dim: int, capacity: int):
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.expires_at = np.full(capacity, -np.inf)
+        self.last_used = np.zeros(capacity)
+        self.payloads = [None] * capacity
+        self.size = 0
+
+    def search(self, vector: np.ndarray, now: float) -> tuple:
+        """Returns (row, similarity) of the best live entry, or (None, 0.0)."""
+        if not self.size:
+            return None, 0.0
+        similarities = self.vectors[:self.size] @ vector
+        similarities[self.expires_at[:self.size] <= now] = -np.inf
+        row = int(np.argmax(similarities))
+        if similarities[row] == -np.inf:
+            return None, 0.0
+        return row, float(similarities[row])
+
+    def add(self, vector: np.ndarray, payload, expires_at: float, now: float) -> int:
+        if self.size < len(self.payloads):
+            row = self.size
+            self.size += 1
+        else:
+            # Reuse an expired row if there is one, otherwise the least recently used
+            expired = np.flatnonzero(self.expires_at <= now)
+            row = int(expired[0]) if len(expired) else int(np.argmin(self.last_used))
+        self.vectors[row] = vector
+        self.expires_at[row] = expires_at
+        self.last_used[row] = now
+        self.payloads[row] = payload
+        return row
+
+
+class SemanticResponseCache:
+    """
+    Exact + semantic cache in front of a model call, partitioned by namespace (one per tool).
+    """
+
+    def __init__(self, embedder=None, threshold: float = DEFAULT_THRESHOLD, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, clock=time.monotonic, same_words: bool = False):
+        self.embedder = embedder or HashingVectorizer()
+        self.threshold = threshold
+        self.same_words = same_words
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self._exact = OrderedDict()
+        self._indexes = {}
+        self._lock = threading.Lock()
+        self.metrics = {
+            "exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0,
+            "saved_latency_s": 0.0, "miss_latency_s": 0.0,
+        }
+
+    def _embed(self, text: str) -> np.ndarray:
+        return np.asarray(self.embedder([normalize_prompt(text)]), dtype=np.float32)[0]
+
+    def _same_subject(self, text: str, cached_text: str) -> bool:
+        """Whether a semantic match between the normalized texts may be served (see the module docstring)."""
+        if _NUMBERS.findall(text) != _NUMBERS.findall(cached_text):
+            return False
+        words, cached_words = set(text.split()), set(cached_text.split())
+        if self.same_words:
+            return words == cached_words
+        return not (words < cached_words or cached_words < words)
+
+    def _index(self, namespace: str, dim: int) -> VectorIndex:
+        index = self._indexes.get(namespace)
+        if index is None:
+            index = self._indexes[namespace] = VectorIndex(dim, self.max_entries)
+        return index
+
+    def _lookup(self, namespace: str, prompt: str, semantic_text: str = None) -> tuple:
+        now = self.clock()
+        key = (namespace, normalize_prompt(prompt))
+        with self._lock:
+            entry = self._exact.get(key)
+            if entry is not None:
+                if entry["expires_at"] > now:
+                    self._exact.move_to_end(key)
+                    self.metrics["exact_hits"] += 1
+                    self.metrics["saved_latency_s"] += entry["latency_s"]
+                    return "exact", entry["response"], None
+                del self._exact[key]
+
+        semantic_text = semantic_text or prompt
+        vector = self._embed(semantic_text)
+        with self._lock:
+            index = self._indexes.get(namespace)
+            row, similarity = index.search(vector, now) if index is not None else (None, 0.0)
+            if row is not None and similarity >= self.threshold:
+                payload = index.payloads[row]
+                if self._same_subject(normalize_prompt(semantic_text), payload["text"]):
+                    index.last_used[row] = now
+                    self.metrics["semantic_hits"] += 1
+                    self.metrics["saved_latency_s"] += payload["latency_s"]
+                    return "semantic", payload["response"], vector
+            self.metrics["misses"] += 1
+        return None, None, vector
+
+    def lookup(self, namespace: str, prompt: str, semantic_text: str = None) -> tuple:
+        """
+        Returns (level, response) with level "exact" or "semantic", or (None, None) on a miss.
+        semantic_text is what the semantic level compares (default: the prompt); it only
+        matches entries naming the same subject, as _same_subject decides.
+        """
+        level, response, _ = self._lookup(namespace, prompt, semantic_text)
+        return level, response
+
+    def store(self, namespace: str, prompt: str, response, latency_s: float, semantic_text: str = None, vector: np.ndarray = None):
+        now = self.clock()
+        semantic_text = semantic_text or prompt
+        vector = self._embed(semantic_text) if vector is None else vector
+        entry = {"response": response, "latency_s": latency_s, "expires_at": now + self.ttl_seconds,
+                 "text": normalize_prompt(semantic_text)}
+        with self._lock:
+            self._exact[(namespace, normalize_prompt(prompt))] = entry
+            self._exact.move_to_end((namespace, normalize_prompt(prompt)))
+            while len(self._exact) > self.max_entries:
+                self._exact.popitem(last=False)
+                self.metrics["evictions"] += 1
+            index = self._index(namespace, len(vector))
+            if index.size == self.max_entries:
+                self.metrics["evictions"] += 1
+            index.add(vector, entry, entry["expires_at"], now)
+            self.metrics["miss_latency_s"] += latency_s
+
+    def get_or_call(self, namespace: str, prompt: str, call, semantic_text: str = None):
+        """Returns the cached response for prompt, or call() and caches its result."""
+        level, response, vector = self._lookup(namespace, prompt, semantic_text)
+        if level is not None:
+            return response
+        started = time.perf_counter()
+        response = call()
+        self.store(namespace, prompt, response, time.perf_counter() - started, semantic_text, vector=vector)
+        return response
+
+    async def aget_or_call(self, namespace: str, prompt: str, call, semantic_text: str = None):
+        """Async variant of get_or_call; call is a coroutine function."""
+        level, response, vector = self._lookup(namespace, prompt, semantic_text)
+        if level is not None:
+            return response
+        started = time.perf_counter()
+        response = await call()
+        self.store(namespace, prompt, response, time.perf_counter() - started, semantic_text, vector=vector)
+        return response
+
+    def stats(self) -> dict:
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics["exact_entries"] = len(self._exact)
+        lookups = metrics["exact_hits"] + metrics["semantic_hits"] + metrics["misses"]
+        hits = metrics["exact_hits"] + metrics["semantic_hits"]
+        metrics["hit_ratio"] = round(hits / lookups, 3) if lookups else 0.0
+        metrics["semantic_hit_ratio"] = round(metrics["semantic_hits"] / lookups, 3) if lookups else 0.0
+        metrics["saved_latency_s"] = round(metrics["saved_latency_s"], 3)
+        metrics["miss_latency_s"] = round(metrics["miss_latency_s"], 3)
+        return metrics
+
+    def clear(self):
+        with self._lock:
+            self._exact.clear()
+            self._indexes.clear()
+
+
+if __name__ == "__main__":
+    # Similarities for typical tool inputs, then a simulated workload with a 0.5s model
+    cache = SemanticResponseCache()
+    pairs = [("Buenos Aires Argentina", "Argentina, Buenos Aires"), ("New York City", "New York city, NY"),
+             ("Mumbai", "Mumbaii"), ("Mumbai", "Mumbai, India"), ("Paris", "Paris, Texas"), ("Paris", "Lagos"),
+             ("New South Wales", "South Wales")]
+    for a, b in pairs:
+        similarity = float(cache._embed(a) @ cache._embed(b))
+        hit = similarity >= cache.threshold and cache._same_subject(normalize_prompt(b), normalize_prompt(a))
+        print(f"{a!r:>24} ~ {b!r:<26} cosine {similarity:.3f} {'hit' if hit else 'miss'}")
+
+    def slow_model(prompt):
+        time.sleep(0.5)
+        return f"answer to {prompt}"
+
+    locations = ["Buenos Aires Argentina", "buenos aires, argentina", "Argentina, Buenos Aires", "New York City",
+                 "New York city, NY", "Paris", "Paris, Texas", "Mumbai", "Mumbaii"]
+    started = time.perf_counter()
+    for location in locations:
+        prompt = f"What is the current weather in {location}?"
+        cache.get_or_call("weather", prompt, lambda: slow_model(prompt), semantic_text=location)
+    print(f"\n{len(locations)} lookups in {time.perf_counter() - started:.2f}s: {cache.stats()}")
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        cache.lookup("weather", "What is the current weather in NY, New York City?", "NY, New York City")
+    print(f"semantic lookup cost: {(time.perf_counter() - started) * 1000:.1f}us per call")
@@ -0,0 +1,228 @@
+import asyncio
+import os
+import time
+import uuid
+import weakref
+import zlib
+from collections import deque
+
+import aiosqlite
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+"""
+Multi-tenant session manager for checkpointed LangGraph agents.
+
+One graph is compiled once against a ShardedSqliteSaver over AsyncSqliteSaver instances,
+each with its own aiosqlite connection to the same WAL-mode database file. SQLite takes
+one writer per file, so every checkpoint write goes through the first connection; extra
+connections only serve reads, assigned by a stable hash of the thread_id. Sessions are
+created or resumed by thread id; the in-memory Session objects are dropped once idle (the
+conversation itself stays in the checkpoints and resumes on the next turn).
+"""
+
+# Connections to the database: one writer, plus CHECKPOINT_POOL_SIZE - 1 read-only shards.
+# Writers on extra connections would only queue on the WAL lock (see README)
+DEFAULT_POOL_SIZE = int(os.getenv("CHECKPOINT_POOL_SIZE", 1))
+# In-memory Session objects: idle ones are dropped after SESSION_IDLE_TTL_S, and the least
+# recently used beyond SESSION_CACHE_SIZE; their history stays in the checkpoints
+DEFAULT_IDLE_TTL_S = float(os.getenv("SESSION_IDLE_TTL_S", 1800))
+DEFAULT_MAX_SESSIONS = int(os.getenv("SESSION_CACHE_SIZE", 10000))
+# Most recent checkpoint write latencies kept per checkpointer
+LATENCY_SAMPLES = int(os.getenv("CHECKPOINT_LATENCY_SAMPLES", 10000))
+
+# WAL lets readers proceed while one writer commits; synchronous=NORMAL skips the fsync
+# per transaction (durable at WAL checkpoints), and busy_timeout makes concurrent writers
+# wait for the lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=10000",
+    "PRAGMA wal_autocheckpoint=2000",
+    "PRAGMA cache_size=-16000",
+)
+
+async def open_tuned_connection(db_path: str) -> aiosqlite.Connection:
+    conn = await aiosqlite.connect(db_path)
+    for pragma in SQLITE_PRAGMAS:
+        await conn.execute(pragma)
+    return conn
+
+
+class ShardedSqliteSaver(BaseCheckpointSaver):
+    """
+    Async checkpointer writing through savers[0] and reading each thread through one of
+    savers (by thread_id hash). Records the latest checkpoint write latencies (seconds) in
+    put_latencies/write_latencies.
+    """
+
+    def __init__(self, savers: list, latency_samples: int = LATENCY_SAMPLES):
+        super().__init__(serde=savers[0].serde)
+        self.savers = savers
+        self.writer = savers[0]
+        # Bounded: a long-lived server writes checkpoints for as long as it runs
+        self.put_latencies = deque(maxlen=latency_samples)
+        self.write_latencies = deque(maxlen=latency_samples)
+
+    def _saver(self, config) -> AsyncSqliteSaver:
+        thread_id = str(config["configurable"]["thread_id"])
+        return self.savers[zlib.crc32(thread_id.encode()) % len(self.savers)]
+
+    async def aget_tuple(self, config):
+        return await self._saver(config).aget_tuple(config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        # Every shard reads the same database file, so one of them lists all threads
+        saver = self._saver(config) if config else self.savers[0]
+        async for item in saver.alist(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        started = time.perf_counter()
+        try:
+            return await self.writer.aput(config, checkpoint, metadata, new_versions)
+        finally:
+            self.put_latencies.append(time.perf_counter() - started)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        started = time.perf_counter()
+        try:
+            return await self.writer.aput_writes(config, writes, task_id, task_path)
+        finally:
+            self.write_latencies.append(time.perf_counter() - started)
+
+    async def adelete_thread(self, thread_id: str):
+        await self.writer.adelete_thread(thread_id)
+
+    def get_next_version(self, current, channel):
+        return self.savers[0].get_next_version(current, channel)
+
+
+class Session:
+    """One conversation thread. Turns of the same session run one at a time."""
+
+    def __init__(self, manager, thread_id: str, lock: asyncio.Lock = None):
+        self.manager = manager
+        self.thread_id = thread_id
+        self.config = {"configurable": {"thread_id": thread_id}}
+        self.lock = lock or asyncio.Lock()
+        self.last_used = time.monotonic()
+
+    async def send(self, text: str) -> str:
+        """Runs one user turn and returns the final assistant message content."""
+        async with self.lock:
+            response = await self.manager.agent.ainvoke({"messages": [HumanMessage(text)]}, config=self.config)
+        return response["messages"][-1].content
+
+    async def stream(self, text: str, renderer=None):
+        """Streams one user turn through a StreamRenderer and returns (final_state, stats)."""
+        from streaming import astream_turn
+
+        async with self.lock:
+            return await astream_turn(
+                self.manager.agent, {"messages": [HumanMessage(text)]}, config=self.config, renderer=renderer
+            )
+
+    async def events(self, text: str):
+        """Yields the astream_events (v2) of one user turn, holding the session lock throughout."""
+        async with self.lock:
+            async for event in self.manager.agent.astream_events(
+                {"messages": [HumanMessage(text)]}, config=self.config, version="v2"
+            ):
+                yield event
+
+    async def history(self) -> list:
+        return await self.manager.history(self.thread_id)
+
+
+class SessionManager:
+    """
+    Creates and resumes sessions by thread id against a single compiled graph.
+
+        async with SessionManager(builder, "memory.db") as manager:
+            session = manager.session("2")
+            answer = await session.send("What's the weather in Toronto?")
+    """
+
+    def __init__(self, graph_builder, db_path: str = "memory.db", pool_size: int = DEFAULT_POOL_SIZE,
+                 idle_ttl_s: float = DEFAULT_IDLE_TTL_S, max_sessions: int = DEFAULT_MAX_SESSIONS):
+        self.graph_builder = graph_builder
+        self.db_path = db_path
+        self.pool_size = max(1, pool_size)
+        self.idle_ttl_s = idle_ttl_s
+        self.max_sessions = max_sessions
+        self.connections = []
+        self.checkpointer = None
+        self.agent = None
+        self._sessions = {}
+        # Per-thread turn locks, kept while any Session of the thread holds one, so a session
+        # recreated after eviction queues behind a turn still running on the evicted one
+        self._locks = weakref.WeakValueDictionary()
+
+    async def start(self):
+        for _ in range(self.pool_size):
+            self.connections.append(await open_tuned_connection(self.db_path))
+        savers = [AsyncSqliteSaver(conn) for conn in self.connections]
+        # Create the tables once up front rather than racing the shards on first use
+        for saver in savers:
+            await saver.setup()
+        self.checkpointer = ShardedSqliteSaver(savers)
+        self.agent = self.graph_builder.compile(checkpointer=self.checkpointer)
+        return self
+
+    async def close(self):
+        for conn in self.connections:
+            await conn.close()
+        self.connections = []
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def session(self, thread_id: str) -> Session:
+        """Returns the session for thread_id, resuming its persisted history if it exists."""
+        thread_id = str(thread_id)
+        # Re-inserted on every use, so _sessions stays ordered from least to most recently used
+        session = self._sessions.pop(thread_id, None) or Session(self, thread_id, self._lock(thread_id))
+        session.last_used = time.monotonic()
+        self._sessions[thread_id] = session
+        self._evict_idle()
+        return session
+
+    def _lock(self, thread_id: str) -> asyncio.Lock:
+        lock = self._locks.get(thread_id)
+        if lock is None:
+            lock = self._locks[thread_id] = asyncio.Lock()
+        return lock
+
+    def _evict_idle(self):
+        """
+        Drops sessions idle for idle_ttl_s and the least recently used beyond max_sessions.
+        Sessions running a turn, and the one just requested, are kept.
+        """
+        now = time.monotonic()
+        for thread_id, session in list(self._sessions.items())[:-1]:
+            if len(self._sessions) <= self.max_sessions and now - session.last_used < self.idle_ttl_s:
+                break
+            if not session.lock.locked():
+                del self._sessions[thread_id]
+
+    async def history(self, thread_id: str) -> list:
+        """Persisted messages of thread_id, read without creating a session."""
+        state = await self.agent.aget_state({"configurable": {"thread_id": str(thread_id)}})
+        return state.values.get("messages", [])
+
+    def create_session(self) -> Session:
+        return self.session(uuid.uuid4().hex)
+
+    async def list_threads(self) -> list:
+        """Thread ids with persisted checkpoints (all shards share one database file)."""
+        async with self.connections[0].execute("SELECT DISTINCT thread_id FROM checkpoints ORDER BY thread_id") as cursor:
+            return [row[0] async for row in cursor]
+
+    async def delete_session(self, thread_id: str):
+        self._sessions.pop(str(thread_id), None)
+        await self.checkpointer.adelete_thread(str(thread_id))
@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+"""
+Speculative preparation of tool inputs while the intent router is still classifying.
+
+A Speculator holds side-effect-free tasks, each useful to some intents: reading the place of
+a weather or travel query, local-parser flight extraction, airport resolution of the city
+names, loading the flight search plugin. start(query) submits all of them to a small
+thread pool right before the routing LLM call; commit(intent) waits for the tasks useful to
+the routed intent, publishes their results for that query, and cancels the rest (tasks
+already running finish in the background and count as wasted).
+
+Committed results are read back with prefetched(name, query), which only answers for the
+query they were computed from, so a stale speculation can never leak into another turn.
+
+    speculation = speculator.start(user_input)
+    decision = router.route(user_input)
+    speculation.commit(decision.intent)
+    details = prefetched("flight_details", user_input)
+"""
+
+DEFAULT_MAX_WORKERS = int(os.getenv("SPECULATION_WORKERS", 2))
+
+_committed = ContextVar("speculation_committed", default=None)
+
+def prefetched(name: str, query: str, default=None):
+    """Result of the committed speculative task name for query, or default."""
+    committed = _committed.get()
+    if committed is None or committed[0] != query or name not in committed[1]:
+        return default
+    return committed[1][name]
+
+
+@dataclass(frozen=True)
+class SpeculativeTask:
+    name: str
+    intents: frozenset
+    fn: object
+
+
+class Speculation:
+    """The tasks started for one query; commit() or cancel() it exactly once."""
+
+    def __init__(self, speculator, query: str, futures: dict):
+        self.speculator = speculator
+        self.query = query
+        self.futures = futures
+        self.started = time.perf_counter()
+
+    def commit(self, intent: str) -> dict:
+        """
+        Returns {task name: result} for the tasks useful to intent, after publishing them for
+        prefetched(); every other task is cancelled. A task that raised is left out.
+        """
+        committed_at = time.perf_counter()
+        results, saved, used, wasted = {}, 0.0, 0, 0
+        for task, future in self.futures.items():
+            if intent not in task.intents:
+                future.cancel()
+                wasted += 1
+                continue
+            try:
+                result, ran_from, ran_to = future.result()
+            except Exception:
+                wasted += 1
+                continue
+            results[task.name] = result
+            used += 1
+            # Only the part of the task that overlapped classification left the critical path
+            saved += max(0.0, min(ran_to, committed_at) - ran_from)
+        _committed.set((self.query, results))
+        self.speculator._record(used, wasted, saved)
+        return results
+
+    def cancel(self):
+        for future in self.futures.values():
+            future.cancel()
+        self.speculator._record(0, len(self.futures), 0.0)
+
+
+class Speculator:
+    """
+    Runs registered SpeculativeTasks for each query on a bounded thread pool and keeps
+    metrics: tasks used and wasted, wasted-speculation ratio and latency saved per turn.
+    """
+
+    def __init__(self, tasks: list = None, max_workers: int = DEFAULT_MAX_WORKERS):
+        self.tasks = list(tasks or [])
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculation")
+        self._lock = threading.Lock()
+        self._metrics = {"turns": 0, "tasks": 0, "used": 0, "wasted": 0, "saved_s": 0.0}
+
+    def register(self, name: str, intents, fn):
+        """Adds fn(query) as a speculative task useful to intents; fn must have no side effects."""
+        self.tasks.append(SpeculativeTask(name, frozenset(intents), fn))
+
+    @staticmethod
+    def _timed(fn, query):
+        started = time.perf_counter()
+        return fn(query), started, time.perf_counter()
+
+    def start(self, query: str) -> Speculation:
+        futures = {task: self.executor.submit(self._timed, task.fn, query) for task in self.tasks}
+        return Speculation(self, query, futures)
+
+    def _record(self, used: int, wasted: int, saved: float):
+        with self._lock:
+            self._metrics["turns"] += 1
+            self._metrics["tasks"] += used + wasted
+            self._metrics["used"] += used
+            self._metrics["wasted"] += wasted
+            self._metrics["saved_s"] += saved
+
+    def stats(self) -> dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+        turns, tasks = metrics.pop("turns"), metrics["tasks"]
+        saved = metrics.pop("saved_s")
+        return {
+            "turns": turns,
+            **metrics,
+            "wasted_ratio": round(metrics["wasted"] / tasks, 3) if tasks else 0.0,
+            "saved_ms_per_turn": round(saved / turns * 1000, 3) if turns else 0.0,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import sys
+import time
+
+"""
+Console renderer for streamed agent output.
+
+Consumes astream_events (v2) from any LangChain runnable or LangGraph graph, prints
+model tokens as they arrive and tool start/end events on their own lines, and records
+time-to-first-token and tokens/sec for every turn. Tokens from sub-agents invoked inside
+tools (e.g. the researcher graph behind the supervisor's researcher tool) surface here too,
+because nested runs inherit the streaming callbacks of the outer run.
+"""
+
+def _preview(value, limit: int = 120) -> str:
+    if hasattr(value, "content"):
+        value = value.content
+    if not isinstance(value, str):
+        try:
+            value = json.dumps(value, default=str)
+        except TypeError:
+            value = str(value)
+    value = " ".join(value.split())
+    return value if len(value) <= limit else value[:limit] + "..."
+
+
+class StreamRenderer:
+    """
+    Prints streamed tokens and tool events and keeps per-turn latency statistics in turns.
+    """
+
+    def __init__(self, out=None, show_tools: bool = True):
+        self.out = out or sys.stdout
+        self.show_tools = show_tools
+        self.turns = []
+        self._reset()
+
+    def _reset(self):
+        self.started = None
+        self.first_token_at = None
+        self.last_token_at = None
+        self.tokens = 0
+        self.tool_calls = 0
+        self.source = None
+        self.tool_started = {}
+
+    def _write(self, text: str):
+        self.out.write(text)
+        self.out.flush()
+
+    def start_turn(self):
+        self._reset()
+        self.started = time.perf_counter()
+
+    def on_token(self, text: str, source: str = None):
+        if not text:
+            return
+        now = time.perf_counter()
+        if self.first_token_at is None:
+            self.first_token_at = now
+        self.last_token_at = now
+        self.tokens += 1
+        if source != self.source:
+            self._write(f"\n[{source}] " if source else "\n")
+            self.source = source
+        self._write(text)
+
+    def on_tool_start(self, run_id: str, name: str, tool_input):
+        self.tool_calls += 1
+        self.tool_started[run_id] = time.perf_counter()
+        if self.show_tools:
+            self._write(f"\n  -> {name}({_preview(tool_input) if tool_input else ''})")
+            self.source = None
+
+    def on_tool_end(self, run_id: str, name: str, output):
+        elapsed = time.perf_counter() - self.tool_started.pop(run_id, time.perf_counter())
+        if self.show_tools:
+            self._write(f"\n  <- {name} [{elapsed:.2f}s]: {_preview(output)}")
+            self.source = None
+
+    def handle_event(self, event: dict):
+        kind = event["event"]
+        if kind == "on_chat_model_stream":
+            chunk = event["data"].get("chunk")
+            content = getattr(chunk, "content", "")
+            if isinstance(content, str):
+                metadata = event.get("metadata", {})
+                self.on_token(content, metadata.get("langgraph_node") or event.get("name"))
+        elif kind == "on_tool_start":
+            self.on_tool_start(event["run_id"], event["name"], event["data"].get("input"))
+        elif kind == "on_tool_end":
+            self.on_tool_end(event["run_id"], event["name"], event["data"].get("output"))
+
+    def end_turn(self) -> dict:
+        """Finishes the current turn and returns its statistics (seconds, tokens/sec)."""
+        ended = time.perf_counter()
+        stats = {
+            "elapsed_s": round(ended - self.started, 3),
+            "time_to_first_token_s": round(self.first_token_at - self.started, 3) if self.first_token_at else None,
+            "tokens": self.tokens,
+            "tokens_per_s": None,
+            "tool_calls": self.tool_calls,
+        }
+        if self.first_token_at is not None and self.last_token_at > self.first_token_at:
+            stats["tokens_per_s"] = round((self.tokens - 1) / (self.last_token_at - self.first_token_at), 1)
+        self.turns.append(stats)
+        self._write("\n")
+        return stats
+
+    def print_stats(self, stats: dict):
+        ttft = stats["time_to_first_token_s"]
+        rate = stats["tokens_per_s"]
+        self._write(
+            f"(ttft {ttft if ttft is not None else '-'}s, {stats['tokens']} tokens"
+            f" @ {rate if rate is not None else '-'} tok/s, {stats['tool_calls']} tool calls, {stats['elapsed_s']}s total)\n"
+        )
+
+
+async def astream_turn(runnable, inputs, config: dict = None, renderer: StreamRenderer = None):
+    """
+    Streams one turn of runnable through renderer and returns (final_output, stats).
+    """
+    renderer = renderer or StreamRenderer()
+    renderer.start_turn()
+    output = None
+    async for event in runnable.astream_events(inputs, config=config, version="v2"):
+        renderer.handle_event(event)
+        if event["event"] == "on_chain_end" and not event.get("parent_ids"):
+            output = event["data"].get("output")
+    return output, renderer.end_turn()
+
+def stream_turn(runnable, inputs, config: dict = None, renderer: StreamRenderer = None):
+    """Synchronous wrapper around astream_turn for the CLI loops."""
+    return asyncio.run(astream_turn(runnable, inputs, config=config, renderer=renderer))
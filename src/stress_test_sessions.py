@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from agent_memory_langgraph import build_graph
+from load_test_langchain import percentile
+from session_manager import DEFAULT_POOL_SIZE, SessionManager
+from stub_llm import StubChatModel
+
+"""
+Stress test for SessionManager: --sessions simultaneous conversations of --turns turns
+each against one compiled agent_memory_langgraph graph, with StubChatModel in place of
+Azure OpenAI. Reports turn latency and checkpoint write latency (aput / aput_writes).
+
+    python stress_test_sessions.py --sessions 200 --turns 3 --pool-size 1
+
+The database is a temporary file unless --db is given.
+"""
+
+SAMPLE_QUERIES = [
+    "What's the weather in Toronto next week?",
+    "Which cultural events are on in Paris?",
+    "Which cities do you support?",
+    "Any sport events in Mumbai this weekend?",
+]
+
+def latency_summary(values: list) -> dict:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50_ms": round(statistics.median(values) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(max(values) * 1000, 2),
+    }
+
+async def run_session(manager: SessionManager, session_id: int, turns: int, latencies: list):
+    session = manager.session(f"stress-{session_id}")
+    for turn in range(turns):
+        started = time.perf_counter()
+        await session.send(SAMPLE_QUERIES[(session_id + turn) % len(SAMPLE_QUERIES)])
+        latencies.append(time.perf_counter() - started)
+
+async def run(sessions: int, turns: int, pool_size: int, latency: float, db_path: str) -> dict:
+    builder = build_graph(StubChatModel(latency_s=latency))
+    latencies = []
+    async with SessionManager(builder, db_path, pool_size=pool_size) as manager:
+        started = time.perf_counter()
+        await asyncio.gather(*(run_session(manager, i, turns, latencies) for i in range(sessions)))
+        elapsed = time.perf_counter() - started
+        threads = await manager.list_threads()
+        history = await manager.session("stress-0").history()
+        checkpointer = manager.checkpointer
+
+    return {
+        "sessions": sessions,
+        "turns": len(latencies),
+        "pool_size": pool_size,
+        "threads_persisted": len(threads),
+        "messages_in_stress-0": len(history),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_turns_per_s": round(len(latencies) / elapsed, 1),
+        "turn_latency": latency_summary(latencies),
+        "checkpoint_put_latency": latency_summary(checkpointer.put_latencies),
+        "checkpoint_writes_latency": latency_summary(checkpointer.write_latencies),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stress test the multi-session checkpointed agent against a stub model.")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE, help="SQLite connections: one writer plus read-only shards")
+    parser.add_argument("--latency", type=float, default=0.02, help="synthetic stub model latency in seconds")
+    parser.add_argument("--db", help="checkpoint database path (default: a temporary file)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "stress_memory.db")
+        report = asyncio.run(run(args.sessions, args.turns, args.pool_size, args.latency, db_path))
+    for key, value in report.items():
+        print(f"{key:>28}: {value}")
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import re
+import time
+import uuid
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+"""
+Deterministic local chat model used for load tests and offline runs.
+
+It answers without any network access, following just enough of the prompt
+conventions used in this repo (ReAct agents, tool calling, structured output,
+flight detail extraction) for every agent loop to run to completion.
+"""
+
+_REACT_TOOLS = re.compile(r"should be one of \[(.*?)\]")
+_REACT_QUESTION = re.compile(r"^Question:\s*(.*)$", re.MULTILINE)
+
+_TOKEN = re.compile(r"\S+\s*|\s+")
+
+_DEFAULTS_BY_TYPE = {"number": 0.0, "integer": 0, "boolean": False, "array": [], "object": {}}
+
+_FLIGHT_DETAILS = {"origin": "Toronto", "destination": "Mumbai", "departure_date": "2025-11-11", "return_date": "2025-11-25"}
+
+def _schema_defaults(tool: dict, text: str) -> dict:
+    """Builds tool-call arguments from a tool's JSON schema: strings get the user text, other types a zero value."""
+    parameters = tool.get("function", {}).get("parameters", {})
+    args = {}
+    for name, spec in parameters.get("properties", {}).items():
+        field_type = spec.get("type", "string")
+        args[name] = text if field_type == "string" else _DEFAULTS_BY_TYPE.get(field_type)
+    return args
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (4 characters per token), good enough for synthetic usage metadata."""
+    return max(1, len(text) // 4)
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Chat model that sleeps latency_s seconds per call and returns rule-based replies.
+    When streamed, replies are emitted word by word at tokens_per_second (0 = no delay).
+    """
+
+    latency_s: float = 0.0
+    tokens_per_second: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        formatted = [convert_to_openai_tool(tool) for tool in tools]
+        return self.bind(tools=formatted, tool_choice=tool_choice, **kwargs)
+
+    def _reply(self, messages: List[BaseMessage], tools: Optional[list], tool_choice: Any) -> AIMessage:
+        last = messages[-1]
+        text = last.content if isinstance(last.content, str) else str(last.content)
+        system = next((m.content for m in messages if isinstance(m, SystemMessage)), "")
+
+        if tools and (tool_choice or not isinstance(last, ToolMessage)):
+            tool = tools[0]
+            if isinstance(tool_choice, str) and tool_choice not in ("any", "auto", "required"):
+                tool = next((t for t in tools if t["function"]["name"] == tool_choice), tool)
+            args = _schema_defaults(tool, text)
+            if "extracts flight search details" in system:
+                args = {name: _FLIGHT_DETAILS.get(name) for name in args}
+            return AIMessage(content="", tool_calls=[{
+                "name": tool["function"]["name"],
+                "args": args,
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "tool_call",
+            }])
+        if isinstance(last, ToolMessage):
+            return AIMessage(content=f"Based on the tool results: {text[:200]}")
+
+        react_tools = _REACT_TOOLS.search(text)
+        if react_tools:
+            # Only the scratchpad after the final "Question:" line holds real observations;
+            # the format instructions above it mention "Observation:" as well.
+            scratchpad = text[text.rfind("\nQuestion:"):]
+            if "\nObservation:" in scratchpad:
+                observation = scratchpad.rsplit("\nObservation:", 1)[1].split("\nThought:", 1)[0].strip()
+                return AIMessage(content=f"Thought: I now know the final answer.\nFinal Answer: {observation[:500]}")
+            question = _REACT_QUESTION.findall(text)
+            tool_name = react_tools.group(1).split(",")[0].strip()
+            return AIMessage(content=(
+                "Thought: I should use the tool.\n"
+                f"Action: {tool_name}\n"
+                f"Action Input: {question[-1] if question else text[-200:]}"
+            ))
+
+        if "extracts flight search details" in system:
+            return AIMessage(content=json.dumps(_FLIGHT_DETAILS))
+
+        return AIMessage(content=f"Stub response to: {text[:200]}")
+
+    def _result(self, messages: List[BaseMessage], **kwargs) -> ChatResult:
+        message = self._reply(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        prompt_tokens = sum(estimate_tokens(str(m.content)) for m in messages)
+        completion_tokens = estimate_tokens(message.content or json.dumps(message.tool_calls))
+        message.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return self._result(messages, **kwargs)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        return self._result(messages, **kwargs)
+
+    def _chunks(self, messages: List[BaseMessage], **kwargs) -> Iterator[ChatGenerationChunk]:
+        message = self._result(messages, **kwargs).generations[0].message
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                    for i, call in enumerate(message.tool_calls)
+                ],
+                usage_metadata=message.usage_metadata,
+            ))
+            return
+        tokens = _TOKEN.findall(message.content) or [""]
+        for i, token in enumerate(tokens):
+            last = i == len(tokens) - 1
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=token, usage_metadata=message.usage_metadata if last else None
+            ))
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        for chunk in self._chunks(messages, **kwargs):
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+            if self.tokens_per_second:
+                time.sleep(1 / self.tokens_per_second)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        for chunk in self._chunks(messages, **kwargs):
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+            if self.tokens_per_second:
+                await asyncio.sleep(1 / self.tokens_per_second)
@@ -0,0 +1,204 @@
+import inspect
+import os
+import re
+import statistics
+import threading
+import time
+from contextvars import ContextVar
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tracers.context import register_configure_hook
+
+from plugins.flight_extraction import MONTHS, find_cities
+from speculation import prefetched
+
+"""
+Direct tool dispatch for the single-tool intents of the LangChain assistants.
+
+The weather, travel and flight agents are ZERO_SHOT_REACT_DESCRIPTION agents wrapping exactly
+one tool, so a turn costs a planning call, the tool (itself an LLM call for weather and
+travel) and a final-answer call. Once the router has picked the intent there is nothing left
+to plan: in "direct" mode ToolDispatcher reads the tool argument from the query, calls the
+tool function and returns its output. The ReAct agent only runs when the tool needs
+clarification: no location could be read for weather or travel, or the flight tool asks for
+missing details ("Please provide ..."). "react" mode keeps the agent for every turn.
+
+Both modes record, per intent, the number of turns, the model calls they made (counted by a
+callback handler attached to every model call in the turn's context) and their latency.
+
+    dispatcher = ToolDispatcher({"weather": (weather_tool_func, "location")}, lambda intent: registry.get(f"{intent}_agent"))
+    answer = dispatcher.run("weather", "How is the weather in Mumbai in November?")
+"""
+
+DISPATCH_MODES = ("direct", "react")
+DEFAULT_DISPATCH_MODE = os.getenv("AGENT_DISPATCH_MODE", "direct")
+
+# Tool outputs asking the user for more information (see get_flight_info)
+CLARIFICATION_MARKERS = ("Please provide",)
+
+# Capitalized place names after a location cue, for places that are not in the airport index
+_PLACE = re.compile(r"\b(?:in|to|visit|visiting|around|near|at|of)\s+(?P<place>[A-Z][\w'.-]*(?:,?\s+[A-Z][\w'.-]*)*)")
+
+def extract_location(query: str):
+    """
+    Returns the place a weather or travel query is about, or None. Cities of the airport index
+    come first ("How far is the Taj Mahal from Mumbai?" -> "Mumbai"), then capitalized names
+    after "in", "to", "visit" and similar cues, without trailing month names.
+    """
+    cities = find_cities(query)
+    if cities:
+        return cities[0][1]
+    for match in _PLACE.finditer(query):
+        words = re.split(r",?\s+", match.group("place").rstrip(".?!"))
+        while words and words[-1].lower().rstrip(".") in MONTHS:
+            words.pop()
+        if words and words[0].lower() not in MONTHS:
+            return " ".join(words)
+    return None
+
+def needs_clarification(output: str) -> bool:
+    return any(marker in output for marker in CLARIFICATION_MARKERS)
+
+
+class ModelCallCounter(BaseCallbackHandler):
+    """Counts the chat model and LLM calls started while it is the active counter."""
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _count(self):
+        with self._lock:
+            self.calls += 1
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self._count()
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._count()
+
+# Every callback manager configured while the variable is set gets the counter, including
+# the tools' own model.invoke() calls that are made without a config
+_active_counter = ContextVar("model_call_counter", default=None)
+register_configure_hook(_active_counter, inheritable=True)
+
+# Mode ("direct", "react" or "react_fallback") of the last turn run in this context, for per-turn reports
+last_dispatch_mode = ContextVar("last_dispatch_mode", default=None)
+
+
+class DispatchStats:
+    """Turns, model calls and latency per intent and execution mode ("direct", "react", "react_fallback")."""
+
+    def __init__(self, max_samples: int = 2048):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._records = {}
+
+    def record(self, intent: str, mode: str, seconds: float, model_calls: int):
+        with self._lock:
+            record = self._records.setdefault((intent, mode), {"turns": 0, "model_calls": 0, "latencies": []})
+            record["turns"] += 1
+            record["model_calls"] += model_calls
+            record["latencies"].append(seconds)
+            del record["latencies"][:-self.max_samples]
+
+    def stats(self) -> dict:
+        with self._lock:
+            records = {key: dict(value, latencies=list(value["latencies"])) for key, value in self._records.items()}
+        report = {}
+        for (intent, mode), record in sorted(records.items()):
+            latencies = sorted(record["latencies"])
+            report.setdefault(intent, {})[mode] = {
+                "turns": record["turns"],
+                "model_calls": record["model_calls"],
+                "model_calls_per_turn": round(record["model_calls"] / record["turns"], 2),
+                "p50_ms": round(statistics.median(latencies) * 1000, 1),
+                "p99_ms": round(latencies[min(len(latencies) - 1, round(0.99 * len(latencies)) - 1)] * 1000, 1),
+            }
+        return report
+
+
+class ToolDispatcher:
+    """
+    Runs the tool of an intent directly, or through its ReAct agent.
+
+    tools maps each intent to (tool function, argument), where argument is "location" (the
+    place read from the query) or "query" (the whole query). Tool functions may be plain or
+    coroutine functions; use run() for the former and arun() for the latter. agent_for(intent)
+    returns the ReAct agent of an intent and is only called when that agent is needed.
+    """
+
+    def __init__(self, tools: dict, agent_for, mode: str = DEFAULT_DISPATCH_MODE):
+        if mode not in DISPATCH_MODES:
+            raise ValueError(f"Unknown dispatch mode '{mode}', expected one of {DISPATCH_MODES}")
+        self.tools = tools
+        self.agent_for = agent_for
+        self.mode = mode
+        self.dispatch_stats = DispatchStats()
+
+    def __contains__(self, intent: str) -> bool:
+        return intent in self.tools
+
+    def _argument(self, intent: str, query: str):
+        func, argument = self.tools[intent]
+        if argument != "location":
+            return func, query
+        location = prefetched("location", query, default=False)
+        return func, (extract_location(query) if location is False else location)
+
+    def _start(self):
+        counter = ModelCallCounter()
+        return counter, _active_counter.set(counter), time.perf_counter()
+
+    def _finish(self, intent, mode, counter, token, started):
+        _active_counter.reset(token)
+        last_dispatch_mode.set(mode)
+        self.dispatch_stats.record(intent, mode, time.perf_counter() - started, counter.calls)
+
+    def run(self, intent: str, query: str) -> str:
+        counter, token, started = self._start()
+        mode = self.mode
+        try:
+            if mode == "direct":
+                func, argument = self._argument(intent, query)
+                if argument is not None:
+                    output = func(argument)
+                    if not needs_clarification(output):
+                        return output
+                mode = "react_fallback"
+            return self.agent_for(intent).invoke({"input": query})["output"]
+        finally:
+            self._finish(intent, mode, counter, token, started)
+
+    async def arun(self, intent: str, query: str) -> str:
+        counter, token, started = self._start()
+        mode = self.mode
+        try:
+            if mode == "direct":
+                func, argument = self._argument(intent, query)
+                if argument is not None:
+                    output = func(argument)
+                    if inspect.isawaitable(output):
+                        output = await output
+                    if not needs_clarification(output):
+                        return output
+                mode = "react_fallback"
+            return (await self.agent_for(intent).ainvoke({"input": query}))["output"]
+        finally:
+            self._finish(intent, mode, counter, token, started)
+
+    def as_runnable(self, intent: str) -> RunnableLambda:
+        """
+        The turn of an intent as a runnable taking {"input": query} and returning {"output": answer},
+        so it can be streamed with astream_events like an agent executor.
+        """
+        func, _ = self.tools[intent]
+        if inspect.iscoroutinefunction(func):
+            async def arun_turn(inputs: dict) -> dict:
+                return {"output": await self.arun(intent, inputs["input"])}
+            return RunnableLambda(arun_turn, name=f"{intent}_dispatch")
+        return RunnableLambda(lambda inputs: {"output": self.run(intent, inputs["input"])}, name=f"{intent}_dispatch")
+
+    def stats(self) -> dict:
+        return self.dispatch_stats.stats()
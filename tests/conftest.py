@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The modules import each other as top-level modules from src/, as when run from there
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+# Offline defaults: stub model, no persistent flight cache, no network geolocation
+os.environ.setdefault("LLM_MODE", "stub")
+os.environ.setdefault("FLIGHT_CACHE_DB", "")
+os.environ.setdefault("GEOIP_ONLINE", "0")
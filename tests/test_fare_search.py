@@ -0,0 +1,157 @@
+import asyncio
+import threading
+import time
+from datetime import date
+
+from plugins.fare_search import FakeFareBackend, FareSearch, FareSearchResult, Itinerary, format_itineraries, rank_itineraries
+
+TODAY = date(2026, 1, 1)
+
+
+def itinerary(price, flight_numbers=("AC 100",), outbound="2026-02-01", duration_min=600, stops=0) -> Itinerary:
+    return Itinerary(price=price, currency="USD", origin="YYZ", destination="BOM", outbound_date=outbound,
+                     return_date="2026-02-15", duration_min=duration_min, stops=stops, airlines=("Air Canada",),
+                     flight_numbers=flight_numbers)
+
+
+class FailingBackend(FakeFareBackend):
+    """Fails every search departing from one of the failing airports."""
+
+    def __init__(self, failing: set, **kwargs):
+        super().__init__(**kwargs)
+        self.failing = failing
+
+    def search(self, params):
+        if params["departure_id"] in self.failing:
+            raise ConnectionError(f"{params['departure_id']} unavailable")
+        return super().search(params)
+
+    async def asearch(self, params, **kwargs):
+        if params["departure_id"] in self.failing:
+            return {"error": f"{params['departure_id']} unavailable"}
+        return await super().asearch(params, **kwargs)
+
+
+class CountingBackend(FakeFareBackend):
+    """Records the highest number of searches in flight at once."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.in_flight = 0
+        self.peak = 0
+        self._gauge = threading.Lock()
+
+    def _enter(self):
+        with self._gauge:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+
+    def _exit(self):
+        with self._gauge:
+            self.in_flight -= 1
+
+    def search(self, params):
+        self._enter()
+        try:
+            return super().search(params)
+        finally:
+            self._exit()
+
+    async def asearch(self, params, **kwargs):
+        self._enter()
+        try:
+            return await super().asearch(params, **kwargs)
+        finally:
+            self._exit()
+
+
+def test_expand_covers_every_airport_pair_and_date_shift():
+    combinations = FareSearch(FakeFareBackend()).expand(["YYZ", "YTZ"], ["BOM", "DEL"], "2026-02-10", "2026-02-24",
+                                                        flex_days=2, today=TODAY)
+    assert len(combinations) == 2 * 2 * 5
+    pairs = {(params["departure_id"], params["arrival_id"]) for params in combinations}
+    assert pairs == {("YYZ", "BOM"), ("YYZ", "DEL"), ("YTZ", "BOM"), ("YTZ", "DEL")}
+    dates = sorted({(params["outbound_date"], params["return_date"]) for params in combinations})
+    # The trip length stays 14 days across the window
+    assert dates == [("2026-02-08", "2026-02-22"), ("2026-02-09", "2026-02-23"), ("2026-02-10", "2026-02-24"),
+                     ("2026-02-11", "2026-02-25"), ("2026-02-12", "2026-02-26")]
+
+
+def test_expand_skips_same_airport_pairs_and_past_shifts():
+    combinations = FareSearch(FakeFareBackend()).expand(["YYZ", "BOM"], ["BOM"], "2026-01-02", "2026-01-09",
+                                                        flex_days=2, today=TODAY)
+    assert {params["departure_id"] for params in combinations} == {"YYZ"}
+    assert [params["outbound_date"] for params in combinations] == ["2026-01-01", "2026-01-02", "2026-01-03", "2026-01-04"]
+
+
+def test_rank_keeps_the_cheapest_copy_of_each_flight():
+    ranked = rank_itineraries([
+        itinerary(900, ("AC 100",)),
+        itinerary(700, ("AC 100",)),
+        itinerary(800, ("LH 200",)),
+        itinerary(650, ("AC 100",), outbound="2026-02-02"),
+    ], top_k=10)
+    assert [(i.price, i.flight_numbers, i.outbound_date) for i in ranked] == [
+        (650, ("AC 100",), "2026-02-02"), (700, ("AC 100",), "2026-02-01"), (800, ("LH 200",), "2026-02-01")]
+
+
+def test_rank_orders_by_the_requested_key_and_cuts_to_top_k():
+    offers = [itinerary(500, ("A 1",), duration_min=900, stops=2), itinerary(800, ("B 2",), duration_min=400, stops=0),
+              itinerary(650, ("C 3",), duration_min=600, stops=1)]
+    assert [i.price for i in rank_itineraries(offers, "price", 2)] == [500, 650]
+    assert [i.duration_min for i in rank_itineraries(offers, "duration", 3)] == [400, 600, 900]
+    assert [i.stops for i in rank_itineraries(offers, "stops", 3)] == [0, 1, 2]
+
+
+def test_search_returns_deduplicated_ranked_offers():
+    backend = FakeFareBackend(offers=4)
+    result = FareSearch(backend).search(["YYZ", "YTZ"], ["BOM", "DEL"], "2099-02-10", "2099-02-24", flex_days=1, top_k=5)
+    assert result.searched == len(backend.calls) == 12
+    assert result.failed == 0 and result.found == 12 * 4
+    prices = [i.price for i in result.itineraries]
+    assert len(prices) == 5 and prices == sorted(prices)
+    assert len({i.dedup_key for i in result.itineraries}) == 5
+
+
+def test_search_reports_partial_failures():
+    result = FareSearch(FailingBackend({"YTZ"})).search(["YYZ", "YTZ"], ["BOM"], "2099-02-10", "2099-02-24")
+    assert (result.searched, result.failed) == (2, 1)
+    assert result.itineraries and all(i.origin == "YYZ" for i in result.itineraries)
+    assert "YTZ unavailable" in result.errors[0]
+    assert "2 airport/date combinations searched, 1 failed" in format_itineraries(result)
+
+
+def test_search_reports_when_every_search_failed():
+    result = FareSearch(FailingBackend({"YYZ", "YTZ"})).search(["YYZ", "YTZ"], ["BOM"], "2099-02-10", "2099-02-24")
+    assert (result.searched, result.failed, result.itineraries) == (2, 2, [])
+    assert "No flights found across 2 airport/date combinations (2 searches failed: YYZ unavailable)" in format_itineraries(result)
+
+
+def test_async_search_reports_error_payloads_as_failures():
+    result = asyncio.run(FareSearch(FailingBackend({"YTZ"})).asearch(["YYZ", "YTZ"], ["BOM"], "2099-02-10", "2099-02-24"))
+    assert (result.searched, result.failed) == (2, 1)
+    assert result.errors == ["YTZ unavailable"]
+
+
+def test_format_without_failures():
+    result = FareSearchResult(itineraries=[itinerary(700)], searched=3, found=6)
+    assert format_itineraries(result).splitlines()[0] == "[Flight Agent] Top 1 of 6 offers (3 airport/date combinations searched):"
+
+
+def test_search_runs_at_most_max_workers_at_once():
+    backend = CountingBackend(latency_s=0.05)
+    started = time.perf_counter()
+    result = FareSearch(backend, max_workers=3).search(["YYZ", "YTZ"], ["BOM", "DEL"], "2099-02-10", "2099-02-24", flex_days=1)
+    elapsed = time.perf_counter() - started
+    assert result.searched == 12
+    assert backend.peak == 3
+    # 12 searches, 3 at a time: 4 rounds instead of 12 sequential ones
+    assert elapsed < 12 * 0.05
+
+
+def test_async_search_runs_at_most_max_workers_at_once():
+    backend = CountingBackend(latency_s=0.05)
+    result = asyncio.run(FareSearch(backend, max_workers=3).asearch(["YYZ", "YTZ"], ["BOM", "DEL"], "2099-02-10",
+                                                                    "2099-02-24", flex_days=1))
+    assert result.searched == 12
+    assert backend.peak == 3
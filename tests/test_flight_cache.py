@@ -0,0 +1,191 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from plugins.flight_cache import FlightSearchCache, MemoryTier, SqliteTier, cache_key
+
+PARAMS = {"departure_id": ["YYZ"], "arrival_id": ["BOM"], "outbound_date": "2025-11-11",
+          "return_date": "2025-11-25", "currency": "USD", "type": "1"}
+
+
+class FakeGoogleSearch:
+    """Local stand-in for serpapi.GoogleSearch: same constructor(params) / get_dict() shape."""
+
+    calls = []
+    latency_s = 0.0
+    _lock = threading.Lock()
+
+    def __init__(self, params):
+        self.params = params
+
+    def get_dict(self):
+        with FakeGoogleSearch._lock:
+            FakeGoogleSearch.calls.append(cache_key(self.params))
+        time.sleep(FakeGoogleSearch.latency_s)
+        return {"best_flights": [{"price": 1234, "route": cache_key(self.params)}]}
+
+
+async def fake_async_search(params, latency_s: float = 0.0):
+    FakeGoogleSearch.calls.append(cache_key(params))
+    await asyncio.sleep(latency_s)
+    return {"best_flights": [{"price": 1234, "route": cache_key(params)}]}
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def reset_fake():
+    FakeGoogleSearch.calls = []
+    FakeGoogleSearch.latency_s = 0.0
+
+
+def routes(**changes):
+    return dict(PARAMS, **changes)
+
+
+def payload_size(value) -> int:
+    return len(json.dumps(value))
+
+
+def test_cache_key_normalizes_case_whitespace_and_lists():
+    assert cache_key(PARAMS) == cache_key(routes(departure_id="yyz", arrival_id=" bom", currency="usd"))
+    assert cache_key(PARAMS) != cache_key(routes(outbound_date="2025-11-12"))
+
+
+def test_hit_and_miss_metrics():
+    cache = FlightSearchCache(search_factory=FakeGoogleSearch)
+    first = cache.get_or_fetch(PARAMS)
+    second = cache.get_or_fetch(routes(departure_id="yyz"))
+
+    assert second is first
+    assert len(FakeGoogleSearch.calls) == 1
+    stats = cache.stats()
+    assert (stats["misses"], stats["memory_hits"], stats["upstream_calls"]) == (1, 1, 1)
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_error_responses_are_not_cached():
+    cache = FlightSearchCache(search_factory=FakeGoogleSearch)
+    cache.get_or_fetch(PARAMS, fetch=lambda: {"error": "quota exceeded"})
+    cache.get_or_fetch(PARAMS)
+    assert len(FakeGoogleSearch.calls) == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_lru_eviction_respects_the_byte_budget():
+    entry_size = payload_size(FakeGoogleSearch(PARAMS).get_dict())
+    FakeGoogleSearch.calls = []
+    cache = FlightSearchCache(search_factory=FakeGoogleSearch, memory_tier=MemoryTier(budget_bytes=2 * entry_size + 10))
+    cache.get_or_fetch(routes(arrival_id="BOM"))
+    cache.get_or_fetch(routes(arrival_id="DEL"))
+    cache.get_or_fetch(routes(arrival_id="BOM"))  # BOM becomes the most recently used
+    cache.get_or_fetch(routes(arrival_id="GOI"))  # evicts DEL, the least recently used
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["memory_entries"] == 2 and stats["memory_bytes"] <= 2 * entry_size + 10
+    cache.get_or_fetch(routes(arrival_id="BOM"))
+    assert len(FakeGoogleSearch.calls) == 3
+    cache.get_or_fetch(routes(arrival_id="DEL"))
+    assert len(FakeGoogleSearch.calls) == 4
+
+
+def test_oversized_value_drops_the_stale_previous_value():
+    tier = MemoryTier(budget_bytes=100)
+    tier.set("key", "old", expires_at=2000, size=10)
+    assert tier.set("key", "new", expires_at=2000, size=500) == 0
+    assert tier.get("key", now=1000)[0] == "miss"
+    assert tier.used_bytes == 0 and len(tier) == 0
+
+
+def test_entries_expire_after_the_ttl():
+    clock = FakeClock()
+    cache = FlightSearchCache(search_factory=FakeGoogleSearch, ttl_seconds=60, clock=clock)
+    cache.get_or_fetch(PARAMS)
+    clock.now += 59
+    cache.get_or_fetch(PARAMS)
+    assert len(FakeGoogleSearch.calls) == 1
+
+    clock.now += 1
+    cache.get_or_fetch(PARAMS)
+    assert len(FakeGoogleSearch.calls) == 2
+    assert cache.stats()["expirations"] == 1
+
+
+def test_disk_tier_survives_a_new_memory_tier_and_expires_too():
+    clock = FakeClock()
+    disk = SqliteTier(":memory:")
+    FlightSearchCache(search_factory=FakeGoogleSearch, ttl_seconds=60, disk_tier=disk, clock=clock).get_or_fetch(PARAMS)
+
+    restarted = FlightSearchCache(search_factory=FakeGoogleSearch, ttl_seconds=60, disk_tier=disk, clock=clock)
+    restarted.get_or_fetch(PARAMS)
+    assert len(FakeGoogleSearch.calls) == 1
+    assert restarted.stats()["disk_hits"] == 1
+
+    clock.now += 60
+    FlightSearchCache(search_factory=FakeGoogleSearch, ttl_seconds=60, disk_tier=disk, clock=clock).get_or_fetch(PARAMS)
+    assert len(FakeGoogleSearch.calls) == 2
+
+
+def test_sync_single_flight():
+    FakeGoogleSearch.latency_s = 0.2
+    cache = FlightSearchCache(search_factory=FakeGoogleSearch)
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        results = list(pool.map(lambda _: cache.get_or_fetch(PARAMS), range(10)))
+
+    assert len(FakeGoogleSearch.calls) == 1
+    assert all(result is results[0] for result in results)
+    stats = cache.stats()
+    assert stats["misses"] == 1 and stats["coalesced"] + stats["memory_hits"] == 9
+
+
+def test_sync_single_flight_shares_the_error():
+    def failing():
+        time.sleep(0.1)
+        FakeGoogleSearch.calls.append("failed")
+        raise RuntimeError("upstream down")
+
+    cache = FlightSearchCache(search_factory=FakeGoogleSearch)
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        futures = [pool.submit(cache.get_or_fetch, PARAMS, failing) for _ in range(5)]
+    assert all(isinstance(future.exception(), RuntimeError) for future in futures)
+    assert FakeGoogleSearch.calls == ["failed"]
+    assert cache.stats()["upstream_errors"] == 1
+
+
+def test_async_single_flight():
+    cache = FlightSearchCache(async_search=fake_async_search)
+
+    async def run():
+        return await asyncio.gather(*(cache.aget_or_fetch(PARAMS, latency_s=0.1) for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert len(FakeGoogleSearch.calls) == 1
+    assert all(result is results[0] for result in results)
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["upstream_calls"]) == (1, 9, 1)
+
+
+def test_async_cancelled_caller_does_not_cancel_the_shared_fetch():
+    cache = FlightSearchCache(async_search=fake_async_search)
+
+    async def run():
+        first = asyncio.ensure_future(cache.aget_or_fetch(PARAMS, latency_s=0.1))
+        second = asyncio.ensure_future(cache.aget_or_fetch(PARAMS, latency_s=0.1))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run())["best_flights"][0]["price"] == 1234
+    assert len(FakeGoogleSearch.calls) == 1
+    assert cache.lookup(cache_key(PARAMS))[0]
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import threading
+import time
+
+from plugins.geolocation import (DEFAULT_CIDR_PATH, CidrTable, Geolocator, IpinfoResolver, OfflineResolver, Resolver,
+                                 default_resolvers)
+
+SAMPLE_TABLE = os.path.join(os.path.dirname(DEFAULT_CIDR_PATH), "geoip_cidr_sample.csv")
+
+
+class FakeCountries:
+    def get(self, country_code):
+        return {"FR": ("France", ["CDG", "ORY"])}.get(country_code)
+
+
+class SlowResolver(Resolver):
+    name = "slow"
+
+    def __init__(self, code="FR", latency_s=0.2):
+        self.code = code
+        self.latency_s = latency_s
+        self.calls = []
+
+    def resolve(self, ip=None):
+        self.calls.append(ip)
+        time.sleep(self.latency_s)
+        return self.code
+
+    async def aresolve(self, ip=None, session=None):
+        self.calls.append(ip)
+        await asyncio.sleep(self.latency_s)
+        return self.code
+
+
+def test_sample_table_covers_both_ip_versions():
+    table = CidrTable.from_csv(SAMPLE_TABLE)
+    assert len(table) == 6
+    assert table.lookup("203.0.113.200") == "FR" and table.lookup("2001:db8:ffff::1") == "US"
+    assert table.lookup("8.8.8.8") is None and table.lookup("not an ip") is None
+
+
+def test_offline_resolver_cannot_locate_this_machine():
+    # The CLI path calls locate() without a client IP
+    assert OfflineResolver(CidrTable.from_csv(SAMPLE_TABLE)).resolve(None) is None
+
+
+def test_default_table_is_optional_but_a_configured_one_is_not(tmp_path):
+    if not os.path.exists(DEFAULT_CIDR_PATH):
+        assert [type(r) for r in default_resolvers(online=True)] == [IpinfoResolver]
+    assert [type(r) for r in default_resolvers(SAMPLE_TABLE, online=False)] == [OfflineResolver]
+    try:
+        default_resolvers(str(tmp_path / "missing.csv"), online=False)
+    except FileNotFoundError:
+        pass
+    else:
+        raise AssertionError("a missing GEOIP_CIDR_FILE should fail loudly")
+
+
+def test_concurrent_misses_for_the_same_ip_resolve_once():
+    resolver = SlowResolver()
+    geolocator = Geolocator([resolver], countries=FakeCountries())
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(geolocator.locate("203.0.113.200"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert resolver.calls == ["203.0.113.200"]
+    assert len(results) == 8 and all(result is results[0] for result in results)
+    assert results[0].country == "France" and results[0].airports == ["CDG", "ORY"]
+    stats = geolocator.stats()
+    assert stats["misses"] == 1 and stats["coalesced"] + stats["hits"] == 7
+
+
+def test_concurrent_async_misses_resolve_once_and_survive_a_cancelled_caller():
+    resolver = SlowResolver()
+    geolocator = Geolocator([resolver], countries=FakeCountries())
+
+    async def scenario():
+        first = asyncio.ensure_future(geolocator.alocate("203.0.113.200"))
+        await asyncio.sleep(0)
+        others = [asyncio.ensure_future(geolocator.alocate("203.0.113.200")) for _ in range(4)]
+        await asyncio.sleep(0.05)
+        first.cancel()
+        return await asyncio.gather(*others)
+
+    results = asyncio.run(scenario())
+    assert resolver.calls == ["203.0.113.200"]
+    assert all(result.country_code == "FR" for result in results)
+    assert geolocator.stats()["coalesced"] == 4
+
+
+def test_unresolved_addresses_expire_sooner():
+    geolocator = Geolocator([SlowResolver(code=None, latency_s=0)], countries=FakeCountries(),
+                            ttl_s=3600, negative_ttl_s=0)
+    assert geolocator.locate("198.51.100.7") is None
+    assert geolocator.locate("198.51.100.7") is None
+    assert geolocator.stats()["misses"] == 2 and geolocator.stats()["unresolved"] == 2
@@ -0,0 +1,25 @@
+import json
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from history_compaction import extract_tool_facts, make_history_compactor
+from llm_client import CircuitOpenError
+from plugins.result_shaping import render_forecast, shape_result
+from plugins.synth_data_gen import weather_by_city_search
+
+
+def test_shaped_results_keep_their_reference_and_summary():
+    shaped = shape_result(200, render_forecast)(weather_by_city_search)("Paris")
+    reference, summary = shaped.splitlines()[:2]
+    assert extract_tool_facts(shaped) == f"{reference}\n{summary}"
+    assert len(extract_tool_facts(shaped)) < len(extract_tool_facts(json.dumps(weather_by_city_search("Paris"))))
+
+
+def test_failed_summarization_keeps_the_history():
+    class Unavailable:
+        def invoke(self, messages):
+            raise CircuitOpenError("circuit open")
+
+    history = [message for n in range(6) for message in (HumanMessage(f"question {n} " * 50), AIMessage(f"answer {n} " * 50))]
+    compact = make_history_compactor(Unavailable(), max_tokens=300, keep_tokens=100)
+    assert compact({"messages": history}) == {}
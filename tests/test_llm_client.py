@@ -0,0 +1,218 @@
+import asyncio
+import random
+import time
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from fake_llm_endpoint import FakeDeployment, start_fake_endpoint
+from llm_client import (BACKGROUND, INTERACTIVE, CircuitBreaker, CircuitOpenError, GovernedChatModel, LLMGovernor,
+                        RateLimiter, RetryPolicy, priority)
+from model_factory import create_azure_model
+
+
+@pytest.fixture(autouse=True)
+def azure_settings(monkeypatch):
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "fake")
+    monkeypatch.setenv("AZURE_OPENAI_DEPLOYMENT_NAME", "fake-gpt")
+    monkeypatch.setenv("AZURE_OPENAI_API_VERSION", "2024-06-01")
+
+
+def governed_model(url: str, monkeypatch, limiter=None, retry=None, breaker=None):
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", url)
+    governor = LLMGovernor(limiter or RateLimiter(rpm=0, tpm=0), retry or RetryPolicy(base_s=0.01, cap_s=0.05),
+                           breaker or CircuitBreaker())
+    return GovernedChatModel(inner=create_azure_model(max_retries=0), governor=governor), governor
+
+
+def with_endpoint(deployment: FakeDeployment, scenario):
+    """Runs scenario(url) against deployment served on a free local port."""
+    async def run():
+        runner, url = await start_fake_endpoint(deployment)
+        try:
+            return await scenario(url)
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(run())
+
+
+def open_circuit(breaker: CircuitBreaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record(False)
+    assert breaker.state == "open"
+
+
+def test_decorrelated_jitter_stays_within_bounds():
+    policy = RetryPolicy(base_s=0.5, cap_s=20, rng=random.Random(7))
+    delays = policy.delays()
+    previous = policy.base_s
+    for _ in range(50):
+        delay = next(delays)
+        assert policy.base_s <= delay <= min(policy.cap_s, previous * 3)
+        previous = delay
+
+
+def test_interactive_callers_go_ahead_of_background_callers(monkeypatch):
+    # One request every 0.1 s, no burst: every call after the first waits its turn
+    limiter = RateLimiter(rpm=600, tpm=0, burst_s=0.1)
+    deployment = FakeDeployment(latency_s=0.0)
+
+    async def scenario(url):
+        model, _ = governed_model(url, monkeypatch, limiter=limiter)
+        finished = []
+
+        async def call(name, level):
+            with priority(level):
+                await model.ainvoke([HumanMessage(name)])
+            finished.append(name)
+
+        await call("first", INTERACTIVE)
+        # The bucket refills while a slow first call is in flight; empty it so every caller waits
+        await limiter.aacquire(0)
+        background = [asyncio.ensure_future(call(f"background {n}", BACKGROUND)) for n in range(3)]
+        await asyncio.sleep(0.02)
+        interactive = [asyncio.ensure_future(call(f"interactive {n}", INTERACTIVE)) for n in range(3)]
+        await asyncio.gather(*background, *interactive)
+        return finished
+
+    finished = with_endpoint(deployment, scenario)
+    assert [name.split()[0] for name in finished[1:]] == ["interactive"] * 3 + ["background"] * 3
+    assert limiter.stats()["background"]["mean_wait_ms"] > limiter.stats()["interactive"]["mean_wait_ms"]
+
+
+def test_retries_wait_for_retry_after(monkeypatch):
+    # A quota of one request per one-second window: the second call gets a 429 with Retry-After
+    # until the window ends. The jitter alone (at most 5 ms) would come back inside the window.
+    deployment = FakeDeployment(rps=1, latency_s=0.0)
+
+    async def scenario(url):
+        model, governor = governed_model(url, monkeypatch)
+        # Start right after a window boundary, so the second call has most of a second to wait
+        await asyncio.sleep(1 - time.monotonic() % 1 + 0.01)
+        window = int(time.monotonic())
+        replies = await asyncio.gather(model.ainvoke([HumanMessage("one")]), model.ainvoke([HumanMessage("two")]))
+        return replies, governor, window, time.monotonic()
+
+    replies, governor, window, finished_at = with_endpoint(deployment, scenario)
+    assert all(reply.content.startswith("Fake reply") for reply in replies)
+    assert deployment.status_counts == {200: 2, 429: 1}
+    assert governor.metrics["throttled"] == 1 and governor.metrics["retries"] == 1 and governor.metrics["failed"] == 0
+    assert finished_at >= window + 1
+
+
+def test_circuit_opens_probes_and_closes(monkeypatch):
+    deployment = FakeDeployment(latency_s=0.0)
+    deployment.outage = True
+    breaker = CircuitBreaker(failure_threshold=2, reset_s=0.3)
+
+    async def scenario(url):
+        model, governor = governed_model(url, monkeypatch, retry=RetryPolicy(max_attempts=1), breaker=breaker)
+        for _ in range(2):
+            with pytest.raises(Exception) as failure:
+                await model.ainvoke([HumanMessage("outage")])
+            assert getattr(failure.value, "status_code", None) == 503
+        assert breaker.state == "open"
+
+        # Open: fails fast without reaching the deployment
+        with pytest.raises(CircuitOpenError):
+            await model.ainvoke([HumanMessage("fail fast")])
+        assert deployment.status_counts == {503: 2}
+
+        # Half-open: the probe fails and reopens the circuit
+        await asyncio.sleep(0.35)
+        with pytest.raises(Exception):
+            await model.ainvoke([HumanMessage("probe during outage")])
+        assert breaker.state == "open" and breaker.times_opened == 2
+
+        # Half-open again: the probe succeeds and closes it
+        deployment.outage = False
+        await asyncio.sleep(0.35)
+        reply = await model.ainvoke([HumanMessage("probe after outage")])
+        assert breaker.state == "closed"
+        await model.ainvoke([HumanMessage("closed")])
+        return reply, governor
+
+    reply, governor = with_endpoint(deployment, scenario)
+    assert reply.content.startswith("Fake reply")
+    assert deployment.status_counts == {503: 3, 200: 2}
+    assert governor.metrics["rejected_open"] == 1
+
+
+def test_half_open_admits_a_single_probe(monkeypatch):
+    deployment = FakeDeployment(latency_s=0.2)
+    breaker = CircuitBreaker(failure_threshold=1, reset_s=0.0)
+    open_circuit(breaker)
+
+    async def scenario(url):
+        model, _ = governed_model(url, monkeypatch, retry=RetryPolicy(max_attempts=1), breaker=breaker)
+        return await asyncio.gather(*(model.ainvoke([HumanMessage(f"probe {n}")]) for n in range(3)),
+                                    return_exceptions=True)
+
+    results = with_endpoint(deployment, scenario)
+    assert sum(isinstance(result, CircuitOpenError) for result in results) == 2
+    assert deployment.status_counts == {200: 1}
+    assert breaker.state == "closed"
+
+
+def test_cancelled_probe_reopens_the_circuit(monkeypatch):
+    deployment = FakeDeployment(latency_s=1.0)
+    breaker = CircuitBreaker(failure_threshold=1, reset_s=0.0)
+    open_circuit(breaker)
+
+    async def scenario(url):
+        model, _ = governed_model(url, monkeypatch, breaker=breaker)
+        probe = asyncio.ensure_future(model.ainvoke([HumanMessage("slow probe")]))
+        await asyncio.sleep(0.2)
+        assert breaker.state == "half-open"
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    with_endpoint(deployment, scenario)
+    assert breaker.state == "open" and breaker.times_opened == 2
+    # The next caller becomes the new probe instead of failing fast forever
+    assert breaker.before_call() is not None
+
+
+def test_abandoned_streaming_probe_reopens_the_circuit(monkeypatch):
+    deployment = FakeDeployment(latency_s=0.0)
+    breaker = CircuitBreaker(failure_threshold=1, reset_s=0.0)
+    open_circuit(breaker)
+
+    async def scenario(url):
+        model, _ = governed_model(url, monkeypatch, breaker=breaker)
+        chunks = model.astream([HumanMessage("streamed probe")])
+        await chunks.__anext__()
+        assert breaker.state == "half-open"
+        await chunks.aclose()
+
+    with_endpoint(deployment, scenario)
+    assert breaker.state == "open" and breaker.times_opened == 2
+
+
+def test_only_the_probe_owner_can_release_or_settle_it():
+    breaker = CircuitBreaker(failure_threshold=1, reset_s=0.0)
+    open_circuit(breaker)
+    probe = breaker.before_call()
+    assert probe is not None
+
+    # Calls that were not admitted as the probe neither release nor settle it
+    breaker.release_probe(None)
+    breaker.release_probe(object())
+    breaker.record(True)
+    assert breaker.state == "half-open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    # A stale token from an earlier probe is ignored as well
+    breaker.record(False, probe)
+    assert breaker.state == "open"
+    second = breaker.before_call()
+    breaker.release_probe(probe)
+    assert breaker.state == "half-open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.release_probe(second)
+    assert breaker.state == "open" and breaker.times_opened == 3
@@ -0,0 +1,60 @@
+import pytest
+
+from semantic_cache import SemanticResponseCache
+
+
+def weather_prompt(location: str) -> str:
+    return f"What is the current weather in {location}?"
+
+
+def cached(location: str, **kwargs) -> SemanticResponseCache:
+    cache = SemanticResponseCache(**kwargs)
+    cache.store("weather", weather_prompt(location), f"ANSWER FOR {location}", 1.0, semantic_text=location)
+    return cache
+
+
+def lookup(cache: SemanticResponseCache, location: str) -> tuple:
+    return cache.lookup("weather", weather_prompt(location), semantic_text=location)
+
+
+@pytest.mark.parametrize("same_words", [False, True])
+@pytest.mark.parametrize("stored, asked", [("New South Wales", "South Wales"), ("South Wales", "New South Wales")])
+def test_a_place_inside_another_place_name_is_a_miss(stored, asked, same_words):
+    cache = cached(stored, same_words=same_words)
+    # Similar enough for the threshold on its own
+    assert float(cache._embed(stored) @ cache._embed(asked)) >= cache.threshold
+    assert lookup(cache, asked) == (None, None)
+
+
+@pytest.mark.parametrize("same_words", [False, True])
+def test_reordered_place_name_is_a_semantic_hit(same_words):
+    cache = cached("Buenos Aires Argentina", same_words=same_words)
+    assert lookup(cache, "Argentina, Buenos Aires") == ("semantic", "ANSWER FOR Buenos Aires Argentina")
+
+
+def test_suffixed_place_name_is_a_miss():
+    assert lookup(cached("New York City"), "New York city, NY") == (None, None)
+
+
+def test_same_words_refuses_near_spellings():
+    class Identical:
+        """Embeds everything alike, so only the word check decides."""
+
+        def __call__(self, texts):
+            import numpy as np
+
+            return np.ones((len(texts), 4), dtype=np.float32) / 2
+
+    assert lookup(cached("Mumbai", embedder=Identical()), "Mumbaii")[0] == "semantic"
+    assert lookup(cached("Mumbai", embedder=Identical(), same_words=True), "Mumbaii") == (None, None)
+
+
+def test_different_numbers_are_a_miss():
+    cache = SemanticResponseCache()
+    cache.store("travel", "Trip to Mumbai in November 2025", "ANSWER 2025", 1.0)
+    assert cache.lookup("travel", "Trip to Mumbai in November 2026") == (None, None)
+
+
+def test_exact_hit_ignores_case_and_punctuation():
+    cache = cached("New South Wales", same_words=True)
+    assert lookup(cache, "new south wales!") == ("exact", "ANSWER FOR New South Wales")
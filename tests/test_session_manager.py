@@ -0,0 +1,54 @@
+import asyncio
+import gc
+import os
+
+from agent_memory_langgraph import build_graph
+from session_manager import SessionManager
+from stub_llm import StubChatModel
+
+
+def run_with_manager(tmp_path, scenario, **kwargs):
+    async def run():
+        async with SessionManager(build_graph(StubChatModel()), os.path.join(tmp_path, "memory.db"), **kwargs) as manager:
+            return await scenario(manager)
+
+    return asyncio.run(run())
+
+
+def test_recreated_session_waits_for_the_turn_of_the_evicted_one(tmp_path):
+    async def scenario(manager):
+        first = manager.session("thread")
+        await first.lock.acquire()  # a turn running on the first session object
+        manager.session("other")     # over max_sessions: "thread" is evicted as soon as it is idle
+        first.lock.release()
+        manager.session("another")
+        assert "thread" not in manager._sessions
+
+        await first.lock.acquire()
+        recreated = manager.session("thread")
+        assert recreated is not first
+        assert recreated.lock is first.lock and recreated.lock.locked()
+        first.lock.release()
+
+    run_with_manager(tmp_path, scenario, max_sessions=1)
+
+
+def test_locks_of_dropped_idle_sessions_are_released(tmp_path):
+    async def scenario(manager):
+        for n in range(5):
+            manager.session(f"thread-{n}")
+        gc.collect()
+        return len(manager._sessions), len(manager._locks)
+
+    assert run_with_manager(tmp_path, scenario, max_sessions=2) == (2, 2)
+
+
+def test_writes_go_through_one_connection_and_reads_see_them(tmp_path):
+    async def scenario(manager):
+        await manager.session("a").send("Paris")
+        await manager.session("b").send("Tokyo")
+        return (await manager.history("a")), (await manager.history("b")), await manager.list_threads()
+
+    history_a, history_b, threads = run_with_manager(tmp_path, scenario, pool_size=3)
+    assert history_a[0].content == "Paris" and history_b[0].content == "Tokyo"
+    assert threads == ["a", "b"]
@@ -0,0 +1,108 @@
+import threading
+import time
+
+from plugins.web_search import CachedSearch, FakeSearchProvider, RateLimiter, format_results
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def unlimited():
+    return RateLimiter(rate_per_second=0)
+
+
+def test_concurrent_identical_queries_reach_the_provider_once():
+    provider = FakeSearchProvider(latency_s=0.2)
+    cached = CachedSearch(provider, rate_limiter=unlimited())
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cached.search("Roman Empire"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert provider.calls == ["Roman Empire"]
+    assert len(results) == 8 and all(result is results[0] for result in results)
+    stats = cached.stats()
+    assert stats["misses"] == 1 and stats["coalesced"] + stats["hits"] == 7
+
+
+def test_normalized_queries_share_an_entry():
+    provider = FakeSearchProvider()
+    cached = CachedSearch(provider, rate_limiter=unlimited())
+    cached.search("Decline of the Roman Empire")
+    cached.search("decline of the  roman empire?")
+    assert len(provider.calls) == 1
+
+
+def test_entries_expire_after_the_ttl():
+    clock = FakeClock()
+    provider = FakeSearchProvider()
+    cached = CachedSearch(provider, ttl_seconds=60, rate_limiter=unlimited(), clock=clock)
+    cached.search("rome")
+    clock.now = 59
+    cached.search("rome")
+    assert len(provider.calls) == 1
+
+    clock.now = 60
+    cached.search("rome")
+    assert len(provider.calls) == 2
+    assert cached.stats()["expirations"] == 1
+
+
+def test_empty_results_use_the_short_ttl():
+    class EmptyProvider(FakeSearchProvider):
+        def search(self, query, max_results=5):
+            super().search(query, max_results)
+            return []
+
+    clock = FakeClock()
+    provider = EmptyProvider()
+    cached = CachedSearch(provider, ttl_seconds=1800, empty_ttl_seconds=60, rate_limiter=unlimited(), clock=clock)
+    assert cached.search("rome") == []
+    clock.now = 30
+    cached.search("rome")
+    assert len(provider.calls) == 1
+
+    clock.now = 61
+    cached.search("rome")
+    assert len(provider.calls) == 2
+
+
+def test_rate_limiter_spaces_upstream_calls():
+    limiter = RateLimiter(rate_per_second=20, burst=1)
+    started = time.monotonic()
+    for _ in range(5):
+        limiter.acquire()
+    # The first call uses the burst token, the other four wait 1/20 s each
+    assert time.monotonic() - started >= 4 / 20 * 0.9
+
+
+def test_rate_limiter_allows_the_burst_at_once():
+    limiter = RateLimiter(rate_per_second=1, burst=3)
+    started = time.monotonic()
+    for _ in range(3):
+        limiter.acquire()
+    assert time.monotonic() - started < 0.1
+
+
+def test_format_results_skips_entries_without_title_or_body():
+    text = format_results([
+        {"title": "Kept", "href": "https://example.com/1", "body": "Body."},
+        {"title": "", "href": "https://example.com/2", "body": "No title."},
+        {"title": "No body", "href": "https://example.com/3", "body": None},
+        {"href": "https://example.com/4"},
+    ])
+    assert "Kept" in text
+    assert "example.com/2" not in text and "example.com/3" not in text and "example.com/4" not in text
+    assert "---" not in text
+
+
+def test_format_results_without_usable_results():
+    assert format_results([]) == "No results found."
+    assert format_results([{"title": "", "href": "https://example.com", "body": ""}]) == "No results found."